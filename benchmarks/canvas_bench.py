@@ -0,0 +1,371 @@
+# benchmarks/canvas_bench.py
+"""
+Headless Canvas benchmarks.
+
+Run from the project root, the Qt offscreen platform is used so no display
+is needed:
+
+    python -m benchmarks.canvas_bench --tpes 50 --cameras 20 --controllers 20 -o bench.json
+
+--engine scene runs the same benchmarks on the QGraphicsScene canvas.
+Every benchmark reports min/median/mean/max milliseconds per operation and
+the whole run is written as JSON, to compare results across releases.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import Qt, QPoint, QPointF, QEvent, QT_VERSION_STR, PYQT_VERSION_STR
+from PyQt6.QtGui import QMouseEvent
+from PyQt6.QtWidgets import QApplication
+
+from benchmarks.topology import generate_schema
+
+
+def _stats(samples):
+    samples = [s * 1000 for s in samples]
+    return {
+        "runs": len(samples),
+        "min_ms": round(min(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "max_ms": round(max(samples), 3),
+    }
+
+
+def _time(func, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return _stats(samples)
+
+
+def _mouse(canvas, kind, pos, button=Qt.MouseButton.LeftButton, buttons=None):
+    if buttons is None:
+        buttons = Qt.MouseButton.NoButton if kind == QEvent.Type.MouseButtonRelease else button
+    point = QPointF(pos)
+    return QMouseEvent(kind, point, canvas.mapToGlobal(point), button, buttons,
+                       Qt.KeyboardModifier.NoModifier)
+
+
+ENGINES = ("widget", "scene")
+
+
+def create_canvas(engine):
+    if engine == "scene":
+        from components.scene_canvas import SceneCanvas
+        return SceneCanvas()
+    from components.canvas import Canvas
+    return Canvas()
+
+
+class CanvasBenchmark:
+    """Times Canvas operations on one synthetic schema"""
+
+    def __init__(self, schema, width=1600, height=1000, repeat=10, workdir=None, engine="widget"):
+        self.schema = schema
+        self.repeat = repeat
+        self.workdir = workdir or tempfile.mkdtemp(prefix="kst-bench-")
+        self.canvas = create_canvas(engine)
+        self.canvas.resize(width, height)
+        self.canvas.model.load_dict(schema)
+        self.canvas.invalidate()
+        # Shown on the offscreen platform so update() requests really repaint
+        self.canvas.show()
+        QApplication.processEvents()
+
+    def repaint(self):
+        # grab() drives a real paintEvent into an offscreen pixmap, the
+        # scene is invalidated so it is rendered rather than blitted
+        self.canvas.invalidate()
+        self.canvas.grab()
+
+    def bench_paint(self):
+        canvas = self.canvas
+        results = {}
+        for name, zoom in (("paint_full", 1.0), ("paint_zoom_0_5", 0.5), ("paint_overview", None)):
+            if zoom is None:
+                self.fit_view()
+            else:
+                canvas.zoom = zoom
+                canvas.pan = QPointF(0, 0)
+            self.repaint()
+            results[name] = _time(self.repaint, self.repeat)
+            results[name]["lod"] = canvas.last_frame_stats.get("lod")
+            results[name].update(self.profile())
+
+        # Panning keeps the scene tiles, only the newly exposed ones render
+        canvas.reset_view()
+        self.repaint()
+
+        def pan():
+            canvas.scroll_view(QPointF(-16, -8))
+            canvas.grab()
+
+        results["paint_pan"] = _time(pan, self.repeat)
+        results["paint_pan"].update(self.profile())
+        canvas.reset_view()
+        return results
+
+    def profile(self):
+        """Phases and counts of the last frame, from the canvas profiler"""
+        snapshot = self.canvas.profiler.snapshot()
+        profile = {"phases_ms": {name: round(ms, 3) for name, ms in snapshot["phases_ms"].items()}}
+        profile.update(snapshot["counts"])
+        return profile
+
+    def fit_view(self):
+        """Zoom out until the whole schema is in view"""
+        canvas = self.canvas
+        xs = [node.x for node in canvas.nodes] or [0]
+        ys = [node.y for node in canvas.nodes] or [0]
+        width = max(xs) - min(xs) + 200
+        height = max(ys) - min(ys) + 200
+        canvas.zoom = max(canvas.min_zoom,
+                          min(1.0, canvas.width() / width, canvas.height() / height))
+        canvas.pan = QPointF(-(min(xs) - 100) * canvas.zoom, -(min(ys) - 100) * canvas.zoom)
+
+    def bench_hit_testing(self):
+        canvas = self.canvas
+        nodes = list(canvas.nodes)
+        step = max(1, len(nodes) // 200)
+        points = [node.pos for node in nodes[::step]]
+        # Also probe points next to the nodes, where connections are
+        points += [QPoint(p.x() + 60, p.y() + 30) for p in points]
+
+        def node_hits():
+            for pos in points:
+                canvas.node_at(pos)
+
+        def connection_hits():
+            for pos in points:
+                for conn in canvas.connections_at(pos):
+                    canvas.connection_contains(conn, pos)
+
+        profiler = canvas.profiler
+        results = {}
+        for name, func in (("hit_test_nodes", node_hits), ("hit_test_connections", connection_hits)):
+            profiler.samples.pop("hit_test", None)
+            results[name] = _time(func, self.repeat)
+            results[name]["points"] = len(points)
+            # Index queries alone, as timed by the canvas
+            queries = profiler.sample_stats("hit_test")
+            results[name]["query_mean_ms"] = round(queries["mean_ms"], 4)
+            results[name]["query_max_ms"] = round(queries["max_ms"], 4)
+        return results
+
+    def drag(self, node, steps=20, distance=300):
+        """
+        Press on node, move it in steps and release, as a user drag would.
+
+        Pending repaints are flushed after every move, so the time includes
+        the dirty-region paints the drag causes.
+        """
+        canvas = self.canvas
+        start = canvas.world_transform().map(QPointF(node.x, node.y))
+        canvas.mousePressEvent(_mouse(canvas, QEvent.Type.MouseButtonPress, start))
+        for i in range(1, steps + 1):
+            pos = start + QPointF(distance * i / steps, distance * i / steps / 2)
+            canvas.mouseMoveEvent(_mouse(canvas, QEvent.Type.MouseMove, pos))
+            QApplication.processEvents()
+        canvas.mouseReleaseEvent(_mouse(canvas, QEvent.Type.MouseButtonRelease, pos))
+        QApplication.processEvents()
+
+    def bench_drag(self):
+        canvas = self.canvas
+        canvas.reset_view()
+        # Drag the node with the most connections among those on screen
+        visible = canvas.model.nodes_in_rect(canvas.visible_world_rect(canvas.rect()))
+        candidates = visible or canvas.nodes
+        if not candidates:
+            return {}
+        node = max(candidates, key=lambda n: len(canvas.model.adjacency.get(n.id, ())))
+        origin = node.pos
+        steps = 20
+
+        def reset():
+            dirty = canvas.selection_region([node])
+            canvas.model.move_node(node, origin)
+            canvas.update_world(dirty.united(canvas.selection_region([node])))
+
+        result = _time(lambda: self.drag(node, steps), self.repeat, reset)
+        result["moves_per_drag"] = steps
+        result["node_connections"] = len(canvas.model.adjacency.get(node.id, ()))
+        reset()
+        canvas.history.clear()
+        return {"drag_sequence": result}
+
+    def bench_undo_redo(self):
+        canvas = self.canvas
+        nodes = list(canvas.nodes)
+        count = min(200, len(nodes))
+        if not count:
+            return {}
+        step = max(1, len(nodes) // count)
+        # Record deletions, the most expensive edit to undo
+        targets = list(nodes[::step][:count])
+        canvas.history.clear()
+        for node in targets:
+            canvas.delete_node(node)
+        actions = len(canvas.history)
+
+        def undo_all():
+            while canvas.history.can_undo():
+                canvas.undo()
+
+        def redo_all():
+            while canvas.history.can_redo():
+                canvas.redo()
+
+        samples_undo = []
+        samples_redo = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            undo_all()
+            samples_undo.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            redo_all()
+            samples_redo.append(time.perf_counter() - started)
+
+        # Jumping across the whole history, checkpoints allowed
+        history = canvas.history
+        samples_jump = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            canvas.jump_to(history.first)
+            canvas.jump_to(history.last)
+            samples_jump.append((time.perf_counter() - started) / 2)
+        undo_all()
+        canvas.history.clear()
+
+        results = {"undo": _stats(samples_undo), "redo": _stats(samples_redo),
+                   "jump": _stats(samples_jump)}
+        for result in results.values():
+            result["actions"] = actions
+        return results
+
+    def bench_geometry(self):
+        canvas = self.canvas
+        nodes = list(canvas.nodes)
+        if not nodes:
+            return {}
+        snap_to_grid = canvas.snap_to_grid
+        canvas.snap_to_grid = False
+        origin = [node.pos for node in nodes]
+
+        def scatter():
+            # Knock every node off the grid so snapping has to move all of them
+            canvas.model.move_nodes(nodes, [(p.x() + 7, p.y() - 13) for p in origin])
+
+        results = {
+            "snap_all": _time(canvas.snap_nodes, self.repeat, scatter),
+            "translate_all": _time(lambda: canvas.translate_nodes(nodes, 40, 20), self.repeat),
+        }
+        for result in results.values():
+            result["nodes"] = len(nodes)
+        canvas.model.move_nodes(nodes, [(p.x(), p.y()) for p in origin])
+        canvas.invalidate()
+        canvas.snap_to_grid = snap_to_grid
+        canvas.history.clear()
+        return results
+
+    def bench_files(self):
+        canvas = self.canvas
+        schema_path = os.path.join(self.workdir, "bench.kst")
+        image_path = os.path.join(self.workdir, "bench.png")
+        results = {
+            "save_schema": _time(lambda: canvas.save_schema(schema_path), self.repeat),
+            "load_schema": _time(lambda: canvas.load_schema(schema_path), self.repeat),
+        }
+        results["save_schema"]["bytes"] = os.path.getsize(schema_path)
+        canvas.reset_view()
+        results["save_as_image"] = _time(lambda: canvas.save_as_image(image_path),
+                                         max(1, self.repeat // 2))
+        return results
+
+    def run(self, only=None):
+        suites = [
+            ("paint", self.bench_paint),
+            ("hit_testing", self.bench_hit_testing),
+            ("drag", self.bench_drag),
+            ("undo_redo", self.bench_undo_redo),
+            ("geometry", self.bench_geometry),
+            ("files", self.bench_files),
+        ]
+        results = {}
+        for name, suite in suites:
+            if only and name not in only:
+                continue
+            results.update(suite())
+        return results
+
+
+def run(tpes=10, cameras=8, controllers=5, repeat=10, width=1600, height=1000, seed=0, only=None,
+        engine="widget"):
+    """Generate a schema, benchmark it and return the report as a dict"""
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    schema = generate_schema(tpes, cameras, controllers, seed=seed)
+    bench = CanvasBenchmark(schema, width, height, repeat, engine=engine)
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "engine": engine,
+        "environment": {
+            "python": platform.python_version(),
+            "qt": QT_VERSION_STR,
+            "pyqt": PYQT_VERSION_STR,
+            "platform": platform.platform(),
+            "qpa": app.platformName(),
+        },
+        "schema": {
+            "tpes": tpes,
+            "cameras_per_tpe": cameras,
+            "controllers": controllers,
+            "nodes": len(schema["nodes"]),
+            "connections": len(schema["connections"]),
+            "seed": seed,
+        },
+        "viewport": {"width": width, "height": height},
+        "results": bench.run(only),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the schema canvas offscreen")
+    parser.add_argument("--tpes", type=int, default=10, help="number of TPE nodes")
+    parser.add_argument("--cameras", type=int, default=8, help="cameras per TPE")
+    parser.add_argument("--controllers", type=int, default=5, help="controllers, each with a BasiQ")
+    parser.add_argument("--repeat", type=int, default=10, help="runs per benchmark")
+    parser.add_argument("--width", type=int, default=1600)
+    parser.add_argument("--height", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", action="append",
+                        choices=["paint", "hit_testing", "drag", "undo_redo", "geometry", "files"],
+                        help="run only these suites (repeatable)")
+    parser.add_argument("--engine", choices=ENGINES, default="widget",
+                        help="canvas implementation to benchmark")
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = run(args.tpes, args.cameras, args.controllers, args.repeat,
+                 args.width, args.height, args.seed, args.only, args.engine)
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/topology.py
+import math
+import random
+
+
+def _device_ip(index):
+    return f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256 + 1}"
+
+
+def generate_schema(tpes=10, cameras=8, controllers=5, spacing=400, seed=0):
+    """
+    Synthetic schema in the .kst file format (see SchemaModel.to_dict).
+
+    Every TPE gets `cameras` CCTV nodes in a circle around it, linked the way
+    TpeDialog lays them out, and every Controller gets a BasiQ linked to it
+    the way ControllerDialog adds one. Devices are placed on a square grid
+    `spacing` pixels apart, TPE clusters first, then controllers.
+    """
+    rng = random.Random(seed)
+    nodes = []
+    connections = []
+    columns = max(1, math.ceil(math.sqrt(tpes + controllers)))
+    # Keep large camera rings from overlapping the next cluster
+    radius = max(100, cameras * 12)
+    spacing = max(spacing, radius * 2 + 150)
+
+    def add_node(node_type, x, y, name, characteristics=None):
+        node = {
+            'id': len(nodes) + 1,
+            'type': node_type,
+            'pos': {'x': int(x), 'y': int(y)},
+            'name': name,
+            'characteristics': characteristics or {}
+        }
+        nodes.append(node)
+        return node
+
+    def connect(start, end):
+        connections.append({
+            'source': start['id'],
+            'target': end['id'],
+            'start': dict(start['pos']),
+            'end': dict(end['pos'])
+        })
+
+    def slot(index):
+        return (index % columns) * spacing + spacing // 2, (index // columns) * spacing + spacing // 2
+
+    camera_id = 1
+    for t in range(tpes):
+        x, y = slot(t)
+        tpe = add_node('TPE', x, y, f"TPE {t + 1}", {
+            'ip': _device_ip(t),
+            'port': '1080',
+            'username': 'admin',
+            'password': 'admin'
+        })
+        for c in range(cameras):
+            angle = (2 * math.pi * c) / cameras
+            camera = add_node('CCTV', x + radius * math.cos(angle), y + radius * math.sin(angle),
+                              f"Camera {camera_id}", {
+                                  'latitude': f"{35.6 + rng.uniform(-0.2, 0.2):.6f}",
+                                  'longitude': f"{51.4 + rng.uniform(-0.2, 0.2):.6f}",
+                                  'camera_id': str(camera_id),
+                                  'street_id': str(rng.randint(1000000, 9999999)),
+                                  'name': f"Camera {camera_id}"
+                              })
+            connect(tpe, camera)
+            camera_id += 1
+
+    for c in range(controllers):
+        x, y = slot(tpes + c)
+        controller = add_node('Controller', x, y, f"Controller {c + 1}", {
+            'ip': _device_ip(tpes + c),
+            'port': '8000',
+            'username': 'admin',
+            'password': 'admin'
+        })
+        basiq = add_node('BasiQ', x + 100, y, f"BasiQ {c + 1}")
+        connect(basiq, controller)
+
+    return {
+        'nodes': nodes,
+        'connections': connections,
+        'version': '1.1'
+    }
@@ -2,13 +2,14 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
                            QLineEdit, QPushButton, QFormLayout, QGroupBox,
                            QMessageBox, QSpinBox, QDoubleSpinBox)
 from PyQt6.QtCore import Qt
-import requests
+from components.request_status import RequestStatus
+from utils import device_api, device_client
 
 class BasiQDialog(QDialog):
     def __init__(self, node_data=None, parent=None):
         super().__init__(parent)
         self.node_data = node_data or {}
-        self.token = None
+        self.last_retrieved_config = self.node_data.get("last_retrieved_config", {})
         self.setWindowTitle("BasiQ Configuration")
         self.setWindowFlags(Qt.WindowType.Window | Qt.WindowType.WindowCloseButtonHint)
         self.setup_ui()
@@ -71,50 +72,50 @@ class BasiQDialog(QDialog):
         button_layout.addWidget(self.cancel_btn)
         layout.addLayout(button_layout)
 
+        self.status = RequestStatus()
+        self.status.busy_changed.connect(self.set_busy)
+        layout.addWidget(self.status)
+
+    def set_busy(self, busy):
+        self.get_config_btn.setEnabled(not busy)
+        self.set_config_btn.setEnabled(not busy)
+
+    def request_failed(self, message):
+        QMessageBox.critical(self, "Error", message)
+
+    def find_controller(self):
+        """Connection settings of the Controller running BasiQ, None without one"""
+        canvas = self.parent()
+        controller_node = None
+        basiq_node = None
+        
+        for node in canvas.nodes:
+            if node.type == "BasiQ":
+                basiq_node = node
+                break
+        
+        if basiq_node:
+            for node in canvas.model.neighbors(basiq_node):
+                if node.type == "Controller":
+                    controller_node = node
+        
+        if not controller_node or not controller_node.has_characteristics():
+            QMessageBox.critical(self, "Error", "No connected controller found or controller not configured")
+            return None
+        return controller_node.characteristics
+
     def get_config(self):
+        controller = self.find_controller()
+        if controller is None:
+            return
+        request = self.status.track(
+            device_client.client().run(device_api.fetch_basiq_config, controller),
+            f"Getting configuration from {device_api.address(controller)}...")
+        request.finished.connect(self.config_received)
+        request.failed.connect(self.request_failed)
+
+    def config_received(self, config):
         try:
-            # Find connected controller
-            canvas = self.parent()
-            controller_node = None
-            basiq_pos = None
-            
-            for node in canvas.nodes:
-                if node["type"] == "BasiQ":
-                    basiq_pos = node["pos"]
-                    break
-            
-            if basiq_pos:
-                for conn in canvas.connections:
-                    start, end = conn
-                    other_pos = end if start == basiq_pos else start
-                    for node in canvas.nodes:
-                        if node["pos"] == other_pos and node["type"] == "Controller":
-                            controller_node = node
-                            break
-            
-            if not controller_node or "characteristics" not in controller_node:
-                raise Exception("No connected controller found or controller not configured")
-            
-            # Get token from controller
-            url = f"http://{controller_node['characteristics']['ip']}:{controller_node['characteristics']['port']}/auth/login"
-            headers = {'Content-Type': 'application/json'}
-            data = {
-                "username": controller_node['characteristics']['username'],
-                "password": controller_node['characteristics']['password']
-            }
-            
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()
-            token = response.json()["access_token"]
-            
-            # Get configuration
-            url = f"http://{controller_node['characteristics']['ip']}:{controller_node['characteristics']['port']}/getconfig"
-            headers = {"Authorization": f"Bearer {token}"}
-            
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            config = response.json()
-            
             # Update UI with received configuration
             self.algo_name.setText(config.get("algorithm_name", ""))
             self.comp_threshold.setValue(float(config.get("computation_threshold", 0.0)))
@@ -122,76 +123,34 @@ class BasiQDialog(QDialog):
             self.set_setting_threshold.setValue(float(config.get("set_setting_threshold", 0.0)))
             self.saturation_flow.setValue(int(config.get("saturation_flow_rate", 0)))
             self.startup_loss.setValue(int(config.get("startup_loss_time", 0)))
-            
-            QMessageBox.information(self, "Success", "Configuration retrieved successfully")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        except (AttributeError, TypeError, ValueError) as e:
+            QMessageBox.critical(self, "Error", f"Invalid configuration: {str(e)}")
+            return
+        self.last_retrieved_config = config
+        
+        QMessageBox.information(self, "Success", "Configuration retrieved successfully")
 
     def set_config(self):
-        try:
-            # Find connected controller
-            canvas = self.parent()
-            controller_node = None
-            basiq_pos = None
-            
-            for node in canvas.nodes:
-                if node["type"] == "BasiQ":
-                    basiq_pos = node["pos"]
-                    break
-            
-            if basiq_pos:
-                for conn in canvas.connections:
-                    start, end = conn
-                    other_pos = end if start == basiq_pos else start
-                    for node in canvas.nodes:
-                        if node["pos"] == other_pos and node["type"] == "Controller":
-                            controller_node = node
-                            break
-            
-            if not controller_node or "characteristics" not in controller_node:
-                raise Exception("No connected controller found or controller not configured")
-            
-            # Get token from controller
-            url = f"http://{controller_node['characteristics']['ip']}:{controller_node['characteristics']['port']}/auth/login"
-            headers = {'Content-Type': 'application/json'}
-            data = {
-                "username": controller_node['characteristics']['username'],
-                "password": controller_node['characteristics']['password']
-            }
-            
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()
-            token = response.json()["access_token"]
-            
-            # Prepare configuration data
-            config = {
-                "algorithm_name": self.algo_name.text(),
-                "computation_threshold": self.comp_threshold.value(),
-                "f_adj": self.f_adj.value(),
-                "set_setting_threshold": self.set_setting_threshold.value(),
-                "saturation_flow_rate": self.saturation_flow.value(),
-                "startup_loss_time": self.startup_loss.value()
-            }
-            
-            # Send configuration
-            url = f"http://{controller_node['characteristics']['ip']}:{controller_node['characteristics']['port']}/setconfig"
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-            
-            response = requests.post(url, headers=headers, json=config)
-            response.raise_for_status()
-            
-            QMessageBox.information(self, "Success", "Configuration set successfully")
-            self.accept()
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        controller = self.find_controller()
+        if controller is None:
+            return
+        request = self.status.track(
+            device_client.client().run(device_api.push_basiq_config, controller, self.settings()),
+            f"Sending configuration to {device_api.address(controller)}...")
+        request.finished.connect(self.config_sent)
+        request.failed.connect(self.request_failed)
 
-    def get_data(self):
-        """Return the current configuration as a dictionary"""
+    def config_sent(self):
+        QMessageBox.information(self, "Success", "Configuration set successfully")
+        self.accept()
+
+    def done(self, result):
+        # Nobody waits for an answer once the dialog is closed
+        self.status.cancel()
+        super().done(result)
+
+    def settings(self):
+        """The algorithm settings as sent to the Controller"""
         return {
             "algorithm_name": self.algo_name.text(),
             "computation_threshold": self.comp_threshold.value(),
@@ -200,6 +159,13 @@ class BasiQDialog(QDialog):
             "saturation_flow_rate": self.saturation_flow.value(),
             "startup_loss_time": self.startup_loss.value()
         }
+
+    def get_data(self):
+        """Return the current configuration as a dictionary"""
+        data = self.settings()
+        if self.last_retrieved_config:
+            data["last_retrieved_config"] = self.last_retrieved_config
+        return data
         
     def apply_theme(self):
         is_dark = self.parent().dark_mode if hasattr(self.parent(), 'dark_mode') else True
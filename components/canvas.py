@@ -1,53 +1,145 @@
 from PyQt6.QtWidgets import QWidget, QMenu, QFileDialog, QMessageBox, QStackedWidget, QVBoxLayout, QToolTip
-from PyQt6.QtCore import Qt, QPoint, QRectF
-from PyQt6.QtGui import QPainter, QPen, QColor, QPixmap, QIcon
+from PyQt6.QtCore import Qt, QPoint, QPointF, QLineF, QRect, QRectF, pyqtSignal
+from PyQt6.QtGui import QPainter, QPen, QBrush, QColor, QPixmap, QIcon, QRegion, QTransform, QPolygonF, QPainterPath
 import json
+import time
 from PyQt6.QtCore import Qt, QPoint, QRectF
 from PyQt6.QtGui import QPainter, QPen, QColor
-from PyQt6.QtWebEngineWidgets import QWebEngineView
 from components.controller_dialog import ControllerDialog
 import platform
 import subprocess
-import requests
 from .controller_dialog import ControllerDialog
+from utils.schema_model import SchemaModel, Node
+from utils import icon_cache
+from utils import label_cache
+from utils import geometry
+from utils import fleet
+from utils.profiler import Profiler
+from components.canvas_overlay import CanvasOverlay
+from components.scene_tiles import SceneTiles, SceneSnapshot
+from components.profiler_overlay import ProfilerOverlay
+from utils.history import History, AddNodes, RemoveNodes, AddConnection, RemoveConnection, MoveNodes, EditNode
 
 class Canvas(QWidget):
+    # Emitted after every paint with the level of detail used and the frame cost
+    frame_rendered = pyqtSignal(dict)
+
+    # Zoom levels below which detail is dropped:
+    #   simplified - no labels, connection dots or arrow heads
+    #   points     - nodes become coloured points, overlapping edges merge
+    LOD_THRESHOLDS = {"simplified": 0.6, "points": 0.3}
+
+    # Point colour per node type in the "points" level of detail
+    LOD_POINT_COLORS = {
+        "CCTV": "#00ffff",
+        "TPE": "#ffb000",
+        "Controller": "#ff4d4d",
+        "BasiQ": "#7cfc00",
+        "Redlight": "#ff00ff",
+        "Firn": "#1e90ff",
+    }
+
+    # Arrow heads filled per path, see draw_connections()
+    ARROW_BATCH_SIZE = 64
+
     def __init__(self):
         super().__init__()
         self.theme = "dark"
         self.setObjectName("Canvas")
         self.setAcceptDrops(True)
-        self.nodes = []
-        self.connections = []
         self.dragging = False
         self.current_node = None
+        self.drag_origin = None  # {node id: QPoint} of the dragged nodes at press time
         self.connecting = False
         self.connection_start = None
+        self.connection_cursor = None
+        self.hover_node = None
         self.setMouseTracking(True)
         self.grid_size = 50
         self.snap_to_grid = True
         self.dark_mode = True
+
+        # Nodes, connections and their spatial indexes
+        self.model = SchemaModel(cell_size=self.grid_size * 2)
+        self.model.label_font = self.font()
+
+        # Viewport: screen = world * zoom + pan
+        self.zoom = 1.0
+        self.pan = QPointF(0, 0)
+        self.min_zoom = 0.05
+        self.max_zoom = 8.0
+        self.panning = False
+        self.pan_anchor = None
+
+        # Selected nodes by id, in selection order
+        self.selection = {}
+        # Rubber band: "rect" or "lasso" while selecting, points in widget coordinates
+        self.selecting = None
+        self.band_points = []
+        self.clipboard = None
+        self.paste_count = 0
+        self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
+
+        # Level of detail, see LOD_THRESHOLDS
+        self.lod_thresholds = dict(self.LOD_THRESHOLDS)
+        self.last_frame_stats = {}
+
+        # Pens and brushes per theme, see paint_style()
+        self.paint_styles = {}
+
+        # Pre-rendered grid, rebuilt on resize, theme, grid or view changes
+        self.grid_cache = None
+        self.grid_cache_key = None
+
+        # Rendered scene, see invalidate(). Interaction feedback is drawn on
+        # the overlay so moving the cursor only re-blits this pixmap
+        self.scene_cache = None
+        self.scene_dirty = QRegion()
+        self.overlay = CanvasOverlay(self)
+        # Static layer tiles the scene is composed from, dragged nodes are
+        # drawn over them, see set_dynamic()
+        self.tiles = SceneTiles(self)
         
-        # Undo/Redo stacks
-        self.undo_stack = []
-        self.redo_stack = []
+        # Undo/Redo history, see utils.history
+        self.history = History(self.model)
+
+        # Paint and hit-test timings, shown by the debug overlay and read by
+        # the benchmarks
+        self.profiler = Profiler()
+        self.profiler.add_gauge("history_steps", lambda: len(self.history))
+        self.profiler.add_gauge("history_bytes", lambda: self.history.nbytes)
+        self.profiler.add_gauge("checkpoint_bytes",
+                                lambda: sum(len(data) for data in self.history.checkpoints.values()))
+        self.profiler.add_gauge("tiles_cached", lambda: len(self.tiles.tiles))
+        self.profiler_overlay = ProfilerOverlay(self)
 
         # Initialize map view
         self.map_widget = None
         self.map_mode = False
 
 
+    @property
+    def nodes(self):
+        return self.model.nodes
+
+    @property
+    def connections(self):
+        return self.model.connections
+
     def set_theme(self, theme):
         self.theme = theme
-        self.update()
+        self.invalidate()
 
 
         
         # self.api_key = "YOUR_GOOGLE_MAPS_API_KEY"  # Replace with your API key
 
-    def draw_arrow(self, painter, start, end):
+    def arrow_head(self, start, end, outline=0):
         """
-        Draw an arrow head at the end of a line
+        Triangle of the arrow head at the end of a line, None for a zero-length line
+
+        outline grows the triangle by that many pixels on every side, so that
+        filling it without a pen covers what drawing it with an outline would.
         """
         # Set up arrow parameters
         arrow_size = 10
@@ -58,7 +150,7 @@ class Canvas(QWidget):
         length = (dx * dx + dy * dy) ** 0.5
         
         if length == 0:
-            return
+            return None
 
         # Normalize direction vector
         dx /= length
@@ -70,69 +162,29 @@ class Canvas(QWidget):
         arrow_point2_x = end.x() - arrow_size * (dx * 0.866 - dy * 0.5)
         arrow_point2_y = end.y() - arrow_size * (dx * 0.5 + dy * 0.866)
 
-        # Draw the arrow head
         points = [
-            end,
-            QPoint(int(arrow_point1_x), int(arrow_point1_y)),
-            QPoint(int(arrow_point2_x), int(arrow_point2_y))
+            (end.x(), end.y()),
+            (int(arrow_point1_x), int(arrow_point1_y)),
+            (int(arrow_point2_x), int(arrow_point2_y))
         ]
 
-        # Fill the arrow head with the same color as the line
-        painter.setBrush(painter.pen().color())
-        painter.drawPolygon(points)
-
-    def draw_connection(self, painter, connection, temporary=False):
-        """
-        Draw a connection line with an arrow
-        """
-        # Extract start and end points
-        if isinstance(connection, tuple):
-            start, end = connection
-        else:
-            start, end = connection["start"], connection["end"]
-
-        # Get color based on theme and connection type
-        if self.theme == "light":
-            color = QColor("#0078d7")  # Blue for light theme
-        else:
-            color = QColor("#00ffff")  # Cyan for dark theme
-
-        # Set up the pen
-        pen = QPen(color, 2)
-        painter.setPen(pen)
-
-        # Draw the main line
-        painter.drawLine(start, end)
-
-        # Draw arrow head if not a temporary connection
-        if not temporary:
-            self.draw_arrow(painter, start, end)
-
+        if outline:
+            # The head is (close to) equilateral: moving each corner 2 * outline
+            # away from the centre pushes every edge out by outline
+            cx = (points[0][0] + points[1][0] + points[2][0]) / 3
+            cy = (points[0][1] + points[1][1] + points[2][1]) / 3
+            grown = []
+            for px, py in points:
+                ox = px - cx
+                oy = py - cy
+                distance = (ox * ox + oy * oy) ** 0.5 or 1
+                grown.append((px + ox * 2 * outline / distance, py + oy * 2 * outline / distance))
+            points = grown
+
+        return QPolygonF([QPointF(px, py) for px, py in points])
 
     def save_schema(self, filename):
-        data = {
-            'nodes': [],
-            'connections': [],
-            'version': '1.0'
-        }
-        
-        for node in self.nodes:
-            node_data = {
-                'type': node['type'],
-                'pos': {'x': node['pos'].x(), 'y': node['pos'].y()},
-                'name': node.get('name', node['type']),
-                'characteristics': node.get('characteristics', {})
-            }
-            data['nodes'].append(node_data)
-        
-        for conn in self.connections:
-            if isinstance(conn, tuple):
-                start, end = conn
-                conn_data = {
-                    'start': {'x': start.x(), 'y': start.y()},
-                    'end': {'x': end.x(), 'y': end.y()}
-                }
-                data['connections'].append(conn_data)
+        data = self.model.to_dict()
         
         with open(filename, 'w') as f:
             json.dump(data, f, indent=4)
@@ -142,27 +194,12 @@ class Canvas(QWidget):
         with open(filename, 'r') as f:
             data = json.load(f)
         
-        self.nodes.clear()
-        self.connections.clear()
-        
-        for node_data in data['nodes']:
-            node = {
-                'type': node_data['type'],
-                'pos': QPoint(node_data['pos']['x'], node_data['pos']['y']),
-                'icon': QIcon(f"assets/icons/{node_data['type'].lower()}.png"),
-                'name': node_data.get('name', node_data['type']),
-                'characteristics': node_data.get('characteristics', {})
-            }
-            self.nodes.append(node)
+        self.model.load_dict(data)
+        self.history.clear()
+        self.selection = {}
+        self.set_hover(None)
         
-        for conn_data in data['connections']:
-            conn = (
-                QPoint(conn_data['start']['x'], conn_data['start']['y']),
-                QPoint(conn_data['end']['x'], conn_data['end']['y'])
-            )
-            self.connections.append(conn)
-        
-        self.update()
+        self.invalidate()
 
     def save_as_image(self, filename):
         """Save the canvas as an image"""
@@ -224,229 +261,733 @@ class Canvas(QWidget):
     #     self.update()
 
     def dropEvent(self, event):
-        pos = QPoint(int(event.position().x()), int(event.position().y()))
+        pos = self.to_world(event.position())
         node_type = event.mimeData().text()
         
-        from PyQt6.QtGui import QIcon
-        icon_path = f"assets/icons/{node_type.lower()}.png"
-        new_node = {
-            "pos": self.snap_to_grid_pos(pos) if self.snap_to_grid else pos,
-            "type": node_type,
-            "icon": QIcon(icon_path),
-            "size": QPoint(50, 50)
-        }
+        new_node = Node(node_type, self.snap_to_grid_pos(pos) if self.snap_to_grid else pos)
         
-        self.nodes.append(new_node)
-        
-        # If it's a BasiQ node, try to connect it to the nearest Controller
-        if node_type == "BasiQ":
-            controller_node = None
-            min_distance = float('inf')
-            
-            # Find nearest Controller node
-            for node in self.nodes:
-                if node["type"] == "Controller":
-                    dx = node["pos"].x() - new_node["pos"].x()
-                    dy = node["pos"].y() - new_node["pos"].y()
-                    distance = (dx * dx + dy * dy) ** 0.5
-                    
-                    if distance < min_distance:
-                        min_distance = distance
-                        controller_node = node
+        with self.history.transaction(f"Add {node_type}"):
+            self.insert_nodes([new_node])
             
-            # If we found a Controller, create connection
-            if controller_node:
-                self.connections.append((new_node["pos"], controller_node["pos"]))
+            # If it's a BasiQ node, try to connect it to the nearest Controller
+            if node_type == "BasiQ":
+                self.connect_nearest_controller(new_node)
+
+    def connect_nearest_controller(self, new_node):
+        """Link a new BasiQ node to the closest Controller, if there is one"""
+        controller_node = None
+        min_distance = float('inf')
         
-        self.add_to_undo_stack({
-            'type': 'add_node',
-            'node': new_node
-        })
-        self.update()
-
-
-    def draw_grid(self, painter):
+        # Find nearest Controller node
+        for node in self.nodes:
+            if node.type == "Controller":
+                dx = node.x - new_node.x
+                dy = node.y - new_node.y
+                distance = (dx * dx + dy * dy) ** 0.5
+                
+                if distance < min_distance:
+                    min_distance = distance
+                    controller_node = node
+        
+        # If we found a Controller, create connection
+        if controller_node:
+            self.connect_nodes(new_node, controller_node)
+
+
+    def grid_spacing(self):
+        """On-screen grid spacing, coarsened so lines stay at least 8px apart"""
+        spacing = self.grid_size * self.zoom
+        while spacing < 8:
+            spacing *= 2
+        return spacing
+
+    def draw_grid(self, painter, rect=None):
+        spacing = self.grid_spacing()
+        key = (self.width(), self.height(), self.devicePixelRatioF(),
+               self.dark_mode, self.grid_size, self.zoom,
+               round(self.pan.x() % spacing, 2), round(self.pan.y() % spacing, 2))
+        if self.grid_cache is None or self.grid_cache_key != key:
+            self.grid_cache = self.render_grid()
+            self.grid_cache_key = key
+        # Only copy the part of the pixmap that is being repainted
+        rect = QRectF(rect if rect is not None else self.rect())
+        dpr = self.grid_cache.devicePixelRatio()
+        source = QRectF(rect.x() * dpr, rect.y() * dpr, rect.width() * dpr, rect.height() * dpr)
+        painter.drawPixmap(rect, self.grid_cache, source)
+
+    def render_grid(self):
+        """Render the grid lines once into a pixmap at the screen's pixel ratio"""
+        dpr = self.devicePixelRatioF()
+        pixmap = QPixmap(int(self.width() * dpr), int(self.height() * dpr))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.GlobalColor.transparent)
+
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        # Faster antialiased lines, see SceneTiles.rasterize()
+        painter.setClipRect(self.rect())
         pen = QPen(QColor("#333333"), 1)
         painter.setPen(pen)
         
-        # Draw vertical lines
-        for x in range(0, self.width(), self.grid_size):
-            painter.drawLine(x, 0, x, self.height())
+        # Lines sit on world multiples of grid_size, shifted by the pan
+        spacing = self.grid_spacing()
+        
+        # Draw vertical lines, including one on the edge whose antialiasing
+        # reaches the last pixel column, it comes into view when panning
+        x = self.pan.x() % spacing
+        while x <= self.width():
+            painter.drawLine(QLineF(x, 0, x, self.height()))
+            x += spacing
             
         # Draw horizontal lines
-        for y in range(0, self.height(), self.grid_size):
-            painter.drawLine(0, y, self.width(), y)
+        y = self.pan.y() % spacing
+        while y <= self.height():
+            painter.drawLine(QLineF(0, y, self.width(), y))
+            y += spacing
+        painter.end()
+        return pixmap
+
+    def invalidate_grid(self):
+        self.grid_cache = None
+
+    def closeEvent(self, event):
+        # No tile job may outlive the canvas it paints
+        self.tiles.shutdown()
+        super().closeEvent(event)
+
+    def resizeEvent(self, event):
+        self.invalidate_grid()
+        self.overlay.resize(self.size())
+        super().resizeEvent(event)
+
+    # Viewport
+
+    def world_transform(self):
+        return QTransform(self.zoom, 0, 0, self.zoom, self.pan.x(), self.pan.y())
+
+    def to_world(self, pos):
+        """Map a widget position to (integer) canvas coordinates"""
+        return QPoint(round((pos.x() - self.pan.x()) / self.zoom),
+                      round((pos.y() - self.pan.y()) / self.zoom))
+
+    def visible_world_rect(self, rect=None):
+        """Canvas area shown in rect (the whole widget by default) as (left, top, right, bottom)"""
+        rect = QRectF(rect if rect is not None else self.rect())
+        world = self.world_transform().inverted()[0].mapRect(rect)
+        return (world.left(), world.top(), world.right(), world.bottom())
+
+    def invalidate(self, area=None):
+        """
+        The scene changed in area (widget coordinates, everything by default):
+        render its tiles again on the next paint. Plain update() calls only
+        blit the cached scene.
+        """
+        self.tiles.invalidate(area)
+        self.update_scene(area)
+
+    def update_scene(self, area=None):
+        """
+        Compose area again from the cached tiles and the dynamic layer, for
+        view changes and dragged nodes that leave the tiles as they are.
+        """
+        if area is None:
+            self.scene_dirty = QRegion(self.rect())
+            self.update()
+        else:
+            self.scene_dirty = self.scene_dirty.united(area)
+            self.update(area)
+
+    def update_world(self, area, static=True):
+        """
+        Schedule a repaint of a canvas-space QRect or QRegion; static=False
+        when only the dynamic layer changed there.
+        """
+        transform = self.world_transform()
+        area = transform.map(area) if isinstance(area, QRegion) else transform.mapRect(area)
+        if static:
+            self.invalidate(area)
+        else:
+            self.update_scene(area)
+
+    def scroll_view(self, delta):
+        """
+        Pan by delta (widget pixels). Whole-pixel moves shift the cached scene
+        and only compose the strips scrolled into view.
+        """
+        self.pan = self.pan + delta
+        dx, dy = delta.x(), delta.y()
+        dpr = self.devicePixelRatioF()
+        if (self.scene_cache is None or dx != int(dx) or dy != int(dy)
+                or dx * dpr != int(dx * dpr) or dy * dpr != int(dy * dpr)):
+            self.update_scene()
+            return
+        dx, dy = int(dx), int(dy)
+        self.scene_cache.scroll(int(dx * dpr), int(dy * dpr), self.scene_cache.rect())
+        exposed = QRegion(self.rect()).subtracted(QRegion(self.rect().translated(dx, dy)))
+        self.scene_dirty = self.scene_dirty.translated(dx, dy).united(exposed)
+        self.update()
+
+    def set_zoom(self, zoom, anchor=None):
+        """Zoom keeping the canvas point under anchor (widget coordinates) still"""
+        zoom = min(max(zoom, self.min_zoom), self.max_zoom)
+        if anchor is None:
+            anchor = QPointF(self.width() / 2, self.height() / 2)
+        world_x = (anchor.x() - self.pan.x()) / self.zoom
+        world_y = (anchor.y() - self.pan.y()) / self.zoom
+        self.zoom = zoom
+        self.pan = QPointF(anchor.x() - world_x * zoom, anchor.y() - world_y * zoom)
+        self.update_scene()
+
+    def zoom_in(self):
+        self.set_zoom(self.zoom * 1.25)
+
+    def zoom_out(self):
+        self.set_zoom(self.zoom / 1.25)
+
+    def reset_view(self):
+        self.zoom = 1.0
+        self.pan = QPointF(0, 0)
+        self.update_scene()
+
+    def set_lod_thresholds(self, simplified=None, points=None):
+        if simplified is not None:
+            self.lod_thresholds["simplified"] = simplified
+        if points is not None:
+            self.lod_thresholds["points"] = points
+        self.invalidate()
+
+    def lod_tier(self):
+        """Level of detail for the current zoom: full, simplified or points"""
+        if self.zoom < self.lod_thresholds["points"]:
+            return "points"
+        if self.zoom < self.lod_thresholds["simplified"]:
+            return "simplified"
+        return "full"
+
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() / 120
+        if steps:
+            self.set_zoom(self.zoom * 1.15 ** steps, event.position())
+        event.accept()
 
 
     def set_theme(self, dark_mode):
         self.dark_mode = dark_mode
-        self.update()
+        self.invalidate_grid()
+        label_cache.clear()
+        self.invalidate()
 
 
     def mousePressEvent(self, event):
-        if event.button() == Qt.MouseButton.LeftButton:
+        if event.button() == Qt.MouseButton.MiddleButton:
+            self.panning = True
+            self.pan_anchor = event.position()
+            self.setCursor(Qt.CursorShape.ClosedHandCursor)
+        elif event.button() == Qt.MouseButton.LeftButton:
+            self.set_hover(None)
+            pos = self.to_world(event.position())
             clicked_node = None
             clicked_dot = False
             
-            for node in self.nodes:
-                if self.is_dot_clicked(node, event.pos()):
+            for node in self.nodes_at(pos):
+                if self.is_dot_clicked(node, pos):
                     clicked_node = node
                     clicked_dot = True
                     break
-                elif self.node_contains(node["pos"], event.pos()):
+                elif self.node_contains(node.pos, pos):
                     clicked_node = node
                     break
 
+            modifiers = event.modifiers()
             if clicked_node:
-                if clicked_dot or event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+                if clicked_dot or modifiers & Qt.KeyboardModifier.ControlModifier:
                     self.connecting = True
                     self.connection_start = clicked_node
-                    self.update()  # Force redraw to show connection state
+                    self.connection_cursor = pos
+                    self.overlay.update_world(self.hover_bounds(clicked_node))  # Show connection state
+                elif modifiers & Qt.KeyboardModifier.ShiftModifier:
+                    # Shift+click toggles a node in or out of the selection
+                    if clicked_node.id in self.selection:
+                        self.set_selection([n for n in self.selected_nodes() if n is not clicked_node])
+                    else:
+                        self.set_selection(self.selected_nodes() + [clicked_node])
                 else:
+                    # Dragging a selected node drags the whole selection
+                    if clicked_node.id not in self.selection:
+                        self.set_selection([clicked_node])
                     self.dragging = True
                     self.current_node = clicked_node
+                    self.drag_origin = {node.id: node.pos for node in self.selected_nodes()}
+            else:
+                # Empty space: rubber band selection, Alt draws a lasso
+                if not modifiers & Qt.KeyboardModifier.ShiftModifier:
+                    self.clear_selection()
+                self.selecting = "lasso" if modifiers & Qt.KeyboardModifier.AltModifier else "rect"
+                self.band_points = [event.position()]
 
     def mouseMoveEvent(self, event):
+        if self.panning:
+            delta = event.position() - self.pan_anchor
+            self.pan_anchor = event.position()
+            self.scroll_view(delta)
+            return
+
+        if self.selecting:
+            dirty = self.band_bounds()
+            if self.selecting == "lasso":
+                self.band_points.append(event.position())
+            else:
+                self.band_points[1:] = [event.position()]
+            self.overlay.update(dirty.united(self.band_bounds()))
+            return
+
+        pos = self.to_world(event.position())
         if self.dragging and self.current_node:
-            # Store old position for updating connections
-            old_pos = self.current_node["pos"]
-            
-            # Calculate new position
-            new_pos = event.pos()
+            # The grabbed node follows the cursor, the rest of the selection
+            # keeps its offset to it
+            new_pos = pos
             if self.snap_to_grid:
                 new_pos = self.snap_to_grid_pos(new_pos)
+            origin = self.drag_origin[self.current_node.id]
+            dx = new_pos.x() - origin.x()
+            dy = new_pos.y() - origin.y()
             
-            # Update node position
-            self.current_node["pos"] = new_pos
-            
-            # Update connectionss
-            for i, conn in enumerate(self.connections):
-                start, end = conn
-                if isinstance(start, QPoint) and isinstance(end, QPoint):
-                    if start == old_pos:
-                        self.connections[i] = (new_pos, end)
-                    elif end == old_pos:
-                        self.connections[i] = (start, new_pos)
+            # Update node positions, their connections follow by id. The
+            # drag is recorded once, on release
+            nodes = self.selected_nodes()
+            if not self.tiles.dynamic:
+                self.set_dynamic(nodes)
+            dirty = self.selection_region(nodes)
+            new_points = [(self.drag_origin[node.id].x() + dx,
+                           self.drag_origin[node.id].y() + dy) for node in nodes]
+            self.model.move_nodes(nodes, new_points)
             
-            self.update()
+            self.update_world(dirty.united(self.selection_region(nodes)), static=False)
         else:
             # Show tooltip for node under cursor
-            for node in self.nodes:
-                if self.node_contains(node["pos"], event.pos()):
-                    QToolTip.showText(
-                        event.globalPosition().toPoint(),
-                        node.get("name", node["type"]),
-                        self
-                    )
-                    break
+            node = self.node_at(pos)
+            self.set_hover(node)
+            if node:
+                QToolTip.showText(
+                    event.globalPosition().toPoint(),
+                    node.name,
+                    self
+                )
             else:
                 QToolTip.hideText()
                 
         # Handle connecting state
         if self.connecting and self.connection_start:
-            self.update()  # Redraw to show temporary connection line
+            # Redraw the area swept by the temporary connection line
+            dirty = self.rubber_band_bounds()
+            self.connection_cursor = pos
+            self.overlay.update_world(dirty.united(self.rubber_band_bounds()))
 
 
     def mouseReleaseEvent(self, event):
+        if self.panning and event.button() == Qt.MouseButton.MiddleButton:
+            self.panning = False
+            self.pan_anchor = None
+            self.unsetCursor()
+            return
+
+        if self.selecting:
+            dirty = self.band_bounds()
+            self.select_in_band(event.modifiers() & Qt.KeyboardModifier.ShiftModifier)
+            self.selecting = None
+            self.band_points = []
+            self.overlay.update(dirty)
+            return
+
+        pos = self.to_world(event.position())
         if self.dragging and self.current_node:
-            self.add_to_undo_stack({
-                'type': 'move_node',
-                'node': self.current_node,
-                'old_pos': QPoint(self.current_node['pos'].x(), self.current_node['pos'].y())
-            })
             self.dragging = False
             self.current_node = None
+            origin = self.drag_origin
+            self.drag_origin = None
+            self.set_dynamic([])
+            moved = [self.model.nodes_by_id[node_id] for node_id in origin
+                     if node_id in self.model.nodes_by_id]
+            moved = [node for node in moved if node.pos != origin[node.id]]
+            if moved:
+                self.history.record(MoveNodes([node.id for node in moved],
+                                              [(origin[node.id].x(), origin[node.id].y()) for node in moved],
+                                              geometry.positions(moved)))
         elif self.connecting and self.connection_start:
+            dirty = QRegion(self.rubber_band_bounds()).united(
+                self.hover_bounds(self.connection_start))
             end_node = None
-            for node in self.nodes:
-                if node != self.connection_start and (self.node_contains(node["pos"], event.pos()) or self.is_dot_clicked(node, event.pos())):
+            for node in self.nodes_at(pos):
+                if node is not self.connection_start and (self.node_contains(node.pos, pos) or self.is_dot_clicked(node, pos)):
                     end_node = node
                     break
             
             if end_node:
-                new_connection = (self.connection_start["pos"], end_node["pos"])
-                self.connections.append(new_connection)
-                self.add_to_undo_stack({
-                    'type': 'add_connection',
-                    'connection': new_connection
-                })
+                self.connect_nodes(self.connection_start, end_node)
             
             self.connecting = False
             self.connection_start = None
-            self.update()
+            self.connection_cursor = None
+            self.overlay.update_world(dirty)
 
 
     def node_contains(self, node_pos, point):
         return abs(node_pos.x() - point.x()) < 25 and abs(node_pos.y() - point.y()) < 25
 
-    def add_to_undo_stack(self, action):
-        self.undo_stack.append(action)
-        self.redo_stack.clear()
+    def node_bounds(self, node):
+        """Canvas area painted for a node, its connection dot and its label"""
+        left, top, right, bottom = self.model.node_rect(node)
+        return QRect(QPoint(int(left), int(top)), QPoint(int(right), int(bottom))).adjusted(-2, -2, 2, 2)
+
+    def connection_bounds(self, connection):
+        """Canvas area painted for a connection line and its arrow head"""
+        start, end = self.model.connection_points(connection)
+        return QRect(start, end).normalized().adjusted(-12, -12, 12, 12)
+
+    def node_region(self, node):
+        """Area to repaint when a node moves: the node plus its connections"""
+        region = QRegion(self.node_bounds(node))
+        for conn in self.model.adjacency.get(node.id, ()):
+            region = region.united(self.connection_bounds(conn))
+        return region
+
+    def hover_rect(self, node):
+        """Highlight drawn around a hovered node, just outside its border"""
+        return QRect(node.x - 28, node.y - 28, 56, 56)
+
+    def hover_bounds(self, node):
+        return self.hover_rect(node).adjusted(-2, -2, 2, 2)
+
+    def set_hover(self, node):
+        if node is self.hover_node:
+            return
+        dirty = QRegion()
+        for changed in (self.hover_node, node):
+            if changed is not None:
+                dirty = dirty.united(self.hover_bounds(changed))
+        self.hover_node = node
+        self.overlay.update_world(dirty)
+
+    def leaveEvent(self, event):
+        self.set_hover(None)
+        super().leaveEvent(event)
+
+    def rubber_band_bounds(self):
+        """Area covered by the temporary line drawn while connecting"""
+        if not self.connection_start or self.connection_cursor is None:
+            return QRect()
+        start = self.node_dot_pos(self.connection_start)
+        return QRect(start, self.connection_cursor).normalized().adjusted(-2, -2, 2, 2)
+
+    def selected_nodes(self):
+        return list(self.selection.values())
+
+    def set_selection(self, nodes):
+        """Replace the selection, repainting the nodes whose highlight changed"""
+        new_selection = {node.id: node for node in nodes}
+        changed = [node for node_id, node in self.selection.items() if node_id not in new_selection]
+        changed += [node for node_id, node in new_selection.items() if node_id not in self.selection]
+        self.selection = new_selection
+        if len(changed) > 64:
+            self.invalidate()
+        else:
+            for node in changed:
+                self.update_world(self.node_bounds(node))
+
+    def clear_selection(self):
+        self.set_selection([])
+
+    def select_all(self):
+        self.set_selection(self.nodes)
+
+    def drop_from_selection(self, nodes):
+        """Forget removed nodes without repainting, the removal repaints them"""
+        for node in nodes:
+            self.selection.pop(node.id, None)
+
+    def selection_region(self, nodes):
+        """Area to repaint when nodes move: the nodes plus their connections"""
+        if len(nodes) <= 64:
+            region = QRegion()
+            for node in nodes:
+                region = region.united(self.node_region(node))
+            return region
+        # Large selections: one bounding rectangle is far cheaper than a union
+        rects = [self.model.node_rect(node) for node in nodes]
+        connections = {}
+        for node in nodes:
+            for conn in self.model.adjacency.get(node.id, ()):
+                connections[id(conn)] = conn
+        for conn in connections.values():
+            x1, y1, x2, y2 = self.model.connection_line(conn)
+            rects.append((min(x1, x2) - 12, min(y1, y2) - 12, max(x1, x2) + 12, max(y1, y2) + 12))
+        return self.bounding_region(rects)
+
+    def bounding_region(self, rects):
+        """One rectangle around (left, top, right, bottom) rects, with the node_bounds() margin"""
+        left = min(rect[0] for rect in rects)
+        top = min(rect[1] for rect in rects)
+        right = max(rect[2] for rect in rects)
+        bottom = max(rect[3] for rect in rects)
+        return QRegion(QRect(QPoint(int(left) - 2, int(top) - 2),
+                             QPoint(int(right) + 2, int(bottom) + 2)))
+
+    def label_rect(self, node, font=None):
+        """Canvas area of a node's label, as wide as its text"""
+        half = label_cache.text_width(node.name, font or self.font()) / 2 + 1
+        top = node.y + self.model.NODE_HALF_SIZE + self.model.LABEL_GAP
+        return (node.x - half, top, node.x + half, top + self.model.LABEL_HEIGHT)
+
+    def label_overlaps(self, node, rects=None):
+        """
+        Nodes whose label overlaps the label of node. rects memoizes
+        label_rect() by node id across calls.
+        """
+        if rects is None:
+            rects = {}
+        font = self.font()
+        rect = rects.get(node.id)
+        if rect is None:
+            rect = rects[node.id] = self.label_rect(node, font)
+        left, top, right, bottom = rect
+        overlaps = []
+        for other in self.model.nodes_in_rect(rect):
+            if other is node:
+                continue
+            # Labels sit at a fixed offset under their node, rows apart never meet
+            if abs(other.y - node.y) >= self.model.LABEL_HEIGHT:
+                continue
+            other_rect = rects.get(other.id)
+            if other_rect is None:
+                other_rect = rects[other.id] = self.label_rect(other, font)
+            if other_rect[0] < right and other_rect[2] > left:
+                overlaps.append(other)
+        return overlaps
+
+    def labels_shown(self, nodes, ignore=()):
+        """
+        Label collision culling: the ids of nodes whose label is drawn.
+
+        Labels are placed oldest node (lowest id) first and one overlapping
+        a label already placed is left out. Only the chain of older labels
+        overlapping a node's decides, so every tile reaches the same answer.
+        Nodes in ignore place no label.
+        """
+        older = {}
+        rects = {}
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            if node.id in older:
+                continue
+            older[node.id] = [other for other in self.label_overlaps(node, rects)
+                              if other.id < node.id and other.id not in ignore]
+            stack.extend(older[node.id])
+        shown = set()
+        for node_id in sorted(older):
+            if not any(other.id in shown for other in older[node_id]):
+                shown.add(node_id)
+        return shown
+
+    def label_region(self, nodes):
+        """
+        Area of the labels nodes may hide or reveal when they move, appear
+        or go: all labels chained to theirs by overlaps, see labels_shown()
+        """
+        linked = {}
+        rects = {}
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            if node.id not in linked:
+                linked[node.id] = node
+                stack.extend(self.label_overlaps(node, rects))
+        if len(linked) <= 64:
+            region = QRegion()
+            for node in linked.values():
+                region = region.united(self.node_bounds(node))
+            return region
+        return self.bounding_region([self.model.node_rect(node) for node in linked.values()])
+
+    def set_dynamic(self, nodes):
+        """
+        Draw nodes and their connections over the cached tiles instead of in
+        them, so moving them leaves the tiles alone. An empty list puts the
+        previous ones back into the tiles.
+        """
+        nodes_by_id = self.model.nodes_by_id
+        changed = [nodes_by_id[node_id] for node_id in self.tiles.dynamic if node_id in nodes_by_id]
+        changed += nodes
+        self.tiles.set_dynamic(node.id for node in nodes)
+        self.update_world(self.selection_region(changed).united(self.label_region(changed)))
+
+    def band_polygon(self):
+        """Rubber band outline in widget coordinates"""
+        if self.selecting == "rect" and len(self.band_points) > 1:
+            return QPolygonF(QRectF(self.band_points[0], self.band_points[-1]).normalized())
+        return QPolygonF(self.band_points)
+
+    def band_bounds(self):
+        """Widget area covered by the rubber band and its outline"""
+        if not self.band_points:
+            return QRegion()
+        return QRegion(self.band_polygon().boundingRect().toAlignedRect().adjusted(-2, -2, 2, 2))
+
+    def select_in_band(self, extend=False):
+        """Select the nodes whose centre lies inside the rubber band"""
+        if len(self.band_points) < 2:
+            return
+        polygon = self.world_transform().inverted()[0].map(self.band_polygon())
+        bounds = polygon.boundingRect()
+        candidates = self.model.nodes_in_rect(
+            (bounds.left(), bounds.top(), bounds.right(), bounds.bottom()))
+        if self.selecting == "rect":
+            hits = [node for node in candidates if bounds.contains(QPointF(node.x, node.y))]
+        else:
+            hits = [node for node in candidates
+                    if polygon.containsPoint(QPointF(node.x, node.y), Qt.FillRule.OddEvenFill)]
+        if extend:
+            hits = self.selected_nodes() + [node for node in hits if node.id not in self.selection]
+        self.set_selection(hits)
+
+    def copy_selection(self):
+        """Copy the selected nodes and the connections between them"""
+        nodes = self.selected_nodes()
+        if not nodes:
+            return
+        ids = set(self.selection)
+        self.clipboard = {
+            'nodes': [{
+                'id': node.id,
+                'type': node.type,
+                'pos': {'x': node.x, 'y': node.y},
+                'name': node.name,
+                'characteristics': dict(node.characteristics) if node.has_characteristics() else {}
+            } for node in nodes],
+            'connections': [{'source': a, 'target': b}
+                            for a, b in self.connections if a in ids and b in ids]
+        }
+        self.paste_count = 0
+
+    def paste(self):
+        """Paste the copied nodes, offset by a grid step, as one undo step"""
+        if not self.clipboard:
+            return
+        self.paste_count += 1
+        offset = self.grid_size * self.paste_count
+        new_ids = {}
+        nodes = []
+        for data in self.clipboard['nodes']:
+            node = Node(data['type'],
+                        QPoint(data['pos']['x'] + offset, data['pos']['y'] + offset),
+                        data['name'],
+                        dict(data['characteristics']))
+            self.add_node(node)
+            new_ids[data['id']] = node.id
+            nodes.append(node)
+        connections = [self.add_connection((new_ids[data['source']], new_ids[data['target']]))
+                       for data in self.clipboard['connections']]
+        self.history.record(AddNodes.from_nodes(nodes, connections, "Paste"))
+        self.set_selection(nodes)
+        self.update_world(self.selection_region(nodes))
+
+    def delete_selection(self):
+        self.delete_nodes(self.selected_nodes())
+
+    def snap_selection(self):
+        return self.snap_nodes(self.selected_nodes())
+
+    def align_selection(self, mode):
+        return self.align_nodes(self.selected_nodes(), mode)
+
+    def distribute_selection(self, axis):
+        return self.distribute_nodes(self.selected_nodes(), axis)
+
+    def keyPressEvent(self, event):
+        key = event.key()
+        if key in (Qt.Key.Key_Delete, Qt.Key.Key_Backspace) and self.selection:
+            self.delete_selection()
+        elif key == Qt.Key.Key_Escape and self.selection:
+            self.clear_selection()
+        else:
+            super().keyPressEvent(event)
+
+    def rebuild_index(self):
+        """Re-register every node and connection with the spatial indexes"""
+        self.model.rebuild_index()
+
+    def add_node(self, node):
+        return self.model.add_node(node)
+
+    def add_connection(self, connection):
+        return self.model.add_connection(connection)
+
+    def remove_connection(self, connection):
+        return self.model.remove_connection(connection)
+
+    def connections_at(self, pos):
+        """Connections passing near pos, in list order"""
+        with self.profiler.measure("hit_test"):
+            return self.model.connections_at(pos)
+
+    def nodes_at(self, pos):
+        """Nodes whose body or connection dot may cover pos, in list order"""
+        with self.profiler.measure("hit_test"):
+            return self.model.nodes_at(pos)
+
+    def node_at(self, pos):
+        for node in self.nodes_at(pos):
+            if self.node_contains(node.pos, pos):
+                return node
+        return None
+
+    def insert_nodes(self, nodes, connections=(), label="Add"):
+        """Add nodes and connections as one undo step"""
+        for node in nodes:
+            self.add_node(node)
+        connections = [self.add_connection(conn) for conn in connections]
+        self.history.record(AddNodes.from_nodes(nodes, connections, label))
+        self.invalidate()
+
+    def connect_nodes(self, start_node, end_node):
+        """Link two nodes as one undo step, returning the new connection"""
+        connection = self.add_connection((start_node.id, end_node.id))
+        self.history.record(AddConnection(connection))
+        self.update_world(self.connection_bounds(connection))
+        return connection
 
     def undo(self):
-        if len(self.undo_stack) > 0:
-            action = self.undo_stack.pop()
-            self.redo_stack.append(action)
-            
-            if action['type'] == 'add_node':
-                self.nodes.remove(action['node'])
-            elif action['type'] == 'delete_node':
-                self.nodes.append(action['node'])
-            elif action['type'] == 'move_node':
-                node = action['node']
-                current_pos = node['pos']
-                node['pos'] = action['old_pos']
-                action['old_pos'] = current_pos
-                # Update connected lines
-                for i, conn in enumerate(self.connections):
-                    start, end = conn
-                    if start == current_pos:
-                        self.connections[i] = (node['pos'], end)
-                    elif end == current_pos:
-                        self.connections[i] = (start, node['pos'])
-            elif action['type'] == 'add_connection':
-                if action['connection'] in self.connections:
-                    self.connections.remove(action['connection'])
-            elif action['type'] == 'delete_connection':
-                self.connections.append(action['connection'])
-                
-            self.update()
+        if self.history.undo():
+            self.refresh_selection()
+            self.invalidate()
 
     def redo(self):
-        if len(self.redo_stack) > 0:
-            action = self.redo_stack.pop()
-            self.undo_stack.append(action)
-            
-            if action['type'] == 'add_node':
-                self.nodes.append(action['node'])
-            elif action['type'] == 'delete_node':
-                self.nodes.remove(action['node'])
-            elif action['type'] == 'move_node':
-                node = action['node']
-                current_pos = node['pos']
-                node['pos'] = action['old_pos']
-                action['old_pos'] = current_pos
-                # Update connected lines
-                for i, conn in enumerate(self.connections):
-                    start, end = conn
-                    if start == current_pos:
-                        self.connections[i] = (node['pos'], end)
-                    elif end == current_pos:
-                        self.connections[i] = (start, node['pos'])
-            elif action['type'] == 'add_connection':
-                self.connections.append(action['connection'])
-            elif action['type'] == 'delete_connection':
-                if action['connection'] in self.connections:
-                    self.connections.remove(action['connection'])
-            
-            self.update()
+        if self.history.redo():
+            self.refresh_selection()
+            self.invalidate()
+
+    def jump_to(self, position):
+        """Go to any step of the history with a single repaint"""
+        self.history.jump_to(position)
+        self.refresh_selection()
+        self.invalidate()
+
+    def refresh_selection(self):
+        """Undo re-creates removed nodes, select the live node for every selected id"""
+        self.set_hover(None)
+        selection = {}
+        for node_id in self.selection:
+            node = self.model.get_node(node_id)
+            if node is not None:
+                selection[node_id] = node
+        self.selection = selection
 
     def toggle_snap_to_grid(self):
         self.snap_to_grid = not self.snap_to_grid
+        self.invalidate_grid()
         if self.snap_to_grid:
-            for node in self.nodes:
-                node["pos"] = self.snap_to_grid_pos(node["pos"])
-        self.update()
+            self.snap_nodes()
+        self.invalidate()
 
     def snap_to_grid_pos(self, pos):
         if self.snap_to_grid:
@@ -456,62 +997,99 @@ class Canvas(QWidget):
         return pos
 
 
+    def move_nodes(self, nodes, points, label="Move"):
+        """
+        Move nodes to new positions as a single undoable step.
+
+        points is an (N, 2) array matching nodes, as returned by the
+        utils.geometry operations.
+        """
+        old_points = geometry.positions(nodes)
+        changed = (old_points != points).any(axis=1)
+        if not changed.any():
+            return []
+        moved_nodes = [node for node, moved in zip(nodes, changed.tolist()) if moved]
+        self.model.move_nodes(moved_nodes, points[changed])
+        self.history.record(MoveNodes([node.id for node in moved_nodes],
+                                      old_points[changed], points[changed], label))
+        self.invalidate()
+        return moved_nodes
+
+    def snap_nodes(self, nodes=None):
+        """Snap nodes (all of them by default) to the grid"""
+        nodes = list(self.nodes if nodes is None else nodes)
+        return self.move_nodes(nodes, geometry.snap(geometry.positions(nodes), self.grid_size),
+                               "Snap to Grid")
+
+    def translate_nodes(self, nodes, dx, dy):
+        nodes = list(nodes)
+        points = geometry.translate(geometry.positions(nodes), dx, dy)
+        if self.snap_to_grid:
+            points = geometry.snap(points, self.grid_size)
+        return self.move_nodes(nodes, points)
+
+    def align_nodes(self, nodes, mode):
+        """Align nodes: left, right, top, bottom, hcenter or vcenter"""
+        nodes = list(nodes)
+        return self.move_nodes(nodes, geometry.align(geometry.positions(nodes), mode), "Align")
+
+    def distribute_nodes(self, nodes, axis):
+        """Space nodes evenly along axis: horizontal or vertical"""
+        nodes = list(nodes)
+        return self.move_nodes(nodes, geometry.distribute(geometry.positions(nodes), axis),
+                               "Distribute")
+
     def rename_node(self, node):
         from PyQt6.QtWidgets import QInputDialog
-        old_name = node.get("name", node["type"])
+        old_name = node.name
         new_name, ok = QInputDialog.getText(self, "Rename Node", 
                                           "Enter new name:", 
                                           text=old_name)
         if ok and new_name:
-            node["name"] = new_name
-            self.update()
+            self.edit_node(node, name=new_name, label="Rename")
+
+    def edit_node(self, node, name=None, characteristics=None, label="Edit"):
+        """Rename node and/or replace its characteristics as one undo step"""
+        old = EditNode.state(node)
+        command = EditNode(node.id, old, (old[0] if name is None else name,
+                                          old[1] if characteristics is None else dict(characteristics) or None),
+                           label)
+        if command.is_noop():
+            return
+        command.redo(self.model)
+        self.history.record(command)
+        if node.name != old[0]:
+            label_cache.forget(old[0])
+            self.invalidate()
 
 
     def delete_node(self, node):
         """Delete a node and its connections"""
-        self.add_to_undo_stack({
-            'type': 'delete_node',
-            'node': node.copy()  # Store copy of node for undo
-        })
-        
-        # Remove all connections to/from this node
-        connections_to_remove = []
-        for conn in self.connections:
-            start, end = conn
-            if start == node["pos"] or end == node["pos"]:
-                connections_to_remove.append(conn)
-                # Add connection to undo stack
-                self.add_to_undo_stack({
-                    'type': 'delete_connection',
-                    'connection': conn  # Store connection for undo
-                })
-        
-        # Remove the connections
-        for conn in connections_to_remove:
-            self.connections.remove(conn)
-        
-        # Remove the node
-        self.nodes.remove(node)
-        self.update()
+        self.delete_nodes([node])
+
+    def delete_nodes(self, nodes):
+        """Delete nodes and all their connections as a single undo step"""
+        nodes = list(nodes)
+        if not nodes:
+            return
+        dirty = self.selection_region(nodes).united(self.label_region(nodes))
+        self.drop_from_selection(nodes)
+        self.set_hover(None)
+        command = RemoveNodes.from_nodes(nodes)
+        command.connections = tuple(self.model.remove_nodes(nodes))
+        self.history.record(command)
+        self.update_world(dirty)
 
     def delete_connection(self, connection):
         """Delete a connection"""
-        # For undo/redo, store a copy of the connection tuple
-        self.add_to_undo_stack({
-            'type': 'delete_connection',
-            'connection': connection  # Since it's a tuple, we can store it directly
-        })
-        
-        self.connections.remove(connection)
-        self.update()
+        self.remove_connection(connection)
+        self.history.record(RemoveConnection(connection))
+        self.invalidate()
 
     def connection_contains(self, connection, pos):
         """Check if position is near a connection line"""
         # Get start and end points
-        if isinstance(connection, tuple):
-            start, end = connection
-        else:
-            start, end = connection["start"], connection["end"]
+        start, end = self.model.connection_points(connection)
 
         # Calculate distance from point to line
         line_len = ((end.x() - start.x())**2 + (end.y() - start.y())**2)**0.5
@@ -558,116 +1136,331 @@ class Canvas(QWidget):
                 self.setLayout(layout)
             self.map_widget.show()
             # Hide grid
-            self.update()  # Force redraw
+            self.invalidate()  # Force redraw
         else:
             if self.map_widget:
                 self.map_widget.hide()
             # Show grid
-            self.update()  # Force redraw
+            self.invalidate()  # Force redraw
         self.map_mode = not self.map_mode
 
 
+    def paint_style(self):
+        """Pens and brushes for the current theme, built once per theme"""
+        style = self.paint_styles.get(self.theme)
+        if style is None:
+            if self.theme == "light":
+                line, border, accent, text = "#000000", "#000000", "#0078d7", "#000000"
+            else:
+                line, border, accent, text = "#00ffff", "#ffffff", "#00ffff", "#ffffff"
+            band = QColor(accent)
+            band.setAlpha(40)
+            style = {
+                "connection_pen": QPen(QColor(line), 2),
+                "connection_brush": QBrush(QColor(line)),
+                "border_pen": QPen(QColor(border), 2),
+                "selected_border_pen": QPen(QColor(accent), 2),
+                "band_pen": QPen(QColor(accent), 1, Qt.PenStyle.DashLine),
+                "hover_pen": QPen(QColor(accent), 1),
+                "band_brush": QBrush(band),
+                "dot_brush": QBrush(QColor(accent)),
+                "text_pen": QPen(QColor(text)),
+            }
+            self.paint_styles[self.theme] = style
+        return style
+
     def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        
-        # Draw grid
-        self.draw_grid(painter)
+        profiler = self.profiler
+        profiler.begin_frame()
+        dpr = self.devicePixelRatioF()
+        width, height = int(self.width() * dpr), int(self.height() * dpr)
+        cache = self.scene_cache
+        if cache is None or cache.width() != width or cache.height() != height:
+            cache = self.scene_cache = QPixmap(width, height)
+            cache.setDevicePixelRatio(dpr)
+            # Transparent, so the widget background shows through as before
+            cache.fill(Qt.GlobalColor.transparent)
+            self.scene_dirty = QRegion(self.rect())
         
-        # Draw connections
-        pen = QPen(QColor("#00ffff"), 2)
-        painter.setPen(pen)
-        for conn in self.connections:
-            self.draw_connection(painter, conn)
-        
-        # Draw temporary connection line
-        if self.connecting and self.connection_start:
-            start_pos = QPoint(
-                self.connection_start["dot_pos"].x(),
-                self.connection_start["dot_pos"].y()
-            )
-            pos = self.mapFromGlobal(self.cursor().pos())
-            painter.drawLine(start_pos, pos)
+        # Render what changed into the cache, then copy the exposed area
+        dirty = self.scene_dirty.intersected(self.rect())
+        if not dirty.isEmpty():
+            self.scene_dirty = QRegion()
+            painter = QPainter(cache)
+            painter.setClipRegion(dirty)
+            painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+            painter.fillRect(dirty.boundingRect(), Qt.GlobalColor.transparent)
+            painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_SourceOver)
+            self.render_scene(painter, dirty.boundingRect())
+            painter.end()
         
-        # Draw nodes
-        for node in self.nodes:
-            self.draw_node(painter, node)
+        rect = QRectF(event.rect())
+        source = QRectF(rect.x() * dpr, rect.y() * dpr, rect.width() * dpr, rect.height() * dpr)
+        with profiler.phase("blit"):
+            painter = QPainter(self)
+            painter.drawPixmap(rect, cache, source)
+            painter.end()
+        profiler.end_frame()
 
-    def draw_node(self, painter, node):
-        x = node["pos"].x() - 25
-        y = node["pos"].y() - 25
+    def render_scene(self, painter, rect):
+        """Compose rect (widget coordinates): the grid, the static tiles, then the dynamic layer"""
+        started = time.perf_counter()
+        profiler = self.profiler
+
+        # Draw grid
+        with profiler.phase("grid"):
+            self.draw_grid(painter, rect)
+
+        stats = self.tiles.draw(painter, rect)
+
+        # Dragged nodes and their connections, drawn fresh every frame
+        if self.tiles.dynamic:
+            with profiler.phase("capture"):
+                scene = self.capture_scene(self.visible_world_rect(rect), dynamic=True)
+            painter.setTransform(scene.transform)
+            self.draw_scene(painter, scene, profiler)
+            stats["nodes"] += len(scene.nodes)
+            stats["connections"] += len(scene.lines)
+
+        # Whatever was not rendered this frame was culled, by the tiles or
+        # by the spatial index
+        if stats["nodes"] or stats["connections"]:
+            profiler.count("nodes_culled", max(0, len(self.model.nodes) - stats["nodes"]))
+            profiler.count("connections_culled",
+                           max(0, len(self.model.connections) - stats["connections"]))
+
+        stats.update({
+            "lod": self.lod_tier(),
+            "zoom": self.zoom,
+            "ms": (time.perf_counter() - started) * 1000,
+        })
+        self.last_frame_stats = stats
+        self.frame_rendered.emit(self.last_frame_stats)
+
+    def capture_scene(self, area, dynamic=False):
+        """
+        Snapshot of what is drawn in the canvas area (left, top, right,
+        bottom): the static layer, or only the dynamic one with dynamic=True.
+        Runs on the GUI thread, the result can be drawn on any thread.
+        """
+        # Arrow heads reach past the indexed pick area
+        margin = 12
+        connections = self.model.connections_in_rect(
+            (area[0] - margin, area[1] - margin, area[2] + margin, area[3] + margin))
+        nodes = self.model.nodes_in_rect((area[0] - 2, area[1] - 2, area[2] + 2, area[3] + 2))
+
+        moving = self.tiles.dynamic
+        if dynamic:
+            connections = [conn for conn in connections if conn[0] in moving or conn[1] in moving]
+            nodes = [node for node in nodes if node.id in moving]
+        elif moving:
+            connections = [conn for conn in connections
+                           if conn[0] not in moving and conn[1] not in moving]
+            nodes = [node for node in nodes if node.id not in moving]
+
+        # Faces and labels are pre-scaled for the zoom so they stay sharp and
+        # cheap to blit
+        tier = self.lod_tier()
+        style = self.paint_style()
+        font = self.font()
+        text_color = style["text_pen"].color()
+        # Moving nodes do not hide labels in the tiles, the tiles would
+        # change on every step of a drag
+        shown = self.labels_shown(nodes, () if dynamic else moving) if tier == "full" else ()
+        scale = round(self.devicePixelRatioF() * self.zoom, 2)
+        faces = {}
+        records = []
+        for node in nodes:
+            face = faces.get(node.type)
+            if face is None:
+                face = faces[node.type] = icon_cache.node_image(node.type, 50, self.theme, scale)
+            label = None
+            if node.id in shown:
+                label = label_cache.label_image(node.name, font, text_color,
+                                                self.model.LABEL_HEIGHT, scale)
+            records.append((node.x, node.y, node.type, face, label, node.id in self.selection))
+
+        connection_line = self.model.connection_line
+        return SceneSnapshot(tier, self.zoom, self.theme, style, self.world_transform(),
+                             records, [connection_line(conn) for conn in connections])
+
+    def draw_scene(self, painter, scene, profiler=None):
+        """
+        Draw a captured scene; only reads the snapshot, so tile workers can
+        call it. Timings and counts go to profiler, on the GUI thread only.
+        """
+        clock = time.perf_counter
+        started = clock()
+        if scene.tier == "points":
+            self.draw_overview(painter, scene)
+            if profiler is not None:
+                profiler.add_time("overview", clock() - started)
+                profiler.count("nodes_drawn", len(scene.nodes))
+                profiler.count("connections_drawn", len(scene.lines))
+            return
+
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        detail = scene.tier == "full"
+
+        # Draw connections, arrow heads only at full detail
+        self.draw_connections(painter, scene.lines, scene.style, arrows=detail)
+        edges_done = clock()
+
+        # Draw nodes, each label right after its node so later nodes still
+        # cover it
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        labels_time = 0.0
+        labels = 0
+        for node in scene.nodes:
+            self.draw_node(painter, node, scene.style, detail)
+            if detail and node[4] is not None:
+                label_started = clock()
+                self.draw_label(painter, node)
+                labels_time += clock() - label_started
+                labels += 1
+
+        if profiler is not None:
+            profiler.add_time("edges", edges_done - started)
+            profiler.add_time("nodes", clock() - edges_done - labels_time)
+            profiler.add_time("labels", labels_time)
+            profiler.count("nodes_drawn", len(scene.nodes))
+            profiler.count("connections_drawn", len(scene.lines))
+            if detail:
+                profiler.count("labels_drawn", labels)
+                profiler.count("labels_hidden", len(scene.nodes) - labels)
+
+    def draw_connections(self, painter, lines, style, arrows=True):
+        """
+        Draw all connections with one drawLines call and their arrow heads as
+        filled paths, instead of a pen, a line and a polygon per connection.
+        """
+        qlines = []
+        heads = []
+        for x1, y1, x2, y2 in lines:
+            start = QPointF(x1, y1)
+            end = QPointF(x2, y2)
+            qlines.append(QLineF(start, end))
+            if arrows:
+                # Grown by half the pen width so they can be filled without stroking
+                head = self.arrow_head(start, end, outline=1)
+                if head is not None:
+                    heads.append(head)
+
+        painter.setPen(style["connection_pen"])
+        painter.drawLines(qlines)
+
+        # The raster engine fills a path in time proportional to its size
+        # times its edges, so very large batches are split up
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(style["connection_brush"])
+        batch = self.ARROW_BATCH_SIZE
+        for i in range(0, len(heads), batch):
+            path = QPainterPath()
+            # Arrow heads share one orientation, so overlapping ones never cancel out
+            path.setFillRule(Qt.FillRule.WindingFill)
+            for head in heads[i:i + batch]:
+                path.addPolygon(head)
+                path.closeSubpath()
+            painter.drawPath(path)
+
+    def draw_overview(self, painter, scene):
+        """
+        Cheapest level of detail: connections that land on the same screen
+        cells are merged into one line and nodes are drawn as points coloured
+        by type, each group submitted in a single call.
+        """
+        cell = 3 / scene.zoom  # merge endpoints closer than ~3 screen pixels
+
+        points = {}
+        for x, y, node_type, _face, _label, _selected in scene.nodes:
+            points.setdefault(node_type, QPolygonF()).append(QPointF(x, y))
+
+        # Connections run between node centres, so an end's cell is its node's
+        lines = set()
+        for x1, y1, x2, y2 in scene.lines:
+            a = (int(x1 // cell), int(y1 // cell))
+            b = (int(x2 // cell), int(y2 // cell))
+            if a != b:
+                lines.add((a, b) if a < b else (b, a))
+
+        line_color = QColor("#0078d7") if scene.theme == "light" else QColor("#00ffff")
+        line_color.setAlpha(160)
+        pen = QPen(line_color, 1)
+        pen.setCosmetic(True)
+        painter.setPen(pen)
+        # Merged lines run between cell centres
+        half = cell / 2
+        painter.drawLines([QLineF(ax * cell + half, ay * cell + half, bx * cell + half, by * cell + half)
+                           for (ax, ay), (bx, by) in lines])
+
+        for node_type, polygon in points.items():
+            pen = QPen(QColor(self.LOD_POINT_COLORS.get(node_type, "#ffffff")), 4)
+            pen.setCosmetic(True)
+            pen.setCapStyle(Qt.PenCapStyle.SquareCap)
+            painter.setPen(pen)
+            painter.drawPoints(polygon)
+
+    def draw_node(self, painter, node, style, detail=True):
+        """Draw a node record from capture_scene()"""
+        node_x, node_y, _type, face, _label, selected = node
+        x = node_x - 25
+        y = node_y - 25
         width = 50
         height = 50
-        
-        # Theme-aware colors
-        if self.theme == "light":
-            background_color = QColor("#ffffff")
-            border_color = QColor("#000000") if self.connection_start != node else QColor("#0078d7")
-            text_color = QColor("#000000")
-            dot_color = QColor("#0078d7")
-        else:
-            background_color = QColor("#2a2a2a")
-            border_color = QColor("#ffffff") if self.connection_start != node else QColor("#00ffff")
-            text_color = QColor("#ffffff")
-            dot_color = QColor("#00ffff")
-        
-        # Draw node background
-        painter.fillRect(x, y, width, height, background_color)
-        
-        # Draw icon
-        if "icon" in node:
-            icon_rect = QRectF(x + 5, y + 5, width - 10, height - 10)
-            node["icon"].paint(painter, icon_rect.toRect())
-        
+
+        # Draw node background and icon from the shared pre-scaled image
+        painter.drawImage(x, y, face)
+
         # Draw border
-        pen = QPen(border_color, 2)
-        painter.setPen(pen)
-        painter.setBrush(Qt.BrushStyle.NoBrush)
+        if selected:
+            painter.setPen(style["selected_border_pen"])
+        else:
+            painter.setPen(style["border_pen"])
         painter.drawRect(x, y, width, height)
-        
+
+        # Zoomed out: the dot and label would be too small to read
+        if not detail:
+            return
+
         # Draw connection dot
         dot_radius = 6
         dot_x = x + width + 15
         dot_y = y + height/2
-        painter.setBrush(dot_color)
+        painter.setBrush(style["dot_brush"])
         painter.setPen(Qt.PenStyle.NoPen)
         painter.drawEllipse(QPoint(int(dot_x), int(dot_y)), dot_radius, dot_radius)
-        
-        # Store dot position
-        node["dot_pos"] = QPoint(int(dot_x), int(dot_y))
-        
-        # Draw node text with wider area
-        painter.setPen(text_color)
-        text = node.get("name", node["type"])
-        
-        # Create text rectangle with more width
-        text_width = max(width + 60, len(text) * 8)  # Increased width for text
-        text_x = x + (width / 2) - (text_width / 2)
-        text_rect = QRectF(text_x, y + height + 5, text_width, 20)
-        
-        # Draw text
-        painter.drawText(text_rect, Qt.AlignmentFlag.AlignCenter, text)
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+
+    def draw_label(self, painter, node):
+        """
+        Draw the pre-rendered name of a node record, centred under the node
+        on a whole canvas unit like the face, so every tile rounds it to the
+        same pixel
+        """
+        node_x, node_y, _type, _face, label, _selected = node
+        painter.drawImage(QPointF(node_x - round(label.deviceIndependentSize().width() / 2),
+                                  node_y + 30), label)
 
 
     def contextMenuEvent(self, event):
         menu = QMenu(self)
-        clicked_pos = event.pos()
+        clicked_pos = self.to_world(QPointF(event.pos()))
         clicked_node = None
         clicked_connection = None
 
         # Check for clicked node
-        for node in self.nodes:
-            if self.node_contains(node["pos"], clicked_pos):
-                clicked_node = node
-                break
+        clicked_node = self.node_at(clicked_pos)
 
         # Check for clicked connection
-        for conn in self.connections:
+        for conn in self.connections_at(clicked_pos):
             if self.connection_contains(conn, clicked_pos):
                 clicked_connection = conn
                 break
 
-        if clicked_node:
+        if clicked_node and clicked_node.id in self.selection and len(self.selection) > 1:
+            self.add_selection_actions(menu)
+
+        elif clicked_node:
             rename_action = menu.addAction("Rename")
             rename_action.triggered.connect(lambda: self.rename_node(clicked_node))
             
@@ -684,6 +1477,24 @@ class Canvas(QWidget):
         if menu.actions():
             menu.exec(event.globalPos())
 
+    def add_selection_actions(self, menu):
+        """Context menu entries acting on a multi-node selection"""
+        count = len(self.selection)
+        menu.addAction("Copy").triggered.connect(self.copy_selection)
+        menu.addAction(f"Delete {count} Nodes").triggered.connect(self.delete_selection)
+        menu.addSeparator()
+        menu.addAction("Snap to Grid").triggered.connect(self.snap_selection)
+        align_menu = menu.addMenu("Align")
+        for label, mode in (("Left", "left"), ("Right", "right"), ("Top", "top"),
+                            ("Bottom", "bottom"), ("Horizontal Centre", "hcenter"),
+                            ("Vertical Centre", "vcenter")):
+            align_menu.addAction(label).triggered.connect(
+                lambda checked=False, mode=mode: self.align_selection(mode))
+        distribute_menu = menu.addMenu("Distribute")
+        for label, axis in (("Horizontally", "horizontal"), ("Vertically", "vertical")):
+            distribute_menu.addAction(label).triggered.connect(
+                lambda checked=False, axis=axis: self.distribute_selection(axis))
+
     def open_terminal(self):
         system = platform.system().lower()
         try:
@@ -707,34 +1518,33 @@ class Canvas(QWidget):
             QMessageBox.warning(self, "Error", f"Failed to open terminal: {str(e)}")
 
     def mouseDoubleClickEvent(self, event):
-        for node in self.nodes:
-            if self.node_contains(node["pos"], event.pos()):
-                if node["type"] == "CCTV":
-                    self.show_cctv_dialog(node)
-                elif node["type"] == "TPE":
-                    self.show_tpe_dialog(node)
-                elif node["type"] == "Controller":
-                    self.show_controller_dialog(node)
-                elif node["type"] == "BasiQ":
-                    self.show_basiq_dialog(node)
-                #icons carachter
-                break        
+        node = self.node_at(self.to_world(event.position()))
+        if node:
+            if node.type == "CCTV":
+                self.show_cctv_dialog(node)
+            elif node.type == "TPE":
+                self.show_tpe_dialog(node)
+            elif node.type == "Controller":
+                self.show_controller_dialog(node)
+            elif node.type == "BasiQ":
+                self.show_basiq_dialog(node)
+            #icons carachter
     
     def show_cctv_dialog(self, node):
         from components.cctv_dialog import CCTVDialog
-        dialog = CCTVDialog(node.get("characteristics", {}), self)
+        dialog = CCTVDialog(node.characteristics, self)
         if dialog.exec():
-            node["characteristics"] = dialog.get_data()
-            self.update()
+            self.edit_node(node, characteristics=dialog.get_data(), label=f"Edit {node.type}")
+            self.invalidate()
 
     def show_tpe_dialog(self, node):
         from components.tpe_dialog import TPEDialog
-        dialog = TPEDialog(node_data=node.get("characteristics", {}), 
+        dialog = TPEDialog(node_data=node.characteristics, 
                         canvas=self, 
                         parent=self)
         if dialog.exec():
-            node["characteristics"] = dialog.get_data()
-            self.update()
+            self.edit_node(node, characteristics=dialog.get_data(), label=f"Edit {node.type}")
+            self.invalidate()
 
     def show_controller_dialog(self, node):
         # from components.controller_dialog import ControllerDialog
@@ -751,54 +1561,72 @@ class Canvas(QWidget):
         #     node["characteristics"] = dialog.get_data()
         #     self.update()
 
-        dialog = ControllerDialog(node.get("characteristics", {}), canvas=self, parent=self)
+        dialog = ControllerDialog(node.characteristics, canvas=self, parent=self)
         if dialog.exec():
-            node["characteristics"] = dialog.get_data()
-            self.update()
+            self.edit_node(node, characteristics=dialog.get_data(), label=f"Edit {node.type}")
+            self.invalidate()
 
     def show_basiq_dialog(self, node):
         from components.basiq_dialog import BasiQDialog
-        dialog = BasiQDialog(node.get("characteristics", {}), self)
+        dialog = BasiQDialog(node.characteristics, self)
         if dialog.exec():
-            node["characteristics"] = dialog.get_data()
-            self.update()   
+            self.edit_node(node, characteristics=dialog.get_data(), label=f"Edit {node.type}")
+            self.invalidate()   
+
+    def pull_all_configs(self):
+        """Fetch the configuration of every device on the canvas into its last_retrieved_config"""
+        from components.fleet_dialog import FleetDialog
+        nodes = fleet.device_nodes(self.nodes)
+        if not nodes:
+            QMessageBox.information(self, "Pull All", "There are no Controller, TPE or BasiQ nodes to pull from")
+            return
+        run = fleet.FleetRun(nodes, lambda node: fleet.pull_task(self.model, node))
+        run.device_done.connect(self.store_pulled)
+        # Everything pulled is one undo step. Closing the dialog cancels
+        # the run, nothing is stored once the transaction ended
+        with self.history.transaction("Pull All Configurations"):
+            FleetDialog("Pull All Configurations", run, "Pulled", self).exec()
+
+    def store_pulled(self, node, result, error):
+        if error is None and self.model.get_node(node.id) is node:
+            self.edit_node(node, characteristics=fleet.pulled_characteristics(node, result))
+
+    def push_configs(self):
+        """
+        Send the settings stored on the selected Controller and BasiQ nodes,
+        or on all of them without a selection, to their devices
+        """
+        from components.fleet_dialog import FleetDialog
+        nodes = fleet.device_nodes(self.selected_nodes() or self.nodes, fleet.PUSH_TYPES)
+        if not nodes:
+            QMessageBox.information(self, "Push", "There are no Controller or BasiQ nodes to push to")
+            return
+        answer = QMessageBox.question(
+            self, "Push Configurations",
+            f"Send the stored settings to {len(nodes)} devices? Devices rejecting them are "
+            f"rolled back to their last pulled configuration.")
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        run = fleet.FleetRun(nodes, lambda node: fleet.push_task(self.model, node),
+                             retries=fleet.RETRIES,
+                             rollback=lambda node: fleet.rollback_task(self.model, node))
+        FleetDialog("Push Configurations", run, "Pushed", self).exec()
 
     def get_icon(self, icon_type):
         """Helper method to get icon for a node type"""
-        return QIcon(f"assets/icons/{icon_type.lower()}.png")
-
-
-    def is_dot_clicked(self, node, pos):
-        if "dot_pos" in node:
-            dot_radius = 6
-            dx = node["dot_pos"].x() - pos.x()
-            dy = node["dot_pos"].y() - pos.y()
-            return (dx * dx + dy * dy) <= (dot_radius * dot_radius)
-        return False
-
-    def draw_connection(self, painter, connection, temporary=False):
-        # Extract start and end points
-        if isinstance(connection, tuple):
-            start, end = connection
-        else:
-            start, end = connection["start"], connection["end"]
+        return icon_cache.get_icon(icon_type)
 
-        # Set color based on theme
-        if hasattr(self, 'theme') and self.theme == "light":
-            color = QColor("#000000")  # Black for light theme
-        else:
-            color = QColor("#00ffff")  # Cyan for dark theme
 
-        pen = QPen(color, 2)
-        painter.setPen(pen)
-        
-        # Draw the main line
-        painter.drawLine(start, end)
-        
-        # Draw arrow if not temporary
-        if not temporary:
-            self.draw_arrow(painter, start, end)
+    def node_dot_pos(self, node):
+        """Centre of the connection dot drawn to the right of a node"""
+        return QPoint(node.x + 40, node.y)
 
+    def is_dot_clicked(self, node, pos):
+        dot_radius = 6
+        dot_pos = self.node_dot_pos(node)
+        dx = dot_pos.x() - pos.x()
+        dy = dot_pos.y() - pos.y()
+        return (dx * dx + dy * dy) <= (dot_radius * dot_radius)
 
     def search_location(self, lat, lon):
         print(f"Canvas search_location called with {lat}, {lon}")  # Debug print
@@ -0,0 +1,60 @@
+# components/canvas_overlay.py
+from PyQt6.QtWidgets import QWidget
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QPainter, QRegion
+
+
+class CanvasOverlay(QWidget):
+    """
+    Transparent layer over the Canvas for interaction feedback: the
+    connection being drawn, the selection band and the hover highlight.
+
+    It ignores the mouse, the Canvas keeps handling every event. When the
+    overlay repaints, the Canvas underneath only re-blits its cached scene
+    for that area, nodes and edges are not redrawn while the cursor moves.
+    """
+
+    def __init__(self, canvas):
+        super().__init__(canvas)
+        self.canvas = canvas
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setAttribute(Qt.WidgetAttribute.WA_NoSystemBackground)
+
+    def update_world(self, area):
+        """Schedule a repaint of a canvas-space QRect or QRegion"""
+        if area.isEmpty():
+            return
+        transform = self.canvas.world_transform()
+        if isinstance(area, QRegion):
+            self.update(transform.map(area))
+        else:
+            self.update(transform.mapRect(area))
+
+    def paintEvent(self, event):
+        canvas = self.canvas
+        style = canvas.paint_style()
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setTransform(canvas.world_transform())
+
+        # Hovered node and the node a connection starts from
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        if canvas.hover_node is not None and canvas.hover_node is not canvas.connection_start:
+            painter.setPen(style["hover_pen"])
+            painter.drawRect(canvas.hover_rect(canvas.hover_node))
+        if canvas.connecting and canvas.connection_start is not None:
+            painter.setPen(style["selected_border_pen"])
+            painter.drawRect(canvas.hover_rect(canvas.connection_start))
+
+        # Connection being drawn
+        if canvas.connecting and canvas.connection_start and canvas.connection_cursor is not None:
+            painter.setPen(style["connection_pen"])
+            painter.drawLine(canvas.node_dot_pos(canvas.connection_start), canvas.connection_cursor)
+
+        # Rubber band in screen space so it keeps a 1px outline
+        if canvas.selecting and len(canvas.band_points) > 1:
+            painter.resetTransform()
+            painter.setPen(style["band_pen"])
+            painter.setBrush(style["band_brush"])
+            painter.drawPolygon(canvas.band_polygon())
+        painter.end()
@@ -3,7 +3,9 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
                            QMessageBox, QWidget, QSpinBox)
 from PyQt6.QtCore import Qt, QPoint
 from PyQt6.QtGui import QIcon
-import requests
+from components.request_status import RequestStatus
+from utils import device_api, device_client
+from utils.schema_model import Node
 
 # class ControllerDialog(QDialog):
 #     def __init__(self, node_data=None, parent=None):
@@ -22,7 +24,6 @@ class ControllerDialog(QDialog):
         super().__init__(parent)
         self.node_data = node_data or {}
         self.canvas = canvas
-        self.token = None
         self.phase_bounds = []
         self.camera_mappings = []
         self.setWindowTitle("Controller Configuration")
@@ -177,6 +178,10 @@ class ControllerDialog(QDialog):
         button_layout.addWidget(self.set_config_btn)
         button_layout.addWidget(self.cancel_btn)
         layout.addLayout(button_layout)
+
+        self.status = RequestStatus()
+        self.status.busy_changed.connect(self.set_busy)
+        layout.addWidget(self.status)
         
 
     def add_phase_bound(self):
@@ -248,62 +253,62 @@ class ControllerDialog(QDialog):
                     self.remove_phase_bound(self.phase_bounds[i][0])
                 break
 
-    def get_token(self):
-        try:
-            url = f"http://{self.ip_edit.text()}:{self.port_edit.text()}/auth/login"
-            headers = {'Content-Type': 'application/json'}
-            data = {
-                "username": self.user_edit.text(),
-                "password": self.pass_edit.text()
-            }
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()
-            return response.json()["access_token"]
-        except Exception as e:
-            raise Exception(f"Failed to get token: {str(e)}")
+    def connection(self):
+        """The connection settings as typed, see utils.device_api"""
+        return {
+            "ip": self.ip_edit.text(),
+            "port": self.port_edit.text(),
+            "username": self.user_edit.text(),
+            "password": self.pass_edit.text()
+        }
+
+    def set_busy(self, busy):
+        self.get_config_btn.setEnabled(not busy)
+        self.set_config_btn.setEnabled(not busy)
+
+    def request_failed(self, message):
+        QMessageBox.critical(self, "Error", message)
 
     def get_config(self):
+        device = self.connection()
+        request = self.status.track(
+            device_client.client().run(device_api.fetch_controller_config, device),
+            f"Getting configuration from {device_api.address(device)}...")
+        request.finished.connect(self.config_received)
+        request.failed.connect(self.request_failed)
+
+    def config_received(self, config):
         try:
-            # Get token first
-            self.token = self.get_token()
-            
-            # Get configuration
-            url = f"http://{self.ip_edit.text()}:{self.port_edit.text()}/get-config"
-            headers = {"Authorization": f"Bearer {self.token}"}
-            
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            config = response.json()
-            
             # Clear existing bounds and mappings
             while self.phase_bounds:
                 self.remove_phase_bound(self.phase_bounds[0][0])
-            
+        
             # Add bounds and mappings from config
             phase_bounds = config.get("phase_bounds", {})
             phase_camera_mapping = config.get("phase_camera_mapping", {})
-            
+        
             for phase in sorted(phase_bounds.keys(), key=int):
                 bounds = phase_bounds[phase]
-                
+            
                 # Add phase bound
                 self.add_phase_bound()
                 bound = self.phase_bounds[-1]
                 bound[1].setValue(int(bounds["g_min"]))
                 bound[2].setValue(int(bounds["g_max"]))
-                
+            
                 # Set camera mapping
                 cameras = phase_camera_mapping.get(phase, [])
                 mapping = self.camera_mappings[-1]
                 mapping[1].setText(",".join(map(str, cameras)))
-            
-            # Add BasiQ icon
-            self.add_basiq_icon()
-            
-            QMessageBox.information(self, "Success", "Configuration retrieved successfully")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            QMessageBox.critical(self, "Error", f"Invalid configuration: {str(e)}")
+            return
+        self.last_retrieved_config = config
+        
+        # Add BasiQ icon
+        self.add_basiq_icon(config)
+        
+        QMessageBox.information(self, "Success", "Configuration retrieved successfully")
 
     # def add_basiq_icon(self):
     #     # Get parent canvas
@@ -334,95 +339,67 @@ class ControllerDialog(QDialog):
     #     canvas.connections.append((basiq_node["pos"], controller_pos))
     #     canvas.update()
 
-    def add_basiq_icon(self):
+    def add_basiq_icon(self, config):
         # Get parent canvas
         canvas = self.canvas
         if not canvas:
             return
         
         # Find controller node position
-        controller_pos = None
+        controller_node = None
         for node in canvas.nodes:
-            if node["type"] == "Controller":
-                controller_pos = node["pos"]
+            if node.type == "Controller":
+                controller_node = node
                 break
         
-        if not controller_pos:
+        if not controller_node:
             return
-        
-        # Get algorithm settings from config
-        url = f"http://{self.ip_edit.text()}:{self.port_edit.text()}/get-config"
-        headers = {"Authorization": f"Bearer {self.token}"}
-        try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            config = response.json()
-            
-            # Create BasiQ node with characteristics
-            basiq_node = {
-                "type": "BasiQ",
-                "pos": canvas.snap_to_grid_pos(controller_pos + QPoint(100, 0)),
-                "icon": QIcon("assets/icons/basiq.png"),
-                "size": QPoint(50, 50),
-                "characteristics": {
-                    "algorithm_name": config.get("algorithm_name", ""),
-                    "computation_threshold": config.get("computation_threshold", ""),
-                    "f_adj": config.get("f_adj", ""),
-                    "set_setting_threshold": config.get("set_setting_threshold", ""),
-                    "saturation_flow_rate": config.get("saturation_flow_rate", ""),
-                    "startup_loss_time": config.get("startup_loss_time", "")
-                }
+        controller_pos = controller_node.pos
+        
+        # Create BasiQ node with the algorithm settings from config
+        basiq_node = Node(
+            "BasiQ",
+            canvas.snap_to_grid_pos(controller_pos + QPoint(100, 0)),
+            characteristics={
+                "algorithm_name": config.get("algorithm_name", ""),
+                "computation_threshold": config.get("computation_threshold", ""),
+                "f_adj": config.get("f_adj", ""),
+                "set_setting_threshold": config.get("set_setting_threshold", ""),
+                "saturation_flow_rate": config.get("saturation_flow_rate", ""),
+                "startup_loss_time": config.get("startup_loss_time", "")
             }
-            
-            # Add node and connection
-            canvas.nodes.append(basiq_node)
-            canvas.connections.append((basiq_node["pos"], controller_pos))
-            canvas.update()
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to get algorithm settings: {str(e)}")
+        )
+        
+        # Add node and connection as one undo step
+        with canvas.history.transaction("Add BasiQ"):
+            canvas.insert_nodes([basiq_node], label="Add BasiQ")
+            canvas.connect_nodes(basiq_node, controller_node)
 
     def set_config(self):
         try:
-            # Get token first
-            self.token = self.get_token()
-            
-            # Prepare configuration data
-            config = {
-                "phase_bounds": {},
-                "phase_camera_mapping": {}
-            }
-            
-            # Add phase bounds and camera mappings
-            for i, ((_, min_spin, max_spin), (_, cameras_edit)) in enumerate(zip(self.phase_bounds, self.camera_mappings)):
-                phase = str(i + 1)
-                
-                # Add phase bounds
-                config["phase_bounds"][phase] = {
-                    "g_min": min_spin.value(),
-                    "g_max": max_spin.value()
-                }
-                
-                # Add phase camera mapping
-                cameras_text = cameras_edit.text().strip()
-                if cameras_text:
-                    cameras = [int(cam.strip()) for cam in cameras_text.split(",") if cam.strip()]
-                    config["phase_camera_mapping"][phase] = cameras
-            
-            # Send configuration
-            url = f"http://{self.ip_edit.text()}:{self.port_edit.text()}/set-config"
-            headers = {
-                "Authorization": f"Bearer {self.token}",
-                "Content-Type": "application/json"
-            }
-            
-            response = requests.post(url, headers=headers, json=config)
-            response.raise_for_status()
-            
-            QMessageBox.information(self, "Success", "Configuration set successfully")
-            self.accept()
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+            data = self.get_data()
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", f"Invalid camera number: {str(e)}")
+            return
+        config = {
+            "phase_bounds": data["phase_bounds"],
+            "phase_camera_mapping": data["phase_camera_mapping"]
+        }
+        device = self.connection()
+        request = self.status.track(
+            device_client.client().run(device_api.push_controller_config, device, config),
+            f"Sending configuration to {device_api.address(device)}...")
+        request.finished.connect(self.config_sent)
+        request.failed.connect(self.request_failed)
+
+    def config_sent(self):
+        QMessageBox.information(self, "Success", "Configuration set successfully")
+        self.accept()
+
+    def done(self, result):
+        # Nobody waits for an answer once the dialog is closed
+        self.status.cancel()
+        super().done(result)
 
     def get_data(self):
         """Return the current configuration as a dictionary"""
@@ -434,6 +411,8 @@ class ControllerDialog(QDialog):
             "phase_bounds": {},
             "phase_camera_mapping": {}
         }
+        if self.last_retrieved_config:
+            data["last_retrieved_config"] = self.last_retrieved_config
         
         # Add phase bounds and camera mappings
         for i, ((_, min_spin, max_spin), (_, cameras_edit)) in enumerate(zip(self.phase_bounds, self.camera_mappings)):
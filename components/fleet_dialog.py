@@ -0,0 +1,96 @@
+# components/fleet_dialog.py
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QProgressBar,
+                             QPushButton, QTableWidget, QTableWidgetItem, QHeaderView)
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QColor
+
+from utils.fleet import node_label
+
+
+class FleetDialog(QDialog):
+    """
+    Progress of a FleetRun: one row per device with its outcome, a summary
+    of how many succeeded and failed, and Stop to cancel the devices not
+    reached yet. The run starts with the dialog.
+    """
+
+    def __init__(self, title, run, verb="Done", parent=None):
+        super().__init__(parent)
+        self.run = run
+        self.verb = verb
+        self.rows = {}  # node id -> row
+        self.setWindowTitle(title)
+        self.setWindowFlags(Qt.WindowType.Window | Qt.WindowType.WindowCloseButtonHint)
+        self.resize(560, 420)
+        self.setup_ui()
+
+        run.device_done.connect(self.device_done)
+        run.progress.connect(self.show_progress)
+        run.finished.connect(self.run_finished)
+        self.show_progress(0, run.total)
+        run.start()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+
+        self.summary = QLabel()
+        layout.addWidget(self.summary)
+        self.bar = QProgressBar()
+        self.bar.setRange(0, max(self.run.total, 1))
+        layout.addWidget(self.bar)
+
+        self.table = QTableWidget(len(self.run.nodes), 3)
+        self.table.setHorizontalHeaderLabels(["Device", "Type", "Result"])
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        for row, node in enumerate(self.run.nodes):
+            self.rows[node.id] = row
+            self.table.setItem(row, 0, QTableWidgetItem(node_label(node)))
+            self.table.setItem(row, 1, QTableWidgetItem(node.type))
+            self.table.setItem(row, 2, QTableWidgetItem("Waiting"))
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        self.stop_btn = QPushButton("Stop")
+        self.stop_btn.clicked.connect(self.run.cancel)
+        self.close_btn = QPushButton("Close")
+        self.close_btn.clicked.connect(self.accept)
+        self.close_btn.setEnabled(False)
+        button_layout.addWidget(self.stop_btn)
+        button_layout.addWidget(self.close_btn)
+        layout.addLayout(button_layout)
+
+    def device_done(self, node, result, error):
+        item = self.table.item(self.rows[node.id], 2)
+        retries = self.run.retried.get(node.id)
+        if error is None:
+            item.setText(f"{self.verb} after {retries} retries" if retries else self.verb)
+        else:
+            if retries:
+                error = f"{error} (after {retries} retries)"
+            item.setText(error)
+            item.setToolTip(error)
+            item.setForeground(QColor("#e05050"))
+
+    def show_progress(self, settled, total):
+        self.bar.setValue(settled)
+        failed = len(self.run.errors)
+        self.summary.setText(f"{self.verb}: {settled - failed} of {total} devices, {failed} failed")
+
+    def run_finished(self):
+        self.stop_btn.setEnabled(False)
+        self.close_btn.setEnabled(True)
+        failed = len(self.run.errors)
+        text = f"{self.verb}: {len(self.run.results)} of {self.run.total} devices, {failed} failed"
+        if self.run.settled < self.run.total:
+            text += f", {self.run.total - self.run.settled} stopped"
+            for node in self.run.nodes:
+                if node.id not in self.run.results and node.id not in self.run.errors:
+                    self.table.item(self.rows[node.id], 2).setText("Stopped")
+        self.summary.setText(text)
+
+    def done(self, result):
+        self.run.cancel()
+        super().done(result)
@@ -0,0 +1,87 @@
+# components/history_panel.py
+from PyQt6.QtWidgets import QDockWidget, QListWidget
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QColor
+
+
+class HistoryPanel(QDockWidget):
+    """
+    Timeline of the canvas undo history.
+
+    Row 0 is the oldest state still held, every following row the state after
+    one more step; undone steps stay listed, greyed out, until a new edit
+    replaces them. Clicking a row jumps straight to that state.
+    """
+
+    def __init__(self, canvas):
+        super().__init__("History")
+        self.canvas = canvas
+        self.history = canvas.history
+        self.setAllowedAreas(Qt.DockWidgetArea.LeftDockWidgetArea | Qt.DockWidgetArea.RightDockWidgetArea)
+
+        self.list = QListWidget()
+        self.list.itemClicked.connect(self.jump_to_item)
+        self.setWidget(self.list)
+
+        self.labels = []
+        self.first = 0
+        self.current = 0
+        self.list.addItem("Start")
+        self.history.changed.connect(self.refresh)
+        self.refresh()
+
+    def refresh(self):
+        """
+        Sync the rows with the history. Drag steps report a change on every
+        mouse move, so rows are only added, removed or restyled where the
+        steps actually differ.
+        """
+        history = self.history
+        labels = history.labels()
+        current = history.position - history.first
+        old_current = self.current
+
+        # Steps evicted from the bottom of the history
+        shift = history.first - self.first
+        if shift < 0 or shift > len(self.labels):
+            shift = len(self.labels)
+            self.first = history.first
+        if shift:
+            del self.labels[:shift]
+            for _ in range(shift):
+                self.list.takeItem(1)
+            self.first = history.first
+            old_current = max(0, old_current - shift)
+        self.list.item(0).setText("Start" if history.first == 0 else "Oldest kept state")
+
+        # Replace the rows after the last step both lists share
+        common = 0
+        for old, new in zip(self.labels, labels):
+            if old != new:
+                break
+            common += 1
+        for row in range(len(self.labels), common, -1):
+            self.list.takeItem(row)
+        for label in labels[common:]:
+            self.list.addItem(label or "Edit")
+        self.labels = labels
+        self.current = current
+
+        # Only rows that crossed the current step or are new change style
+        rows = set(range(min(old_current, current), max(old_current, current) + 1))
+        rows.update(range(common + 1, self.list.count()))
+        for row in sorted(rows):
+            self.style_row(row)
+        self.list.setCurrentRow(current)
+
+    def style_row(self, row):
+        item = self.list.item(row)
+        current = self.current
+        font = item.font()
+        font.setBold(row == current)
+        item.setFont(font)
+        item.setForeground(QColor("#808080") if row > current else self.list.palette().text().color())
+        item.setToolTip("Checkpoint" if self.history.first + row in self.history.checkpoints else "")
+
+    def jump_to_item(self, item):
+        self.canvas.jump_to(self.history.first + self.list.row(item))
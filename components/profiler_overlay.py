@@ -0,0 +1,94 @@
+# components/profiler_overlay.py
+from PyQt6.QtWidgets import QWidget
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QPainter, QColor, QFont, QFontMetrics
+
+
+class ProfilerOverlay(QWidget):
+    """
+    Debug panel in the top left corner of the Canvas with the figures of
+    canvas.profiler: frame rate, the phases of the last paint, items drawn
+    and culled, hit-test time and undo history memory.
+
+    The panel is opaque and refreshes on a timer, so updating it never
+    repaints the canvas underneath and skews the numbers it shows.
+    """
+
+    REFRESH_INTERVAL = 250  # ms
+    MARGIN = 8
+    PHASES = ("grid", "capture", "index", "edges", "nodes", "labels", "overview", "tiles", "blit")
+
+    def __init__(self, canvas):
+        super().__init__(canvas)
+        self.canvas = canvas
+        self.lines = []
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+        font = QFont("monospace")
+        font.setStyleHint(QFont.StyleHint.Monospace)
+        font.setPointSize(8)
+        self.setFont(font)
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.REFRESH_INTERVAL)
+        self.timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+
+    def hideEvent(self, event):
+        self.timer.stop()
+
+    def format_lines(self, snapshot):
+        counts = snapshot["counts"]
+        phases = snapshot["phases_ms"]
+        gauges = snapshot["gauges"]
+        lines = [
+            "%5.1f fps   frame %.2f ms (mean %.2f, max %.2f)" % (
+                snapshot["fps"], phases.get("total", 0.0),
+                snapshot["frame_mean_ms"], snapshot["frame_max_ms"]),
+            "ms      " + ("  ".join("%s %.2f" % (name, phases[name])
+                                     for name in self.PHASES if name in phases) or "-"),
+            "drawn   %d nodes, %d connections, %d labels" % (
+                counts.get("nodes_drawn", 0), counts.get("connections_drawn", 0),
+                counts.get("labels_drawn", 0)),
+            "culled  %d nodes, %d connections, %d labels" % (
+                counts.get("nodes_culled", 0), counts.get("connections_culled", 0),
+                counts.get("labels_hidden", 0)),
+        ]
+        # Only the tiled canvas has tiles
+        if "tiles_cached" in gauges:
+            lines.append("tiles   %d drawn, %d rendered, %d cached" % (
+                counts.get("tiles_drawn", 0), counts.get("tiles_rendered", 0),
+                gauges["tiles_cached"]))
+        hit_test = snapshot["samples"].get("hit_test")
+        if hit_test:
+            lines.append("hit-test %.3f ms (mean %.3f, max %.3f)" % (
+                hit_test["last_ms"], hit_test["mean_ms"], hit_test["max_ms"]))
+        else:
+            lines.append("hit-test -")
+        lines.append("history %d steps, %.1f KB + %.1f KB checkpoints" % (
+            gauges.get("history_steps", 0), gauges.get("history_bytes", 0) / 1024,
+            gauges.get("checkpoint_bytes", 0) / 1024))
+        return lines
+
+    def refresh(self):
+        self.lines = self.format_lines(self.canvas.profiler.snapshot())
+        metrics = QFontMetrics(self.font())
+        width = max(metrics.horizontalAdvance(line) for line in self.lines) + 2 * self.MARGIN
+        height = metrics.lineSpacing() * len(self.lines) + 2 * self.MARGIN
+        self.setGeometry(self.MARGIN, self.MARGIN, width, height)
+        self.update()
+        self.raise_()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(20, 20, 20))
+        painter.setPen(QColor("#00ff66"))
+        metrics = painter.fontMetrics()
+        y = self.MARGIN + metrics.ascent()
+        for line in self.lines:
+            painter.drawText(self.MARGIN, y, line)
+            y += metrics.lineSpacing()
+        painter.end()
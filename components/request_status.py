@@ -0,0 +1,55 @@
+# components/request_status.py
+from PyQt6.QtWidgets import QWidget, QHBoxLayout, QLabel, QProgressBar, QPushButton
+from PyQt6.QtCore import pyqtSignal
+
+
+class RequestStatus(QWidget):
+    """
+    Progress row of a dialog talking to a device: a busy bar, what is
+    happening and a Stop button cancelling the request. Hidden when idle;
+    busy_changed lets the dialog disable its buttons meanwhile.
+    """
+
+    busy_changed = pyqtSignal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.request = None
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.bar = QProgressBar()
+        self.bar.setRange(0, 0)
+        self.bar.setTextVisible(False)
+        self.bar.setFixedWidth(80)
+        self.label = QLabel()
+        self.stop_btn = QPushButton("Stop")
+        self.stop_btn.clicked.connect(self.cancel)
+        layout.addWidget(self.bar)
+        layout.addWidget(self.label, 1)
+        layout.addWidget(self.stop_btn)
+        self.hide()
+
+    @property
+    def busy(self):
+        return self.request is not None
+
+    def track(self, request, message):
+        """Show message until request settles, returning request"""
+        self.cancel()
+        self.request = request
+        request.settled.connect(lambda: self.settled(request))
+        self.label.setText(message)
+        self.show()
+        self.busy_changed.emit(True)
+        return request
+
+    def cancel(self):
+        if self.request is not None:
+            self.request.cancel()
+
+    def settled(self, request):
+        if request is not self.request:
+            return
+        self.request = None
+        self.hide()
+        self.busy_changed.emit(False)
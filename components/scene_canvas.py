@@ -0,0 +1,709 @@
+# components/scene_canvas.py
+import json
+import time
+
+import numpy as np
+from PyQt6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsItem, QGraphicsLineItem
+from PyQt6.QtCore import Qt, QPoint, QPointF, QLineF, QRectF, pyqtSignal
+from PyQt6.QtGui import QPainter, QPainterPath, QPainterPathStroker, QPen, QColor, QRegion, QTransform
+
+from components.canvas import Canvas
+from components.profiler_overlay import ProfilerOverlay
+from utils.schema_model import SchemaModel, Node
+from utils.history import History, AddNodes, RemoveNodes, AddConnection, MoveNodes
+from utils.profiler import Profiler
+from utils import geometry
+from utils import icon_cache
+from utils import label_cache
+
+
+class NodeItem(QGraphicsItem):
+    """
+    A node on the scene: face, border, connection dot and label, positioned
+    at the node centre. Rendered into a device-pixel cache that is only
+    redrawn when the node, its selection state or the zoom change.
+    """
+
+    def __init__(self, view, node):
+        super().__init__()
+        self.view = view
+        self.node = None
+        self.state = None
+        self.bounds = QRectF()
+        self.setFlags(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable
+                      | QGraphicsItem.GraphicsItemFlag.ItemIsMovable
+                      | QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges)
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+        self.setZValue(1)
+        self.sync(node)
+
+    def sync(self, node):
+        """Follow node, which undo may have replaced by an equal one"""
+        self.node = node
+        state = (node.x, node.y, node.type, node.name)
+        if state == self.state:
+            return
+        old = self.state
+        self.state = state
+        if old is None or old[2:] != state[2:]:
+            self.prepareGeometryChange()
+            model = self.view.model
+            left, top, right, bottom = model.node_rect(node)
+            self.bounds = QRectF(QPointF(left - node.x - 1, top - node.y - 1),
+                                 QPointF(right - node.x + 1, bottom - node.y + 1))
+            self.setToolTip(node.name)
+            self.update()
+        if old is None or old[:2] != state[:2]:
+            self.setPos(node.x, node.y)
+
+    def boundingRect(self):
+        return self.bounds
+
+    def shape(self):
+        """Body and connection dot, the label does not pick the node"""
+        model = self.view.model
+        half = model.NODE_HALF_SIZE
+        path = QPainterPath()
+        path.addRect(QRectF(-half, -half, half * 2, half * 2))
+        radius = model.DOT_RADIUS
+        path.addEllipse(QPointF(model.DOT_OFFSET, 0), radius, radius)
+        return path
+
+    def itemChange(self, change, value):
+        view = self.view
+        if change == QGraphicsItem.GraphicsItemChange.ItemPositionChange and view.dragging:
+            # Whole canvas units while dragging, on the grid if snapping
+            point = view.snap_to_grid_pos(value) if view.snap_to_grid else value
+            return QPointF(round(point.x()), round(point.y()))
+        if change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged:
+            view.node_item_moved(self)
+        return super().itemChange(change, value)
+
+    def paint(self, painter, option, widget=None):
+        view = self.view
+        profiler = view.profiler
+        started = time.perf_counter()
+        node = self.node
+        style = view.paint_style()
+        tier = view.lod_tier()
+        half = view.model.NODE_HALF_SIZE
+
+        if tier == "points":
+            # Coloured square of about four screen pixels
+            size = 4 / view.zoom
+            painter.fillRect(QRectF(-size / 2, -size / 2, size, size),
+                             QColor(Canvas.LOD_POINT_COLORS.get(node.type, "#ffffff")))
+            profiler.add_time("nodes", time.perf_counter() - started)
+            return
+
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        scale = round(view.devicePixelRatioF() * view.zoom, 2)
+        painter.drawImage(QRectF(-half, -half, half * 2, half * 2),
+                          icon_cache.node_image(node.type, half * 2, view.theme, scale))
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.setPen(style["selected_border_pen"] if self.isSelected() else style["border_pen"])
+        painter.drawRect(QRectF(-half, -half, half * 2, half * 2))
+        if tier != "full":
+            profiler.add_time("nodes", time.perf_counter() - started)
+            return
+
+        model = view.model
+        painter.setBrush(style["dot_brush"])
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.drawEllipse(QPointF(model.DOT_OFFSET, 0), model.DOT_RADIUS, model.DOT_RADIUS)
+        label_started = time.perf_counter()
+        label = label_cache.label_image(node.name, view.font(), style["text_pen"].color(),
+                                        model.LABEL_HEIGHT, scale)
+        painter.drawImage(QPointF(-round(label.deviceIndependentSize().width() / 2),
+                                  half + model.LABEL_GAP), label)
+        finished = time.perf_counter()
+        profiler.add_time("nodes", label_started - started)
+        profiler.add_time("labels", finished - label_started)
+
+
+class ConnectionItem(QGraphicsItem):
+    """A connection between two node centres, with its arrow head at full detail"""
+
+    def __init__(self, view, connection):
+        super().__init__()
+        self.view = view
+        self.connection = connection
+        self.line = None
+        self.head = None
+        self.bounds = QRectF()
+        self.sync()
+
+    def sync(self):
+        """Follow the end nodes after they moved"""
+        line = self.view.model.connection_line(self.connection)
+        if line == self.line:
+            return
+        self.prepareGeometryChange()
+        self.line = line
+        x1, y1, x2, y2 = line
+        self.head = self.view.arrow_head(QPointF(x1, y1), QPointF(x2, y2), outline=1)
+        # Arrow heads reach past the line ends
+        margin = 12
+        self.bounds = QRectF(QPointF(min(x1, x2) - margin, min(y1, y2) - margin),
+                             QPointF(max(x1, x2) + margin, max(y1, y2) + margin))
+
+    def boundingRect(self):
+        return self.bounds
+
+    def shape(self):
+        """The line widened by the pick tolerance, for hit-testing"""
+        path = QPainterPath()
+        x1, y1, x2, y2 = self.line
+        path.moveTo(x1, y1)
+        path.lineTo(x2, y2)
+        stroker = QPainterPathStroker()
+        stroker.setWidth(self.view.model.PICK_TOLERANCE * 2)
+        return stroker.createStroke(path)
+
+    def paint(self, painter, option, widget=None):
+        view = self.view
+        started = time.perf_counter()
+        tier = view.lod_tier()
+        x1, y1, x2, y2 = self.line
+        if tier == "points":
+            color = QColor("#0078d7") if view.theme == "light" else QColor("#00ffff")
+            color.setAlpha(160)
+            pen = QPen(color, 1)
+            pen.setCosmetic(True)
+            painter.setPen(pen)
+            painter.drawLine(QLineF(x1, y1, x2, y2))
+        else:
+            style = view.paint_style()
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.setPen(style["connection_pen"])
+            painter.drawLine(QLineF(x1, y1, x2, y2))
+            if tier == "full" and self.head is not None:
+                painter.setPen(Qt.PenStyle.NoPen)
+                painter.setBrush(style["connection_brush"])
+                painter.drawPolygon(self.head)
+        view.profiler.add_time("edges", time.perf_counter() - started)
+
+
+class SceneCanvas(QGraphicsView):
+    """
+    Schema canvas built on QGraphicsScene, an alternative to the hand-rolled
+    Canvas picked at startup (main.py --engine=scene).
+
+    It edits the same SchemaModel through the same History and reads and
+    writes the same .kst files. Nodes and connections are scene items kept
+    in a BSP tree index, nodes cached in device pixels; sync_items() brings
+    the items in line with the model after every edit. The editing
+    operations that only go through the model and the history are Canvas's
+    own, so both engines behave the same and run the same benchmarks.
+    """
+
+    # Same signal and levels of detail as Canvas
+    frame_rendered = pyqtSignal(dict)
+    LOD_THRESHOLDS = Canvas.LOD_THRESHOLDS
+
+    # Scrollable area in canvas units, the view pans with its scroll bars
+    WORLD_SIZE = 1_000_000
+
+    def __init__(self):
+        super().__init__()
+        self.theme = "dark"
+        self.setObjectName("Canvas")
+        self.setAcceptDrops(True)
+        self.setFrameShape(QGraphicsView.Shape.NoFrame)
+        self.grid_size = 50
+        self.snap_to_grid = True
+        self.dark_mode = True
+        self.dragging = False
+        self.drag_origin = None  # {node id: (x, y)} of the dragged nodes at press time
+        self.connecting = False
+        self.connection_start = None
+        self.connection_preview = None  # temporary line item while connecting
+        self.panning = False
+        self.pan_anchor = None
+        self.clipboard = None
+        self.paste_count = 0
+        self.min_zoom = 0.05
+        self.max_zoom = 8.0
+        self.lod_thresholds = dict(self.LOD_THRESHOLDS)
+        self.last_frame_stats = {}
+        self.paint_styles = {}
+
+        # Nodes, connections and their spatial indexes, hit-testing uses the
+        # scene's BSP tree instead
+        self.model = SchemaModel(cell_size=self.grid_size * 2)
+        self.model.label_font = self.font()
+        self.history = History(self.model)
+        self.node_items = {}  # node id -> NodeItem
+        self.connection_items = {}  # id(connection) -> ConnectionItem, as in the model
+
+        scene = QGraphicsScene(self)
+        scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.BspTreeIndex)
+        self.setScene(scene)
+        world = self.WORLD_SIZE
+        self.setSceneRect(QRectF(-world, -world, world * 2, world * 2))
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setTransformationAnchor(QGraphicsView.ViewportAnchor.NoAnchor)
+        self.setResizeAnchor(QGraphicsView.ViewportAnchor.NoAnchor)
+        self.setDragMode(QGraphicsView.DragMode.RubberBandDrag)
+        self.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.SmartViewportUpdate)
+        self.setCacheMode(QGraphicsView.CacheModeFlag.CacheBackground)
+        # Items set every pen and brush they use
+        self.setOptimizationFlag(QGraphicsView.OptimizationFlag.DontSavePainterState)
+        self.setRenderHint(QPainter.RenderHint.Antialiasing)
+        self.setMouseTracking(True)
+        self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
+        self.pan = QPointF(0, 0)
+
+        self.profiler = Profiler()
+        self.profiler.add_gauge("history_steps", lambda: len(self.history))
+        self.profiler.add_gauge("history_bytes", lambda: self.history.nbytes)
+        self.profiler.add_gauge("checkpoint_bytes",
+                                lambda: sum(len(data) for data in self.history.checkpoints.values()))
+        self.profiler_overlay = ProfilerOverlay(self)
+
+    @property
+    def nodes(self):
+        return self.model.nodes
+
+    @property
+    def connections(self):
+        return self.model.connections
+
+    # Editing operations and helpers shared with Canvas: they only go
+    # through the model, the history and the hooks this class provides
+    arrow_head = Canvas.arrow_head
+    paint_style = Canvas.paint_style
+    grid_spacing = Canvas.grid_spacing
+    lod_tier = Canvas.lod_tier
+    zoom_in = Canvas.zoom_in
+    zoom_out = Canvas.zoom_out
+    save_schema = Canvas.save_schema
+    save_as_image = Canvas.save_as_image
+    dragEnterEvent = Canvas.dragEnterEvent
+    dragMoveEvent = Canvas.dragMoveEvent
+    dropEvent = Canvas.dropEvent
+    contextMenuEvent = Canvas.contextMenuEvent
+    mouseDoubleClickEvent = Canvas.mouseDoubleClickEvent
+    add_selection_actions = Canvas.add_selection_actions
+    open_terminal = Canvas.open_terminal
+    show_cctv_dialog = Canvas.show_cctv_dialog
+    show_tpe_dialog = Canvas.show_tpe_dialog
+    show_controller_dialog = Canvas.show_controller_dialog
+    show_basiq_dialog = Canvas.show_basiq_dialog
+    pull_all_configs = Canvas.pull_all_configs
+    store_pulled = Canvas.store_pulled
+    edit_node = Canvas.edit_node
+    push_configs = Canvas.push_configs
+    connect_nearest_controller = Canvas.connect_nearest_controller
+    node_contains = Canvas.node_contains
+    node_dot_pos = Canvas.node_dot_pos
+    is_dot_clicked = Canvas.is_dot_clicked
+    connection_contains = Canvas.connection_contains
+    snap_to_grid_pos = Canvas.snap_to_grid_pos
+    copy_selection = Canvas.copy_selection
+    delete_selection = Canvas.delete_selection
+    snap_selection = Canvas.snap_selection
+    align_selection = Canvas.align_selection
+    distribute_selection = Canvas.distribute_selection
+    insert_nodes = Canvas.insert_nodes
+    move_nodes = Canvas.move_nodes
+    snap_nodes = Canvas.snap_nodes
+    translate_nodes = Canvas.translate_nodes
+    align_nodes = Canvas.align_nodes
+    distribute_nodes = Canvas.distribute_nodes
+    rename_node = Canvas.rename_node
+    delete_node = Canvas.delete_node
+    delete_connection = Canvas.delete_connection
+    add_node = Canvas.add_node
+    add_connection = Canvas.add_connection
+    remove_connection = Canvas.remove_connection
+
+    # Viewport: screen = world * zoom + pan, the pan in whole pixels
+
+    @property
+    def zoom(self):
+        return self.transform().m11()
+
+    @zoom.setter
+    def zoom(self, zoom):
+        pan = self.pan
+        self.setTransform(QTransform.fromScale(zoom, zoom))
+        self.pan = pan
+
+    @property
+    def pan(self):
+        return self.viewportTransform().map(QPointF(0, 0))
+
+    @pan.setter
+    def pan(self, pan):
+        current = self.pan
+        hbar = self.horizontalScrollBar()
+        vbar = self.verticalScrollBar()
+        hbar.setValue(hbar.value() + round(current.x() - pan.x()))
+        vbar.setValue(vbar.value() + round(current.y() - pan.y()))
+
+    def world_transform(self):
+        return self.viewportTransform()
+
+    def to_world(self, pos):
+        """Map a viewport position to (integer) canvas coordinates"""
+        point = self.mapToScene(QPointF(pos).toPoint())
+        return QPoint(round(point.x()), round(point.y()))
+
+    def visible_world_rect(self, rect=None):
+        """Canvas area shown in rect (the whole viewport by default) as (left, top, right, bottom)"""
+        rect = QRectF(rect if rect is not None else self.viewport().rect())
+        world = self.viewportTransform().inverted()[0].mapRect(rect)
+        return (world.left(), world.top(), world.right(), world.bottom())
+
+    def scroll_view(self, delta):
+        self.pan = self.pan + delta
+
+    def set_zoom(self, zoom, anchor=None):
+        """Zoom keeping the canvas point under anchor (viewport coordinates) still"""
+        zoom = min(max(zoom, self.min_zoom), self.max_zoom)
+        if anchor is None:
+            anchor = QPointF(self.viewport().width() / 2, self.viewport().height() / 2)
+        world = self.viewportTransform().inverted()[0].map(QPointF(anchor))
+        self.setTransform(QTransform.fromScale(zoom, zoom))
+        self.pan = QPointF(anchor.x() - world.x() * zoom, anchor.y() - world.y() * zoom)
+
+    def reset_view(self):
+        self.zoom = 1.0
+        self.pan = QPointF(0, 0)
+
+    def set_lod_thresholds(self, simplified=None, points=None):
+        if simplified is not None:
+            self.lod_thresholds["simplified"] = simplified
+        if points is not None:
+            self.lod_thresholds["points"] = points
+        self.invalidate()
+
+    def set_theme(self, dark_mode):
+        self.dark_mode = dark_mode
+        label_cache.clear()
+        self.resetCachedContent()
+        self.invalidate()
+
+    def toggle_snap_to_grid(self):
+        self.snap_to_grid = not self.snap_to_grid
+        self.resetCachedContent()
+        if self.snap_to_grid:
+            self.snap_nodes()
+        self.invalidate()
+
+    # Items
+
+    def sync_items(self):
+        """Add, remove and move items so they match the model"""
+        scene = self.scene()
+        nodes_by_id = self.model.nodes_by_id
+        for node_id in [node_id for node_id in self.node_items if node_id not in nodes_by_id]:
+            scene.removeItem(self.node_items.pop(node_id))
+        for node in self.model.nodes:
+            item = self.node_items.get(node.id)
+            if item is None:
+                item = self.node_items[node.id] = NodeItem(self, node)
+                scene.addItem(item)
+            else:
+                item.sync(node)
+
+        # Keyed by identity: parallel connections are equal tuples, one item each
+        stored = self.model.connections_by_key
+        for key in [key for key, item in self.connection_items.items()
+                    if stored.get(key) is not item.connection]:
+            scene.removeItem(self.connection_items.pop(key))
+        for key, connection in stored.items():
+            item = self.connection_items.get(key)
+            if item is None:
+                item = self.connection_items[key] = ConnectionItem(self, connection)
+                scene.addItem(item)
+            else:
+                item.sync()
+
+    def node_item_moved(self, item):
+        """A node item was dragged: move the node and the connections following it"""
+        node = item.node
+        pos = item.pos()
+        x, y = round(pos.x()), round(pos.y())
+        if node.x == x and node.y == y:
+            return
+        self.model.move_node(node, QPoint(x, y))
+        item.state = (x, y) + item.state[2:]
+        for connection in self.model.adjacency.get(node.id, ()):
+            connection_item = self.connection_items.get(id(connection))
+            if connection_item is not None:
+                connection_item.sync()
+
+    def invalidate(self, area=None):
+        """
+        The model changed: bring the items in line. Without an area every
+        item renders again, as Canvas.invalidate() renders all its tiles.
+        """
+        self.sync_items()
+        if area is None:
+            for item in self.node_items.values():
+                item.update()
+            self.viewport().update()
+
+    def update_world(self, area, static=True):
+        """The model changed in a canvas-space QRect or QRegion"""
+        self.sync_items()
+
+    def selection_region(self, nodes):
+        """Canvas area of nodes and their connections"""
+        rect = QRectF()
+        for node in nodes:
+            item = self.node_items.get(node.id)
+            if item is not None:
+                rect = rect.united(item.sceneBoundingRect())
+            for connection in self.model.adjacency.get(node.id, ()):
+                connection_item = self.connection_items.get(id(connection))
+                if connection_item is not None:
+                    rect = rect.united(connection_item.sceneBoundingRect())
+        return QRegion(rect.toAlignedRect())
+
+    # Selection
+
+    @property
+    def selection(self):
+        """Selected nodes by id"""
+        return {item.node.id: item.node for item in self.scene().selectedItems()
+                if isinstance(item, NodeItem)}
+
+    def selected_nodes(self):
+        return list(self.selection.values())
+
+    def set_selection(self, nodes):
+        ids = {node.id for node in nodes}
+        scene = self.scene()
+        scene.blockSignals(True)
+        for item in scene.selectedItems():
+            if not isinstance(item, NodeItem) or item.node.id not in ids:
+                item.setSelected(False)
+        for node_id in ids:
+            item = self.node_items.get(node_id)
+            if item is not None:
+                item.setSelected(True)
+        scene.blockSignals(False)
+
+    def clear_selection(self):
+        self.scene().clearSelection()
+
+    def select_all(self):
+        self.set_selection(self.nodes)
+
+    # Hit-testing, through the scene index
+
+    def nodes_at(self, pos):
+        """Nodes whose body or connection dot covers pos"""
+        with self.profiler.measure("hit_test"):
+            return [item.node for item in self.scene().items(QPointF(pos))
+                    if isinstance(item, NodeItem)]
+
+    def node_at(self, pos):
+        for node in self.nodes_at(pos):
+            if self.node_contains(node.pos, pos):
+                return node
+        return None
+
+    def connections_at(self, pos):
+        """Connections passing near pos"""
+        with self.profiler.measure("hit_test"):
+            return [item.connection for item in self.scene().items(QPointF(pos))
+                    if isinstance(item, ConnectionItem)]
+
+    # Edits not shared with Canvas, which repaints dirty regions instead
+
+    def connect_nodes(self, start_node, end_node):
+        """Link two nodes as one undo step, returning the new connection"""
+        connection = self.add_connection((start_node.id, end_node.id))
+        self.history.record(AddConnection(connection))
+        self.sync_items()
+        return connection
+
+    def delete_nodes(self, nodes):
+        """Delete nodes and all their connections as a single undo step"""
+        nodes = list(nodes)
+        if not nodes:
+            return
+        command = RemoveNodes.from_nodes(nodes)
+        command.connections = tuple(self.model.remove_nodes(nodes))
+        self.history.record(command)
+        self.sync_items()
+
+    def paste(self):
+        """Paste the copied nodes, offset by a grid step, as one undo step"""
+        if not self.clipboard:
+            return
+        self.paste_count += 1
+        offset = self.grid_size * self.paste_count
+        new_ids = {}
+        nodes = []
+        for data in self.clipboard['nodes']:
+            node = Node(data['type'],
+                        QPoint(data['pos']['x'] + offset, data['pos']['y'] + offset),
+                        data['name'],
+                        dict(data['characteristics']))
+            self.add_node(node)
+            new_ids[data['id']] = node.id
+            nodes.append(node)
+        connections = [self.add_connection((new_ids[data['source']], new_ids[data['target']]))
+                       for data in self.clipboard['connections']]
+        self.history.record(AddNodes.from_nodes(nodes, connections, "Paste"))
+        self.sync_items()
+        self.set_selection(nodes)
+
+    def undo(self):
+        if self.history.undo():
+            self.sync_items()
+
+    def redo(self):
+        if self.history.redo():
+            self.sync_items()
+
+    def jump_to(self, position):
+        self.history.jump_to(position)
+        self.sync_items()
+
+    def load_schema(self, filename):
+        with open(filename, 'r') as f:
+            data = json.load(f)
+        self.model.load_dict(data)
+        self.history.clear()
+        self.invalidate()
+
+    # Painting
+
+    def drawBackground(self, painter, rect):
+        """Grid lines on world multiples of grid_size, coarsened when zoomed out"""
+        started = time.perf_counter()
+        spacing = self.grid_spacing() / self.zoom
+        pen = QPen(QColor("#333333"), 1)
+        pen.setCosmetic(True)
+        painter.setPen(pen)
+        left = np.floor(rect.left() / spacing) * spacing
+        top = np.floor(rect.top() / spacing) * spacing
+        xs = np.arange(left, rect.right() + spacing, spacing)
+        ys = np.arange(top, rect.bottom() + spacing, spacing)
+        painter.drawLines([QLineF(x, rect.top(), x, rect.bottom()) for x in xs.tolist()]
+                          + [QLineF(rect.left(), y, rect.right(), y) for y in ys.tolist()])
+        self.profiler.add_time("grid", time.perf_counter() - started)
+
+    def paintEvent(self, event):
+        profiler = self.profiler
+        profiler.begin_frame()
+        started = time.perf_counter()
+        super().paintEvent(event)
+
+        # Items in the repainted area, everything else was culled by the index
+        with profiler.phase("index"):
+            area = self.mapToScene(event.rect()).boundingRect()
+            items = self.scene().items(area, Qt.ItemSelectionMode.IntersectsItemBoundingRect)
+            nodes = sum(1 for item in items if isinstance(item, NodeItem))
+            connections = len(items) - nodes - (self.connection_preview is not None)
+        profiler.count("nodes_drawn", nodes)
+        profiler.count("connections_drawn", connections)
+        profiler.count("nodes_culled", len(self.node_items) - nodes)
+        profiler.count("connections_culled", len(self.connection_items) - connections)
+        profiler.end_frame()
+
+        self.last_frame_stats = {
+            "nodes": nodes,
+            "connections": connections,
+            "lod": self.lod_tier(),
+            "zoom": self.zoom,
+            "ms": (time.perf_counter() - started) * 1000,
+        }
+        self.frame_rendered.emit(self.last_frame_stats)
+
+    # Mouse and keyboard
+
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() / 120
+        if steps:
+            self.set_zoom(self.zoom * 1.15 ** steps, event.position())
+        event.accept()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.MiddleButton:
+            self.panning = True
+            self.pan_anchor = event.position()
+            self.viewport().setCursor(Qt.CursorShape.ClosedHandCursor)
+            return
+        if event.button() == Qt.MouseButton.LeftButton:
+            pos = self.to_world(event.position())
+            for node in self.model.nodes_at(pos):
+                if self.is_dot_clicked(node, pos) or (
+                        event.modifiers() & Qt.KeyboardModifier.ControlModifier
+                        and self.node_contains(node.pos, pos)):
+                    self.connecting = True
+                    self.connection_start = node
+                    self.connection_preview = QGraphicsLineItem(QLineF(QPointF(self.node_dot_pos(node)), QPointF(pos)))
+                    self.connection_preview.setPen(self.paint_style()["connection_pen"])
+                    self.connection_preview.setZValue(2)
+                    self.scene().addItem(self.connection_preview)
+                    return
+
+        super().mousePressEvent(event)
+        grabber = self.scene().mouseGrabberItem()
+        if isinstance(grabber, NodeItem):
+            self.dragging = True
+            self.drag_origin = {node.id: (node.x, node.y) for node in self.selected_nodes()}
+
+    def mouseMoveEvent(self, event):
+        if self.panning:
+            delta = event.position() - self.pan_anchor
+            self.pan_anchor = event.position()
+            self.scroll_view(delta)
+            return
+        if self.connecting:
+            line = self.connection_preview.line()
+            line.setP2(QPointF(self.to_world(event.position())))
+            self.connection_preview.setLine(line)
+            return
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if self.panning and event.button() == Qt.MouseButton.MiddleButton:
+            self.panning = False
+            self.pan_anchor = None
+            self.viewport().unsetCursor()
+            return
+
+        if self.connecting:
+            pos = self.to_world(event.position())
+            self.scene().removeItem(self.connection_preview)
+            self.connection_preview = None
+            start_node = self.connection_start
+            self.connecting = False
+            self.connection_start = None
+            for node in self.model.nodes_at(pos):
+                if node is not start_node and (self.node_contains(node.pos, pos)
+                                               or self.is_dot_clicked(node, pos)):
+                    self.connect_nodes(start_node, node)
+                    break
+            return
+
+        super().mouseReleaseEvent(event)
+        if self.dragging:
+            self.dragging = False
+            origin = self.drag_origin
+            self.drag_origin = None
+            moved = [self.model.nodes_by_id[node_id] for node_id in origin
+                     if node_id in self.model.nodes_by_id]
+            moved = [node for node in moved if (node.x, node.y) != origin[node.id]]
+            if moved:
+                self.history.record(MoveNodes([node.id for node in moved],
+                                              [origin[node.id] for node in moved],
+                                              geometry.positions(moved)))
+
+    def keyPressEvent(self, event):
+        key = event.key()
+        if key in (Qt.Key.Key_Delete, Qt.Key.Key_Backspace) and self.selection:
+            self.delete_selection()
+        elif key == Qt.Key.Key_Escape and self.selection:
+            self.clear_selection()
+        else:
+            super().keyPressEvent(event)
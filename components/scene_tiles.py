@@ -0,0 +1,280 @@
+# components/scene_tiles.py
+import math
+import threading
+from collections import OrderedDict
+
+from PyQt6.QtCore import Qt, QObject, QRect, QRectF, QSize, QRunnable, QThreadPool, QTimer, pyqtSignal
+from PyQt6.QtGui import QImage, QPainter, QRegion, QTransform
+
+
+class SceneSnapshot:
+    """
+    Plain data for one area of the scene: enough to draw it without touching
+    the model, so it can be handed to a worker thread.
+
+    nodes are (x, y, type, face, label, selected) tuples, face and label
+    being QImages from utils.icon_cache and utils.label_cache (label is None
+    when it is not drawn), and lines the (x1, y1, x2, y2) node centres of
+    the connections.
+    """
+
+    __slots__ = ("tier", "zoom", "theme", "style", "transform", "nodes", "lines")
+
+    def __init__(self, tier, zoom, theme, style, transform, nodes, lines):
+        self.tier = tier
+        self.zoom = zoom
+        self.theme = theme
+        self.style = style
+        self.transform = transform
+        self.nodes = nodes
+        self.lines = lines
+
+
+class TileSignals(QObject):
+    # generation, tile key, tile version, rendered image
+    finished = pyqtSignal(object, object, int, QImage)
+
+
+class TileJob(QRunnable):
+    """Rasterize one tile on a pool thread"""
+
+    def __init__(self, tiles, generation, key, version, scene):
+        super().__init__()
+        self.tiles = tiles
+        self.generation = generation
+        self.dpr = generation[1]
+        self.key = key
+        self.version = version
+        self.scene = scene
+        self.signals = tiles.signals
+        self.closed = tiles.closed
+
+    def run(self):
+        if self.closed.is_set():
+            return
+        image = self.tiles.rasterize(self.scene, self.dpr)
+        try:
+            self.signals.finished.emit(self.generation, self.key, self.version, image)
+        except RuntimeError:
+            # The tiles were destroyed meanwhile, with their canvas: nobody waits
+            pass
+
+
+class SceneTiles(QObject):
+    """
+    Static layer of the canvas scene, cached as fixed-size tiles.
+
+    Tiles are laid out on the canvas at the current zoom, so panning only
+    blits them at a new offset and an edit re-renders just the tiles it
+    touches. They are drawn with the pan rounded to whole pixels: their
+    content only depends on the zoom and their integer position, and a pan
+    by a fraction of a pixel reuses every tile. Nodes in the dynamic layer (the selection being dragged) and
+    their connections are kept out of the tiles, the canvas draws them over
+    the tiles every frame. Tiles missing from the screen are rendered on the
+    spot; the ring around the viewport is rendered on a thread pool once the
+    view is idle, into QImages since QPixmaps belong to the GUI thread.
+    """
+
+    SIZE = 256  # tile edge in widget pixels
+    MAX_TILES = 192  # about 48 MB of tiles at a pixel ratio of 1
+    PREFETCH_RINGS = 1  # tiles rendered ahead around the viewport
+    PREFETCH_DELAY = 50  # ms the view has to be still before prefetching
+
+    def __init__(self, canvas):
+        super().__init__(canvas)
+        self.canvas = canvas
+        self.tiles = OrderedDict()  # (col, row) -> QImage, least recently used first
+        self.versions = {}  # (col, row) -> bumped whenever the tile is invalidated
+        self.pending = {}  # (col, row) -> version being rendered by the pool
+        self.generation = None
+        self.dynamic = frozenset()  # node ids drawn over the tiles
+
+        self.pool = QThreadPool(self)
+        self.signals = TileSignals(self)
+        self.signals.finished.connect(self.tile_finished)
+        # Set once the tiles are being destroyed, jobs not started yet skip
+        self.closed = threading.Event()
+        # Stop the jobs before the pool and the signals go with the canvas;
+        # the handler must not touch self, already half destroyed
+        closed, pool = self.closed, self.pool
+        self.destroyed.connect(lambda: SceneTiles.stop(pool, closed))
+        self.prefetch_timer = QTimer(self)
+        self.prefetch_timer.setSingleShot(True)
+        self.prefetch_timer.setInterval(self.PREFETCH_DELAY)
+        self.prefetch_timer.timeout.connect(self.prefetch)
+
+    @staticmethod
+    def stop(pool, closed=None):
+        """Drop the queued jobs and wait for the running ones"""
+        if closed is not None:
+            closed.set()
+        pool.clear()
+        pool.waitForDone()
+
+    def shutdown(self):
+        """Stop prefetching, for a canvas closed or about to be destroyed"""
+        self.prefetch_timer.stop()
+        self.pending.clear()
+        self.stop(self.pool)
+
+    def current_generation(self):
+        """Everything tiles depend on apart from the scene content and the pan"""
+        canvas = self.canvas
+        return (canvas.zoom, canvas.devicePixelRatioF(), canvas.theme, canvas.lod_tier())
+
+    def sync(self):
+        """Drop every tile when the zoom, theme or level of detail changed"""
+        generation = self.current_generation()
+        if generation != self.generation:
+            self.generation = generation
+            self.clear()
+
+    def clear(self):
+        self.tiles.clear()
+        self.versions.clear()
+        self.pending.clear()
+        # Queued jobs are useless now, running ones are ignored when they finish
+        self.pool.clear()
+
+    def origin(self):
+        """Widget position of the top left corner of tile (0, 0), the pan rounded"""
+        pan = self.canvas.pan
+        return math.floor(pan.x() + 0.5), math.floor(pan.y() + 0.5)
+
+    def tile_rect(self, key):
+        left, top = self.origin()
+        return QRect(left + key[0] * self.SIZE, top + key[1] * self.SIZE, self.SIZE, self.SIZE)
+
+    def keys_in(self, rect):
+        """Tiles overlapping a widget QRect"""
+        left, top = self.origin()
+        size = self.SIZE
+        cols = range(math.floor((rect.left() - left) / size), math.floor((rect.right() - left) / size) + 1)
+        rows = range(math.floor((rect.top() - top) / size), math.floor((rect.bottom() - top) / size) + 1)
+        return [(col, row) for row in rows for col in cols]
+
+    def invalidate(self, area=None):
+        """Re-render the tiles under a widget QRect or QRegion, all of them by default"""
+        self.sync()
+        if area is None:
+            self.clear()
+            return
+        if area.isEmpty():
+            return
+        region = area if isinstance(area, QRegion) else None
+        bounds = area.boundingRect() if region is not None else area
+        for key in self.keys_in(bounds):
+            if region is not None and not region.intersects(self.tile_rect(key)):
+                continue
+            self.versions[key] = self.versions.get(key, 0) + 1
+            self.tiles.pop(key, None)
+
+    def set_dynamic(self, node_ids):
+        """Change the nodes left out of the tiles; the caller invalidates their area"""
+        self.dynamic = frozenset(node_ids)
+
+    def snapshot(self, rect):
+        """Scene under a widget rect, drawn with rect's top left corner at 0, 0"""
+        canvas = self.canvas
+        left, top = self.origin()
+        zoom = canvas.zoom
+        # Whole pixels only, rect lies on the tile grid
+        transform = QTransform(zoom, 0, 0, zoom, left - rect.x(), top - rect.y())
+        world = transform.inverted()[0].mapRect(QRectF(0, 0, rect.width(), rect.height()))
+        scene = canvas.capture_scene((world.left(), world.top(), world.right(), world.bottom()))
+        scene.transform = transform
+        return scene
+
+    def rasterize(self, scene, dpr, size=None, profiler=None):
+        """
+        Render a snapshot into a new image, a tile by default; safe to call on
+        any thread without a profiler
+        """
+        size = size or QSize(self.SIZE, self.SIZE)
+        image = QImage(int(size.width() * dpr), int(size.height() * dpr),
+                       QImage.Format.Format_ARGB32_Premultiplied)
+        image.setDevicePixelRatio(dpr)
+        image.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(image)
+        # An explicit clip puts the raster engine on a much faster path for
+        # antialiased outlines, about three times faster for node borders
+        painter.setClipRect(QRect(0, 0, size.width(), size.height()))
+        painter.setTransform(scene.transform)
+        self.canvas.draw_scene(painter, scene, profiler)
+        painter.end()
+        return image
+
+    def store(self, key, image):
+        self.tiles[key] = image
+        self.tiles.move_to_end(key)
+        while len(self.tiles) > self.MAX_TILES:
+            self.tiles.popitem(last=False)
+
+    def render_tiles(self, keys, dpr):
+        """
+        Render tiles in a single pass over the scene and cut them out of the
+        result, instead of a pass per tile when a whole view is missing.
+        """
+        cols = [key[0] for key in keys]
+        rows = [key[1] for key in keys]
+        left, top = min(cols), min(rows)
+        block = self.tile_rect((left, top)).united(self.tile_rect((max(cols), max(rows))))
+        profiler = self.canvas.profiler
+        with profiler.phase("capture"):
+            scene = self.snapshot(block)
+        image = self.rasterize(scene, dpr, block.size(), profiler)
+        size = int(self.SIZE * dpr)
+        for col, row in keys:
+            self.store((col, row), image.copy((col - left) * size, (row - top) * size, size, size))
+        return scene
+
+    def draw(self, painter, rect):
+        """
+        Blit the tiles under rect (widget coordinates), rendering the missing
+        ones first. Returns the number of tiles, nodes and connections drawn.
+        """
+        self.sync()
+        stats = {"tiles": 0, "tiles_rendered": 0, "nodes": 0, "connections": 0}
+        dpr = self.generation[1]
+        keys = self.keys_in(rect)
+        missing = [key for key in keys if key not in self.tiles]
+        if missing:
+            scene = self.render_tiles(missing, dpr)
+            stats["tiles_rendered"] = len(missing)
+            stats["nodes"] = len(scene.nodes)
+            stats["connections"] = len(scene.lines)
+        profiler = self.canvas.profiler
+        with profiler.phase("tiles"):
+            for key in keys:
+                image = self.tiles[key]
+                self.tiles.move_to_end(key)
+                tile = self.tile_rect(key)
+                target = tile.intersected(rect)
+                source = QRectF(target.translated(-tile.x(), -tile.y()))
+                painter.drawImage(QRectF(target), image,
+                                  QRectF(source.x() * dpr, source.y() * dpr,
+                                         source.width() * dpr, source.height() * dpr))
+                stats["tiles"] += 1
+        profiler.count("tiles_drawn", stats["tiles"])
+        profiler.count("tiles_rendered", stats["tiles_rendered"])
+        self.prefetch_timer.start()
+        return stats
+
+    def prefetch(self):
+        """Queue the tiles around the viewport that are not cached yet"""
+        self.sync()
+        margin = self.SIZE * self.PREFETCH_RINGS
+        area = self.canvas.rect().adjusted(-margin, -margin, margin, margin)
+        for key in self.keys_in(area):
+            version = self.versions.get(key, 0)
+            if key in self.tiles or self.pending.get(key) == version:
+                continue
+            self.pending[key] = version
+            self.pool.start(TileJob(self, self.generation, key, version, self.snapshot(self.tile_rect(key))))
+
+    def tile_finished(self, generation, key, version, image):
+        if generation != self.generation or self.pending.get(key) != version:
+            return
+        del self.pending[key]
+        if self.versions.get(key, 0) == version and key not in self.tiles:
+            self.store(key, image)
@@ -1,19 +1,18 @@
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
                            QLineEdit, QPushButton, QFormLayout, QGroupBox,
-                           QMessageBox, QProgressDialog)
-from PyQt6.QtCore import Qt, QPoint, QTimer
-from PyQt6.QtCore import Qt
-import requests
-import json
-import requests
+                           QMessageBox)
+from PyQt6.QtCore import Qt, QPoint
 import math
+from components.request_status import RequestStatus
+from utils import device_api, device_client
+from utils.schema_model import Node
 
 class TPEDialog(QDialog):
     def __init__(self, node_data=None, canvas=None, parent=None):
         super().__init__(parent)
         self.node_data = node_data or {}  # We initialize as node_data
         self.canvas = canvas
-        self.token = None
+        self.last_retrieved_config = self.node_data.get("last_retrieved_config", {})
         self.setWindowTitle("TPE Configuration")
         self.setWindowFlags(Qt.WindowType.Window | Qt.WindowType.WindowCloseButtonHint)
         self.setup_ui()
@@ -55,6 +54,14 @@ class TPEDialog(QDialog):
         button_layout.addWidget(self.cancel_btn)
         layout.addLayout(button_layout)
 
+        self.status = RequestStatus()
+        self.status.busy_changed.connect(self.set_busy)
+        layout.addWidget(self.status)
+
+    def set_busy(self, busy):
+        self.get_config_btn.setEnabled(not busy)
+        self.set_config_btn.setEnabled(not busy)
+
     def apply_theme(self):
         is_dark = self.parent().dark_mode if hasattr(self.parent(), 'dark_mode') else True
         
@@ -129,93 +136,64 @@ class TPEDialog(QDialog):
                 }
             """)
 
-    def get_token(self):
-        try:
-            url = f"http://{self.ip_edit.text()}:{self.port_edit.text()}/login"
-            data = {
-                "username": self.user_edit.text(),
-                "password": self.pass_edit.text()
-            }
-            response = requests.post(url, json=data)
-            response.raise_for_status()
-            result = response.json()
-            
-            if result.get("status"):
-                return result["data"]["token"]
-            else:
-                raise Exception(result.get("error", "Unknown error"))
-                
-        except requests.RequestException as e:
-            raise Exception(f"Network error: {str(e)}")
-        except Exception as e:
-            raise Exception(f"Error getting token: {str(e)}")
+    def request_failed(self, message):
+        QMessageBox.critical(self, "Error", message)
 
     def get_config(self):
+        device = self.get_data()
+        request = self.status.track(
+            device_client.client().run(device_api.fetch_tpe_cameras, device),
+            f"Getting cameras from {device_api.address(device)}...")
+        request.finished.connect(self.cameras_received)
+        request.failed.connect(self.request_failed)
+
+    def cameras_received(self, cameras):
+        self.last_retrieved_config = {"cameras": cameras}
         try:
-            # Get token first
-            self.token = self.get_token()
-            
-            # Get cameras
-            url = f"http://{self.ip_edit.text()}:{self.port_edit.text()}/cameras"
-            headers = {"Authorization": f"Bearer {self.token}"}
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            result = response.json()
-            
-            if result.get("status"):
+            # Replacing the cameras is a single undo step
+            with self.canvas.history.transaction("Load TPE Cameras"):
                 # Clear existing nodes except TPE
-                self.canvas.nodes = [node for node in self.canvas.nodes if node["type"] == "TPE"]
+                self.canvas.delete_nodes([node for node in self.canvas.nodes if node.type != "TPE"])
                 
                 # Add cameras
-                tpe_pos = next(node["pos"] for node in self.canvas.nodes if node["type"] == "TPE")
-                for idx, camera in enumerate(result["data"]["cameras"]):
-                    camera_node = {
-                        "type": "CCTV",
-                        "pos": self.calculate_camera_position(tpe_pos, idx, len(result["data"]["cameras"])),
-                        "icon": self.canvas.get_icon("CCTV"),
-                        "name": camera["name"],
-                        "characteristics": {
+                tpe_node = next(node for node in self.canvas.nodes if node.type == "TPE")
+                tpe_pos = tpe_node.pos
+                for idx, camera in enumerate(cameras):
+                    camera_node = Node(
+                        "CCTV",
+                        self.calculate_camera_position(tpe_pos, idx, len(cameras)),
+                        camera["name"],
+                        {
                             "latitude": str(camera["latitude"]),
                             "longitude": str(camera["longitude"]),
                             "camera_id": str(camera["cameraId"]),
                             "street_id": str(camera["streetId"]) if camera["streetId"] else "",
                             "name": camera["name"]
                         }
-                    }
-                    self.canvas.nodes.append(camera_node)
+                    )
+                    self.canvas.insert_nodes([camera_node], label="Add Camera")
                     
                     # Add connection to TPE
-                    self.canvas.connections.append((tpe_pos, camera_node["pos"]))
-                
-                self.canvas.update()
-                self.accept()
-                
-            else:
-                raise Exception(result.get("error", "Unknown error"))
-                
+                    self.canvas.connect_nodes(tpe_node, camera_node)
+            
+            self.canvas.invalidate()
+            self.accept()
+            
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
 
     def set_config(self):
         try:
-            # Get token first
-            self.token = self.get_token()
-            
             # Prepare camera data
             cameras = []
-            tpe_node = next(node for node in self.canvas.nodes if node["type"] == "TPE")
+            tpe_node = next(node for node in self.canvas.nodes if node.type == "TPE")
+            connected_ids = {n.id for n in self.canvas.model.neighbors(tpe_node)}
             
             for node in self.canvas.nodes:
-                if node["type"] == "CCTV":
+                if node.type == "CCTV":
                     # Check if connected to TPE
-                    is_connected = any(
-                        (conn[0] == tpe_node["pos"] and conn[1] == node["pos"]) or
-                        (conn[1] == tpe_node["pos"] and conn[0] == node["pos"])
-                        for conn in self.canvas.connections
-                    )
-                    
-                    if is_connected:
-                        char = node.get("characteristics", {})
+                    if node.id in connected_ids:
+                        char = node.characteristics
                         camera = {
                             "name": char.get("name", ""),
                             "cameraId": int(char.get("camera_id", 0)),
@@ -224,24 +202,26 @@ class TPEDialog(QDialog):
                             "longitude": float(char.get("longitude", 0))
                         }
                         cameras.append(camera)
-            
-            # Send configuration
-            url = f"http://{self.ip_edit.text()}:{self.port_edit.text()}/cameras"
-            headers = {"Authorization": f"Bearer {self.token}"}
-            data = {"cameras": cameras}
-            
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()
-            result = response.json()
-            
-            if result.get("status"):
-                QMessageBox.information(self, "Success", "Configuration sent successfully")
-                self.accept()
-            else:
-                raise Exception(result.get("error", "Unknown error"))
-                
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
+            return
+        
+        # Send configuration
+        device = self.get_data()
+        request = self.status.track(
+            device_client.client().run(device_api.push_tpe_cameras, device, cameras),
+            f"Sending {len(cameras)} cameras to {device_api.address(device)}...")
+        request.finished.connect(self.cameras_sent)
+        request.failed.connect(self.request_failed)
+
+    def cameras_sent(self):
+        QMessageBox.information(self, "Success", "Configuration sent successfully")
+        self.accept()
+
+    def done(self, result):
+        # Nobody waits for an answer once the dialog is closed
+        self.status.cancel()
+        super().done(result)
 
     def calculate_camera_position(self, tpe_pos, index, total):
         # Calculate position in a circular pattern around TPE
@@ -253,133 +233,12 @@ class TPEDialog(QDialog):
         return QPoint(int(x), int(y))
 
     def get_data(self):
-        return {
+        data = {
             "ip": self.ip_edit.text(),
             "port": self.port_edit.text(),
             "username": self.user_edit.text(),
             "password": self.pass_edit.text()
         }
-class LoadingDialog(QDialog):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("Loading")
-        self.setFixedSize(200, 100)
-        self.setWindowFlags(Qt.WindowType.Dialog | Qt.WindowType.FramelessWindowHint)
-        
-        layout = QVBoxLayout(self)
-        
-        # Create dots container
-        self.dots_label = QLabel("Loading")
-        self.dots_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        layout.addWidget(self.dots_label)
-        
-        # Initialize dots animation
-        self.dot_count = 0
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_dots)
-        self.timer.start(500)  # Update every 500ms
-        
-        # Apply theme
-        self.apply_theme()
-
-    def update_dots(self):
-        self.dot_count = (self.dot_count + 1) % 4
-        self.dots_label.setText("Loading" + "." * self.dot_count)
-
-    def apply_theme(self):
-        is_dark = self.parent().dark_mode if hasattr(self.parent(), 'dark_mode') else True
-        
-        if is_dark:
-            self.setStyleSheet("""
-                QDialog {
-                    background-color: #2a2a2a;
-                    color: white;
-                    border: 1px solid #3a3a3a;
-                    border-radius: 10px;
-                }
-                QLabel {
-                    color: white;
-                    font-size: 14px;
-                }
-            """)
-        else:
-            self.setStyleSheet("""
-                QDialog {
-                    background-color: white;
-                    color: black;
-                    border: 1px solid #d0d0d0;
-                    border-radius: 10px;
-                }
-                QLabel {
-                    color: black;
-                    font-size: 14px;
-                }
-            """)
-            
-    # ... (keep existing init and setup_ui methods)
-
-    def get_config(self):
-        # Show loading dialog
-        loading = LoadingDialog(self)
-        loading.show()
-        
-        try:
-            # Get token first
-            self.token = self.get_token()
-            
-            # Get cameras
-            url = f"http://{self.ip_edit.text()}:{self.port_edit.text()}/cameras"
-            headers = {"Authorization": f"Bearer {self.token}"}
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            result = response.json()
-            
-            if result.get("status"):
-                # Clear existing nodes except TPE
-                self.canvas.nodes = [node for node in self.canvas.nodes if node["type"] == "TPE"]
-                
-                # Add cameras
-                tpe_pos = next(node["pos"] for node in self.canvas.nodes if node["type"] == "TPE")
-                for idx, camera in enumerate(result["data"]["cameras"]):
-                    camera_node = {
-                        "type": "CCTV",
-                        "pos": self.calculate_camera_position(tpe_pos, idx, len(result["data"]["cameras"])),
-                        "icon": self.canvas.get_icon("CCTV"),
-                        "name": camera["name"],
-                        "characteristics": {
-                            "latitude": str(camera["latitude"]),
-                            "longitude": str(camera["longitude"]),
-                            "camera_id": str(camera["cameraId"]),
-                            "street_id": str(camera["streetId"]) if camera["streetId"] else "",
-                            "name": camera["name"]
-                        }
-                    }
-                    self.canvas.nodes.append(camera_node)
-                    
-                    # Add connection to TPE
-                    self.canvas.connections.append((tpe_pos, camera_node["pos"]))
-                
-                self.canvas.update()
-                loading.close()
-                self.accept()
-                
-            else:
-                loading.close()
-                raise Exception(result.get("error", "Unknown error"))
-                
-        except Exception as e:
-            loading.close()
-            QMessageBox.critical(self, "Error", str(e))
-
-    def set_config(self):
-        # Show loading dialog
-        loading = LoadingDialog(self)
-        loading.show()
-        
-        try:
-            # ... (rest of set_config implementation)
-            # Remember to close loading dialog in success and error cases
-            loading.close()
-        except Exception as e:
-            loading.close()
-            QMessageBox.critical(self, "Error", str(e))
\ No newline at end of file
+        if self.last_retrieved_config:
+            data["last_retrieved_config"] = self.last_retrieved_config
+        return data
@@ -1,11 +1,16 @@
 # main.py
+import argparse
 import sys
 from PyQt6.QtWidgets import QApplication, QMainWindow, QStackedWidget, QLabel, QVBoxLayout, QWidget
 from PyQt6.QtCore import Qt
+# QtWebEngine has to be loaded before the QApplication is created
+from PyQt6.QtWebEngineWidgets import QWebEngineView  # noqa: F401
 from components.sidebar import NavigationSidebar, DesignSidebar
 from components.canvas import Canvas
+from components.scene_canvas import SceneCanvas
 from components.control_panel import ControlPanel
 from components.settings_panel import SettingsPanel
+from components.history_panel import HistoryPanel
 from utils.styles import load_styles, load_dark_theme, load_light_theme
 from PyQt6.QtWidgets import QFileDialog
 
@@ -25,8 +30,14 @@ class HomeView(QWidget):
         """)
         layout.addWidget(title)
 
+# Canvas implementations, picked with --engine
+CANVAS_ENGINES = {
+    "widget": Canvas,
+    "scene": SceneCanvas,
+}
+
 class KonectTrafficStudio(QMainWindow):
-    def __init__(self):
+    def __init__(self, engine="widget"):
         super().__init__()
         self.setWindowTitle("Konect Traffic Studio v1.1")
         self.dark_mode = True
@@ -39,7 +50,7 @@ class KonectTrafficStudio(QMainWindow):
         
         # Create views
         self.home_view = HomeView()
-        self.canvas = Canvas()
+        self.canvas = CANVAS_ENGINES[engine]()
         self.control_panel = ControlPanel()
         self.settings_panel = SettingsPanel(self)
         
@@ -58,9 +69,17 @@ class KonectTrafficStudio(QMainWindow):
         self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.design_sidebar)
         self.design_sidebar.hide()
         
+        # Undo history timeline, shown from the View menu
+        self.history_panel = HistoryPanel(self.canvas)
+        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.history_panel)
+        self.history_panel.hide()
+        
         # Create menu bar
         self.create_menu_bar()
         
+        # Report canvas level of detail and frame cost
+        self.canvas.frame_rendered.connect(self.show_frame_stats)
+        
     def switch_to_home(self):
         self.stacked_widget.setCurrentWidget(self.home_view)
         self.design_sidebar.hide()
@@ -77,6 +96,12 @@ class KonectTrafficStudio(QMainWindow):
         self.stacked_widget.setCurrentWidget(self.settings_panel)
         self.design_sidebar.hide()
 
+    def show_frame_stats(self, stats):
+        if self.stacked_widget.currentWidget() == self.canvas:
+            self.statusBar().showMessage(
+                f"Zoom {stats['zoom'] * 100:.0f}% | LOD {stats['lod']} | "
+                f"{stats['nodes']} nodes, {stats['connections']} links | {stats['ms']:.1f} ms")
+
     def toggle_theme(self):
         self.dark_mode = not self.dark_mode
         if self.dark_mode:
@@ -111,6 +136,45 @@ class KonectTrafficStudio(QMainWindow):
         redo_action = edit_menu.addAction("&Redo")
         redo_action.setShortcuts(["Ctrl+Shift+Z", "Ctrl+Y"])
         redo_action.triggered.connect(self.canvas.redo)
+
+        edit_menu.addSeparator()
+
+        select_all_action = edit_menu.addAction("Select &All")
+        select_all_action.setShortcut("Ctrl+A")
+        select_all_action.triggered.connect(self.canvas.select_all)
+
+        copy_action = edit_menu.addAction("&Copy")
+        copy_action.setShortcut("Ctrl+C")
+        copy_action.triggered.connect(self.canvas.copy_selection)
+
+        paste_action = edit_menu.addAction("&Paste")
+        paste_action.setShortcut("Ctrl+V")
+        paste_action.triggered.connect(self.canvas.paste)
+
+        delete_action = edit_menu.addAction("&Delete Selection")
+        delete_action.triggered.connect(self.canvas.delete_selection)
+
+        # Arrange menu, acting on the selected nodes
+        arrange_menu = menubar.addMenu("&Arrange")
+
+        snap_action = arrange_menu.addAction("&Snap Selection to Grid")
+        snap_action.triggered.connect(self.canvas.snap_selection)
+
+        arrange_menu.addSeparator()
+        for label, mode in (("Align &Left", "left"), ("Align &Right", "right"),
+                            ("Align &Top", "top"), ("Align &Bottom", "bottom"),
+                            ("Align &Horizontal Centres", "hcenter"),
+                            ("Align &Vertical Centres", "vcenter")):
+            align_action = arrange_menu.addAction(label)
+            align_action.triggered.connect(
+                lambda checked=False, mode=mode: self.canvas.align_selection(mode))
+
+        arrange_menu.addSeparator()
+        for label, axis in (("Distribute Hori&zontally", "horizontal"),
+                            ("Distribute V&ertically", "vertical")):
+            distribute_action = arrange_menu.addAction(label)
+            distribute_action.triggered.connect(
+                lambda checked=False, axis=axis: self.canvas.distribute_selection(axis))
         
         # View menu
         view_menu = menubar.addMenu("&View")
@@ -119,6 +183,35 @@ class KonectTrafficStudio(QMainWindow):
         toggle_grid_action.setShortcut("Ctrl+G")
         toggle_grid_action.triggered.connect(self.canvas.toggle_snap_to_grid)
         
+        zoom_in_action = view_menu.addAction("Zoom &In")
+        zoom_in_action.setShortcuts(["Ctrl++", "Ctrl+="])
+        zoom_in_action.triggered.connect(self.canvas.zoom_in)
+        
+        zoom_out_action = view_menu.addAction("Zoom &Out")
+        zoom_out_action.setShortcut("Ctrl+-")
+        zoom_out_action.triggered.connect(self.canvas.zoom_out)
+        
+        reset_view_action = view_menu.addAction("&Reset View")
+        reset_view_action.setShortcut("Ctrl+0")
+        reset_view_action.triggered.connect(self.canvas.reset_view)
+
+        view_menu.addSeparator()
+        history_action = self.history_panel.toggleViewAction()
+        history_action.setShortcut("Ctrl+H")
+        view_menu.addAction(history_action)
+
+        profiler_action = view_menu.addAction("&Debug Overlay")
+        profiler_action.setShortcut("F12")
+        profiler_action.setCheckable(True)
+        profiler_action.toggled.connect(self.canvas.profiler_overlay.setVisible)
+        
+        # Devices menu, talking to every device on the canvas
+        devices_menu = menubar.addMenu("&Devices")
+        pull_all_action = devices_menu.addAction("&Pull All Configurations")
+        pull_all_action.triggered.connect(self.canvas.pull_all_configs)
+        push_action = devices_menu.addAction("Pu&sh Configurations")
+        push_action.triggered.connect(self.canvas.push_configs)
+        
         # Theme menu
         theme_menu = menubar.addMenu("&Theme")
         theme_action = theme_menu.addAction("Toggle &Theme")
@@ -165,8 +258,13 @@ class KonectTrafficStudio(QMainWindow):
 
 
 def main():
-    app = QApplication(sys.argv)
-    window = KonectTrafficStudio()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--engine", choices=sorted(CANVAS_ENGINES), default="widget",
+                        help="canvas implementation: widget (default) or scene (QGraphicsScene)")
+    # Everything else is left to Qt
+    args, qt_args = parser.parse_known_args()
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = KonectTrafficStudio(args.engine)
     window.show()
     sys.exit(app.exec())
 
@@ -3,7 +3,7 @@ from cx_Freeze import setup, Executable
 
 # Dependencies
 build_exe_options = {
-    "packages": ["PyQt6", "requests"],
+    "packages": ["PyQt6", "requests", "numpy"],
     "excludes": [],
     "include_files": [
         ("assets", "assets"),  # Include assets directory
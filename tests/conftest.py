@@ -0,0 +1,15 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+# Widgets are never shown, the tests run without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    from PyQt6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
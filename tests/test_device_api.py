@@ -0,0 +1,117 @@
+# tests/test_device_api.py
+import base64
+import json
+import threading
+import time
+
+import pytest
+
+from utils import device_api
+from utils.device_api import DeviceError, TokenCache
+
+DEVICE = {"ip": "10.0.0.1", "port": "80", "username": "admin", "password": "secret"}
+
+
+class Call:
+    """What device tasks see of their request, never cancelled here"""
+    timeout = 1
+
+    def check(self):
+        pass
+
+
+def jwt(claims):
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip("=")
+    return f"header.{payload}.signature"
+
+
+def test_logins_are_single_flight():
+    cache = TokenCache()
+    logins = []
+
+    def login():
+        logins.append(1)
+        # Every other caller arrives while this login runs
+        time.sleep(0.2)
+        return f"token{len(logins)}", 300
+
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(cache.get("controller", DEVICE, login)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(logins) == 1
+    assert tokens == ["token1"] * 8
+
+
+def test_token_is_renewed_once_expired(monkeypatch):
+    cache = TokenCache()
+    now = [1000.0]
+    monkeypatch.setattr(device_api.time, "monotonic", lambda: now[0])
+    count = iter(range(1, 10))
+    login = lambda: (f"token{next(count)}", 60)
+    assert cache.get("tpe", DEVICE, login) == "token1"
+    now[0] += 60 - device_api.TOKEN_MARGIN - 1
+    assert cache.get("tpe", DEVICE, login) == "token1"
+    now[0] += 1
+    assert cache.get("tpe", DEVICE, login) == "token2"
+
+
+def test_tokens_are_per_kind_device_user_and_password():
+    cache = TokenCache()
+    count = iter(range(1, 10))
+    login = lambda: (f"token{next(count)}", 300)
+    assert cache.get("controller", DEVICE, login) == "token1"
+    assert cache.get("tpe", DEVICE, login) == "token2"
+    assert cache.get("controller", dict(DEVICE, port="81"), login) == "token3"
+    assert cache.get("controller", dict(DEVICE, username="other"), login) == "token4"
+    # A new password logs in again and replaces the token
+    assert cache.get("controller", dict(DEVICE, password="new"), login) == "token5"
+    assert cache.get("controller", dict(DEVICE, password="new"), login) == "token5"
+
+
+def test_invalidate_keeps_a_token_already_replaced():
+    cache = TokenCache()
+    count = iter(range(1, 10))
+    login = lambda: (f"token{next(count)}", 300)
+    cache.get("controller", DEVICE, login)
+    cache.invalidate("controller", DEVICE, "token1")
+    assert cache.get("controller", DEVICE, login) == "token2"
+    cache.invalidate("controller", DEVICE, "token1")
+    assert cache.get("controller", DEVICE, login) == "token2"
+
+
+def test_401_logs_in_again_once(monkeypatch):
+    monkeypatch.setattr(device_api, "tokens", TokenCache())
+    count = iter(range(1, 10))
+    monkeypatch.setitem(device_api.LOGINS, "controller", lambda device, timeout: (f"token{next(count)}", 300))
+    sent = []
+
+    def send(token):
+        sent.append(token)
+        if token == "token1":
+            raise DeviceError("expired", 401)
+        return "config"
+
+    assert device_api._authorized(Call(), "controller", DEVICE, send) == "config"
+    assert sent == ["token1", "token2"]
+
+    # A device refusing the new token too fails the call
+    def refuse(token):
+        sent.append(token)
+        raise DeviceError("refused", 401)
+
+    sent.clear()
+    with pytest.raises(DeviceError):
+        device_api._authorized(Call(), "controller", DEVICE, refuse)
+    assert sent == ["token2", "token3"]
+
+
+def test_token_lifetime():
+    assert device_api._token_lifetime("opaque", 120) == 120
+    assert device_api._token_lifetime("opaque", "bad") == device_api.TOKEN_LIFETIME
+    assert device_api._token_lifetime("opaque") == device_api.TOKEN_LIFETIME
+    lifetime = device_api._token_lifetime(jwt({"exp": time.time() + 600}))
+    assert 590 < lifetime <= 600
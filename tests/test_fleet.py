@@ -0,0 +1,209 @@
+# tests/test_fleet.py
+import pytest
+from PyQt6.QtCore import QEventLoop, QObject, QPoint, QTimer, pyqtSignal
+
+from utils import fleet
+from utils.device_api import DeviceError
+from utils.schema_model import Node, SchemaModel
+
+# The real one, the tests replace it to retry at once
+BACKOFF_DELAY = fleet.backoff_delay
+
+
+class FakeRequest(QObject):
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.error = None
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeClient:
+    """Runs tasks on the next event loop turn instead of a pool, counting those in flight"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    def run(self, task, *args):
+        request = FakeRequest()
+        self.calls.append((task, args))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        def settle():
+            self.in_flight -= 1
+            if request.cancelled:
+                return
+            try:
+                result = task(*args)
+            except DeviceError as e:
+                request.error = e
+                request.failed.emit(str(e))
+            else:
+                request.finished.emit(result)
+        QTimer.singleShot(0, settle)
+        return request
+
+
+def run_fleet(nodes, prepare, **kwargs):
+    client = FakeClient()
+    run = fleet.FleetRun(nodes, prepare, client=client, **kwargs)
+    settled = []
+    run.device_done.connect(lambda node, result, error: settled.append((node.id, result, error)))
+    loop = QEventLoop()
+    run.finished.connect(loop.quit)
+    QTimer.singleShot(5000, loop.quit)
+    run.start()
+    if run.active:
+        loop.exec()
+    return run, client, settled
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(qapp, monkeypatch):
+    monkeypatch.setattr(fleet, "backoff_delay", lambda attempt: 0)
+
+
+def nodes(count, node_type="Controller"):
+    return [Node(node_type, QPoint(i * 100, 0), node_id=i + 1) for i in range(count)]
+
+
+def test_every_node_settles_within_the_concurrency_cap():
+    targets = nodes(40)
+    run, client, settled = run_fleet(targets, lambda node: (lambda: node.id * 2, ()), concurrency=5)
+    assert client.max_in_flight == 5
+    assert sorted(settled) == [(node.id, node.id * 2, None) for node in targets]
+    assert run.settled == run.total == 40
+    assert not run.errors
+
+
+def test_prepare_errors_fail_without_a_request():
+    def prepare(node):
+        if node.id % 2:
+            raise DeviceError("No address set")
+        return (lambda: "ok"), ()
+
+    run, client, settled = run_fleet(nodes(6), prepare)
+    assert len(client.calls) == 3
+    assert run.errors == {1: "No address set", 3: "No address set", 5: "No address set"}
+
+
+def test_passing_failures_are_retried_then_given_up():
+    attempts = {}
+
+    def flaky(node):
+        attempts[node.id] = attempts.get(node.id, 0) + 1
+        if node.id == 1 and attempts[1] <= 2:
+            raise DeviceError("Could not connect")
+        if node.id == 2:
+            raise DeviceError("busy", 503)
+        if node.id == 3:
+            raise DeviceError("forbidden", 403)
+        return "pushed"
+
+    run, client, settled = run_fleet(nodes(3), lambda node: (flaky, (node,)), retries=3)
+    assert run.results == {1: "pushed"}
+    assert run.retried == {1: 2, 2: 3}
+    assert attempts == {1: 3, 2: 4, 3: 1}
+    assert "busy" in run.errors[2]
+    # A refusal that cannot pass is not retried
+    assert 3 not in run.retried
+
+
+@pytest.mark.parametrize("status", [400, 422])
+def test_rejected_push_rolls_back(status):
+    pushed = []
+
+    def push(node, config):
+        pushed.append((node.id, config))
+        if config == "new":
+            raise DeviceError("invalid", status)
+
+    def rollback(node):
+        return (push, (node, "pulled")) if node.id == 1 else None
+
+    run, client, settled = run_fleet(nodes(2), lambda node: (push, (node, "new")),
+                                     retries=3, rollback=rollback)
+    assert pushed.count((1, "pulled")) == 1
+    assert run.rolled_back == {1}
+    assert "rolled back" in run.errors[1]
+    assert "no pulled configuration" in run.errors[2]
+    # Rejections are not retried
+    assert not run.retried
+
+
+def test_failed_rollback_is_reported():
+    def push(node, config):
+        raise DeviceError("invalid" if config == "new" else "down", 422 if config == "new" else 403)
+
+    run, client, settled = run_fleet(nodes(1), lambda node: (push, (node, "new")),
+                                     rollback=lambda node: (push, (node, "pulled")))
+    assert not run.rolled_back
+    assert "rollback failed: down" in run.errors[1]
+
+
+def test_cancel_finishes_at_once():
+    client = FakeClient()
+    run = fleet.FleetRun(nodes(20), lambda node: ((lambda: "ok"), ()), concurrency=4, client=client)
+    finished = []
+    run.finished.connect(lambda: finished.append(True))
+    run.start()
+    run.cancel()
+    loop = QEventLoop()
+    QTimer.singleShot(50, loop.quit)
+    loop.exec()
+    assert finished == [True]
+    assert run.settled == 0
+    assert len(client.calls) == 4
+
+
+def test_backoff_grows_and_is_capped():
+    for attempt in range(10):
+        expected = min(fleet.BACKOFF * 2 ** attempt, fleet.BACKOFF_MAX)
+        assert expected / 2 <= BACKOFF_DELAY(attempt) <= expected
+
+
+def schema():
+    model = SchemaModel()
+    controller = model.add_node(Node("Controller", QPoint(0, 0), characteristics={
+        "ip": "10.0.0.1", "port": "80", "username": "admin", "password": "secret",
+        "phase_bounds": {"1": {"g_min": 5}}, "phase_camera_mapping": {"1": [1]}, "notes": "kept home"}))
+    basiq = model.add_node(Node("BasiQ", QPoint(200, 0), characteristics={"algorithm_name": "q", "f_adj": 0.5}))
+    model.add_connection((basiq.id, controller.id))
+    return model, controller, basiq
+
+
+def test_push_sends_only_device_settings():
+    model, controller, basiq = schema()
+    task, (device, config) = fleet.push_task(model, controller)
+    assert device == {"ip": "10.0.0.1", "port": "80", "username": "admin", "password": "secret"}
+    assert config == {"phase_bounds": {"1": {"g_min": 5}}, "phase_camera_mapping": {"1": [1]}}
+    # BasiQ is reached through its Controller
+    task, (device, config) = fleet.push_task(model, basiq)
+    assert device["ip"] == "10.0.0.1"
+    assert config == {"algorithm_name": "q", "f_adj": 0.5}
+
+
+def test_rollback_needs_a_pulled_configuration():
+    model, controller, basiq = schema()
+    assert fleet.rollback_task(model, controller) is None
+    pulled = {"phase_bounds": {"1": {"g_min": 1}}, "phase_camera_mapping": {}}
+    controller.characteristics = fleet.pulled_characteristics(controller, pulled)
+    task, (device, config) = fleet.rollback_task(model, controller)
+    assert config == pulled
+
+
+def test_pull_without_address_fails_early():
+    model, controller, basiq = schema()
+    with pytest.raises(DeviceError):
+        fleet.pull_task(model, model.add_node(Node("TPE", QPoint(0, 300))))
+    model.remove_node(controller)
+    with pytest.raises(DeviceError):
+        fleet.pull_task(model, basiq)
@@ -0,0 +1,213 @@
+# tests/test_history.py
+import random
+
+from PyQt6.QtCore import QPoint
+
+from utils import geometry
+from utils.history import AddConnection, AddNodes, EditNode, History, MoveNodes, RemoveConnection, RemoveNodes
+from utils.schema_model import Node, SchemaModel
+
+
+def add_nodes(model, history, count, x=0):
+    nodes = [Node("TPE", QPoint(x + i * 100, 0)) for i in range(count)]
+    for node in nodes:
+        model.add_node(node)
+    history.record(AddNodes.from_nodes(nodes))
+    return nodes
+
+
+def test_step_larger_than_the_cap_stays_undoable():
+    model = SchemaModel()
+    history = History(model, max_bytes=1000)
+    add_nodes(model, history, 2)
+    add_nodes(model, history, 50, x=1000)
+    assert history.undo_stack[-1].nbytes > history.max_bytes
+
+    # The older step is dropped, the one just recorded is kept
+    assert len(history) == 1
+    assert history.first == 1
+    assert history.undo() is not None
+    assert len(model.nodes) == 2
+    assert history.redo() is not None
+    assert len(model.nodes) == 52
+
+
+def test_oldest_steps_are_evicted_past_max_steps():
+    model = SchemaModel()
+    history = History(model, max_steps=3)
+    for i in range(5):
+        add_nodes(model, history, 1, x=i * 100)
+    assert len(history) == 3
+    assert history.first == 2
+    assert history.position == 5
+
+
+def state(model):
+    """Everything an undo must bring back, ids included"""
+    return (sorted((node.id, node.type, node.name, node.x, node.y,
+                    node.characteristics if node.has_characteristics() else None)
+                   for node in model.nodes),
+            sorted(model.connections))
+
+
+def test_undo_and_redo_every_kind_of_step():
+    model = SchemaModel()
+    history = History(model)
+    a, b = add_nodes(model, history, 2)
+    states = [state(model)]
+
+    conn = model.add_connection((a.id, b.id))
+    history.record(AddConnection(conn))
+    states.append(state(model))
+
+    old = geometry.positions([a, b])
+    model.move_nodes([a, b], [(500, 500), (700, 500)])
+    history.record(MoveNodes([a.id, b.id], old, geometry.positions([a, b])))
+    states.append(state(model))
+
+    removed = model.remove_connection(conn)
+    history.record(RemoveConnection(removed))
+    states.append(state(model))
+
+    command = RemoveNodes.from_nodes([a])
+    command.connections = tuple(model.remove_nodes([a]))
+    history.record(command)
+    states.append(state(model))
+
+    for expected in reversed(states[:-1]):
+        assert history.undo() is not None
+        assert state(model) == expected
+    assert history.undo() is not None
+    assert state(model) == ([], [])
+    assert not history.can_undo()
+    for expected in states:
+        assert history.redo() is not None
+        assert state(model) == expected
+    assert not history.can_redo()
+
+
+def test_moves_with_one_merge_key_are_one_step():
+    model = SchemaModel()
+    history = History(model)
+    (node,) = add_nodes(model, history, 1)
+    for step in range(1, 6):
+        old = geometry.positions([node])
+        model.move_nodes([node], [(step * 10, 0)])
+        history.record(MoveNodes([node.id], old, geometry.positions([node]), merge_key="drag"))
+    assert history.labels() == ["Add", "Move"]
+    history.undo()
+    assert (node.x, node.y) == (0, 0)
+
+    # Moving back to the start leaves no step behind
+    history.redo()
+    old = geometry.positions([node])
+    model.move_nodes([node], [(0, 0)])
+    history.record(MoveNodes([node.id], old, geometry.positions([node]), merge_key="drag"))
+    assert history.labels() == ["Add"]
+
+
+def test_transaction_is_one_step():
+    model = SchemaModel()
+    history = History(model)
+    with history.transaction("Paste"):
+        a, b = add_nodes(model, history, 2)
+        history.record(AddConnection(model.add_connection((a.id, b.id))))
+        assert not history.can_undo()
+    assert history.labels() == ["Paste"]
+    history.undo()
+    assert state(model) == ([], [])
+    history.redo()
+    assert len(model.nodes) == 2 and len(model.connections) == 1
+
+    # A transaction recording nothing leaves no step
+    with history.transaction("Nothing"):
+        pass
+    assert history.labels() == ["Paste"]
+
+
+def test_new_step_drops_the_redo_steps_and_their_bytes():
+    model = SchemaModel()
+    history = History(model)
+    add_nodes(model, history, 3)
+    add_nodes(model, history, 3, x=1000)
+    history.undo()
+    add_nodes(model, history, 1, x=2000)
+    assert history.labels() == ["Add", "Add"]
+    assert not history.can_redo()
+    assert history.nbytes == sum(command.nbytes for command in history.undo_stack)
+
+
+def random_edits(model, history, count, seed=7):
+    """Record count random steps, returning the model state after each"""
+    rnd = random.Random(seed)
+    states = [state(model)]
+    for step in range(count):
+        nodes = list(model.nodes)
+        kind = rnd.random() if len(nodes) > 3 else 0
+        if kind < 0.3:
+            add_nodes(model, history, rnd.randint(1, 3), x=step * 1000)
+        elif kind < 0.45:
+            a, b = rnd.sample(nodes, 2)
+            history.record(AddConnection(model.add_connection((a.id, b.id))))
+        elif kind < 0.65:
+            moved = rnd.sample(nodes, rnd.randint(1, 3))
+            old = geometry.positions(moved)
+            model.move_nodes(moved, [(rnd.randint(-5000, 5000), rnd.randint(-5000, 5000)) for _ in moved])
+            history.record(MoveNodes([node.id for node in moved], old, geometry.positions(moved)))
+        elif kind < 0.85:
+            node = rnd.choice(nodes)
+            old = EditNode.state(node)
+            node.characteristics = {"ip": f"10.0.0.{step}"}
+            if rnd.random() < 0.5:
+                node.name = f"Node {step}"
+                model.update_node(node)
+            history.record(EditNode(node.id, old, EditNode.state(node)))
+        else:
+            removed = rnd.sample(nodes, rnd.randint(1, 2))
+            command = RemoveNodes.from_nodes(removed)
+            command.connections = tuple(model.remove_nodes(removed))
+            history.record(command)
+        states.append(state(model))
+    return states
+
+
+def test_jump_to_restores_every_step_through_checkpoints():
+    model = SchemaModel()
+    history = History(model, checkpoint_interval=10)
+    states = random_edits(model, history, 120)
+    assert history.position == 120
+    assert len(history.checkpoints) == 12
+
+    rnd = random.Random(8)
+    for _ in range(40):
+        position = rnd.randint(0, 120)
+        # Restoring a checkpoint always looks cheaper, then never does
+        history.restore_seconds = 0.0 if rnd.random() < 0.5 else 1e9
+        history.jump_to(position)
+        assert history.position == position
+        assert state(model) == states[position]
+    history.jump_to(120)
+    assert state(model) == states[120]
+
+
+def test_jump_to_stays_within_the_steps_held():
+    model = SchemaModel()
+    history = History(model, max_steps=30, checkpoint_interval=10)
+    states = random_edits(model, history, 60)
+    assert history.first == 30
+    assert min(history.checkpoints) >= history.first
+    history.restore_seconds = 0.0
+    history.jump_to(0)
+    assert history.position == 30
+    assert state(model) == states[30]
+    history.jump_to(1000)
+    assert state(model) == states[60]
+
+
+def test_jump_to_waits_for_an_open_transaction():
+    model = SchemaModel()
+    history = History(model)
+    add_nodes(model, history, 1)
+    with history.transaction("Pull"):
+        assert history.jump_to(0) == 0
+    assert history.jump_to(0) == 1
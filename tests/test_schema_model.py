@@ -0,0 +1,114 @@
+# tests/test_schema_model.py
+import random
+
+from PyQt6.QtCore import QPoint
+
+from benchmarks.topology import generate_schema
+from utils.schema_model import Node, SchemaModel
+
+
+def build(count=4):
+    model = SchemaModel()
+    nodes = [model.add_node(Node("TPE", QPoint(i * 200, 0))) for i in range(count)]
+    return model, nodes
+
+
+def check_consistent(model):
+    """Adjacency and indexes hold exactly the stored nodes and connections"""
+    assert set(model.adjacency) == set(model.nodes_by_id)
+    assert len(model.node_index) == len(model.nodes)
+    assert len(model.connection_index) == len(model.connections)
+    edges = sum(len(conns) for conns in model.adjacency.values())
+    assert edges == sum(1 if start == end else 2 for start, end in model.connections)
+    for conn in model.connections:
+        for node_id in conn:
+            assert any(edge is conn for edge in model.adjacency[node_id])
+
+
+def test_remove_node_drops_only_its_connections():
+    model, (a, b, c, d) = build()
+    ab = model.add_connection((a.id, b.id))
+    bc = model.add_connection((b.id, c.id))
+    cd = model.add_connection((c.id, d.id))
+    removed = model.remove_node(b)
+    assert set(map(id, removed)) == {id(ab), id(bc)}
+    assert list(model.connections) == [cd]
+    assert model.neighbors(c) == [d]
+    check_consistent(model)
+
+
+def test_parallel_connections_are_kept_apart():
+    model, (a, b, _, _) = build()
+    first = model.add_connection((a.id, b.id))
+    second = model.add_connection((a.id, b.id))
+    # The same tuple object added again is stored as a copy
+    third = model.add_connection(second)
+    assert len({id(first), id(second), id(third)}) == 3
+    assert model.remove_connection(second) is second
+    assert [conn is first or conn is third for conn in model.connections] == [True, True]
+    # An equal tuple removes one of the stored ones
+    model.remove_connection((a.id, b.id))
+    assert len(model.connections) == 1
+    check_consistent(model)
+
+
+def test_remove_nodes_and_add_them_back():
+    model = SchemaModel()
+    model.load_dict(generate_schema(10, 5, 4))
+    before = model.to_dict()
+    rnd = random.Random(5)
+    nodes = rnd.sample(list(model.nodes), 30)
+    removed = model.remove_nodes(nodes)
+    ids = {node.id for node in nodes}
+    assert all(start in ids or end in ids for start, end in removed)
+    assert not any(start in ids or end in ids for start, end in model.connections)
+    check_consistent(model)
+
+    for node in nodes:
+        model.add_node(node)
+    for conn in removed:
+        model.add_connection(conn)
+    check_consistent(model)
+    after = model.to_dict()
+    key = lambda item: item['id']
+    assert sorted(after['nodes'], key=key) == sorted(before['nodes'], key=key)
+    conn_key = lambda conn: (conn['source'], conn['target'])
+    assert sorted(after['connections'], key=conn_key) == sorted(before['connections'], key=conn_key)
+
+
+def test_save_and_load_round_trip():
+    model = SchemaModel()
+    model.load_dict(generate_schema(8, 4, 3))
+    data = model.to_dict()
+    assert data['version'] == '1.1'
+    loaded = SchemaModel()
+    loaded.load_dict(data)
+    assert loaded.to_dict() == data
+    check_consistent(loaded)
+
+
+def test_load_1_0_file_matches_connections_by_position():
+    model = SchemaModel()
+    model.load_dict(generate_schema(8, 4, 3))
+    data = model.to_dict()
+    # 1.0 files have neither node ids nor connection ends by id
+    old = {
+        'nodes': [{key: value for key, value in node.items() if key != 'id'} for node in data['nodes']],
+        'connections': [{'start': conn['start'], 'end': conn['end']} for conn in data['connections']],
+    }
+    loaded = SchemaModel()
+    loaded.load_dict(old)
+    lines = sorted(loaded.connection_line(conn) for conn in loaded.connections)
+    assert lines == sorted(model.connection_line(conn) for conn in model.connections)
+    check_consistent(loaded)
+
+
+def test_snapshot_restore_keeps_ids():
+    model = SchemaModel()
+    model.load_dict(generate_schema(6, 3, 2))
+    model.remove_node(next(iter(model.nodes)))
+    restored = SchemaModel()
+    restored.restore(model.snapshot())
+    assert restored.to_dict() == model.to_dict()
+    assert restored.add_node(Node("TPE", QPoint(0, 0))).id == model.add_node(Node("TPE", QPoint(0, 0))).id
+    check_consistent(restored)
@@ -0,0 +1,138 @@
+# tests/test_spatial_index.py
+import random
+
+import pytest
+
+from utils.spatial_index import GridIndex
+
+
+def random_rect(rnd, extent=2000, largest=400):
+    left = rnd.uniform(-extent, extent)
+    top = rnd.uniform(-extent, extent)
+    return (left, top, left + rnd.uniform(0, largest), top + rnd.uniform(0, largest))
+
+
+def contains(rect, x, y):
+    left, top, right, bottom = rect
+    return left <= x <= right and top <= y <= bottom
+
+
+def intersects(a, b):
+    return a[0] <= b[2] and a[2] >= b[0] and a[1] <= b[3] and a[3] >= b[1]
+
+
+@pytest.fixture
+def filled():
+    """A GridIndex of random rectangles and the dict it should match"""
+    rnd = random.Random(1)
+    index = GridIndex(cell_size=100)
+    rects = {}
+    for key in range(500):
+        rects[key] = random_rect(rnd)
+        index.insert(key, rects[key])
+    return index, rects, rnd
+
+
+def check_queries(index, rects, rnd):
+    # Results come in insertion order, which dict order mirrors
+    for _ in range(300):
+        x, y = rnd.uniform(-2200, 2600), rnd.uniform(-2200, 2600)
+        assert index.query_point(x, y) == [key for key, rect in rects.items() if contains(rect, x, y)]
+    for _ in range(100):
+        area = random_rect(rnd, largest=3000)
+        assert index.query_rect(area) == [key for key, rect in rects.items() if intersects(rect, area)]
+
+
+def test_queries_match_a_scan(filled):
+    check_queries(*filled)
+
+
+def test_queries_match_a_scan_after_moves_and_removals(filled):
+    index, rects, rnd = filled
+    for key in rnd.sample(sorted(rects), 100):
+        rects[key] = random_rect(rnd)
+        index.move(key, rects[key])
+    for key in rnd.sample(sorted(rects), 100):
+        del rects[key]
+        index.remove(key)
+    assert len(index) == len(rects)
+    check_queries(index, rects, rnd)
+
+
+def test_move_many_matches_single_moves(filled):
+    index, rects, rnd = filled
+    keys = rnd.sample(sorted(rects), 200)
+    moved = [random_rect(rnd) for _ in keys]
+    index.move_many(keys, moved)
+    rects.update(zip(keys, moved))
+    check_queries(index, rects, rnd)
+
+
+def test_large_query_walks_the_populated_cells():
+    index = GridIndex(cell_size=10)
+    index.insert("a", (0, 0, 5, 5))
+    index.insert("b", (1e6, 1e6, 1e6 + 5, 1e6 + 5))
+    assert index.query_rect((-1e7, -1e7, 1e7, 1e7)) == ["a", "b"]
+    assert index.query_rect((-1e7, -1e7, 100, 100)) == ["a"]
+
+
+def random_segment(rnd):
+    x1, y1 = rnd.uniform(-1000, 1000), rnd.uniform(-1000, 1000)
+    kind = rnd.random()
+    if kind < 0.2:
+        return x1, y1, x1, y1 + rnd.uniform(-800, 800)  # vertical
+    if kind < 0.4:
+        return x1, y1, x1 + rnd.uniform(-800, 800), y1  # horizontal
+    return x1, y1, x1 + rnd.uniform(-800, 800), y1 + rnd.uniform(-800, 800)
+
+
+def test_segment_cells_cover_the_padded_segment():
+    rnd = random.Random(2)
+    index = GridIndex(cell_size=100)
+    pad = 5
+    for _ in range(200):
+        x1, y1, x2, y2 = random_segment(rnd)
+        cells = set(index.segment_cells(x1, y1, x2, y2, pad))
+        for step in range(101):
+            t = step / 100
+            x, y = x1 + (x2 - x1) * t, y1 + (y2 - y1) * t
+            for dx, dy in ((0, 0), (pad, 0), (-pad, 0), (0, pad), (0, -pad)):
+                assert (int((x + dx) // 100), int((y + dy) // 100)) in cells
+
+
+def test_segment_cells_many_matches_segment_cells():
+    rnd = random.Random(3)
+    index = GridIndex(cell_size=100)
+    segments = [random_segment(rnd) for _ in range(300)]
+    many = index.segment_cells_many(segments, 5)
+    assert [sorted(cells) for cells in many] == [sorted(index.segment_cells(*segment, 5))
+                                                 for segment in segments]
+    assert index.segment_cells_many([], 5) == []
+
+
+def distance_to_segment(x, y, x1, y1, x2, y2):
+    dx, dy = x2 - x1, y2 - y1
+    length = dx * dx + dy * dy
+    t = 0 if not length else max(0, min(1, ((x - x1) * dx + (y - y1) * dy) / length))
+    return ((x - x1 - t * dx) ** 2 + (y - y1 - t * dy) ** 2) ** 0.5
+
+
+def test_connections_near_a_point_are_candidates():
+    from PyQt6.QtCore import QPoint
+
+    from benchmarks.topology import generate_schema
+    from utils.schema_model import SchemaModel
+
+    model = SchemaModel()
+    model.load_dict(generate_schema(20, 6, 5))
+    rnd = random.Random(4)
+    lines = [(conn, model.connection_line(conn)) for conn in model.connections]
+    for _ in range(300):
+        conn, (x1, y1, x2, y2) = rnd.choice(lines)
+        t = rnd.random()
+        point = QPoint(round(x1 + (x2 - x1) * t) + rnd.randint(-3, 3),
+                       round(y1 + (y2 - y1) * t) + rnd.randint(-3, 3))
+        near = [c for c, line in lines
+                if distance_to_segment(point.x(), point.y(), *line) <= model.PICK_TOLERANCE]
+        found = model.connections_at(point)
+        assert all(any(c is f for f in found) for c in near)
@@ -0,0 +1,344 @@
+# utils/device_api.py
+"""
+HTTP calls to the field devices: Controllers, the BasiQ algorithm they
+run and TPE camera servers.
+
+Every call blocks, takes a requests timeout and raises DeviceError with a
+message fit for the user, so they are meant to run on the DeviceClient
+pool (utils.device_client), never on the GUI thread. Devices are the
+connection settings stored on their nodes: ip, port, username, password.
+The tasks at the end are one user action each and what the dialogs run.
+
+Calls to the same ip:port share a keep-alive session, see DeviceSessions,
+so a login and the call that follows reuse one connection. Tokens are
+cached per device and user until they expire or a device answers 401, see
+TokenCache.
+"""
+import base64
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+
+# Seconds a device session may sit unused before its connections are closed
+IDLE_TIMEOUT = 60
+# Connections kept open to one device
+POOL_SIZE = 8
+# Seconds a token is trusted when the device does not tell its lifetime
+TOKEN_LIFETIME = 300
+# Tokens are renewed this many seconds before they expire
+TOKEN_MARGIN = 10
+
+
+class DeviceError(Exception):
+    """A device could not be reached, refused a call or answered garbage"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status  # HTTP status when the device refused the call
+
+
+def retryable(error):
+    """Whether error may pass if the call is tried again later: network trouble, overload, server faults"""
+    return error.status is None or error.status == 429 or error.status >= 500
+
+
+def rejected(error):
+    """Whether the device refused what was sent, failing its validation"""
+    return error.status in (400, 422)
+
+
+def address(device):
+    return f"{device.get('ip', '')}:{device.get('port', '')}"
+
+
+class Reconnect(Retry):
+    """
+    Retry policy of the device sessions. A request that could not connect is
+    tried once more. One sent on a kept-alive connection the device dropped
+    meanwhile, which urllib3 counts as a read error, is sent again on a new
+    connection only when reading (GET): a POST may already have been
+    applied, retrying it is left to the caller, see utils.fleet. A read
+    timeout is never retried, the device may still be working on the
+    request, and surfaces as a timeout.
+    """
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if isinstance(error, ReadTimeoutError):
+            raise error
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+class DeviceSessions:
+    """
+    One requests.Session per device ip:port, shared by every dialog and pool
+    thread so connections stay open between calls. Sessions unused for
+    idle_timeout seconds are closed by close_idle(), which the DeviceClient
+    calls on a timer; a session in use is never closed under its caller.
+    """
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT, pool_size=POOL_SIZE):
+        self.idle_timeout = idle_timeout
+        self.pool_size = pool_size
+        self.lock = threading.Lock()
+        self.sessions = {}  # ip:port -> [session, users, last used]
+
+    def create(self):
+        session = requests.Session()
+        # urllib3 already replaces a pooled connection seen closed before
+        # sending; this covers one dropped while the request goes out
+        retries = Reconnect(total=1, connect=1, read=1, status=0, redirect=0,
+                            allowed_methods=frozenset({"GET"}))
+        session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                                             max_retries=retries))
+        return session
+
+    @contextmanager
+    def use(self, device):
+        key = address(device)
+        with self.lock:
+            entry = self.sessions.get(key)
+            if entry is None:
+                entry = self.sessions[key] = [self.create(), 0, 0.0]
+            entry[1] += 1
+        try:
+            yield entry[0]
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                entry[2] = time.monotonic()
+
+    def close_idle(self):
+        """Close the sessions unused for idle_timeout, returning how many"""
+        now = time.monotonic()
+        with self.lock:
+            idle = [key for key, (_, users, used) in self.sessions.items()
+                    if not users and now - used >= self.idle_timeout]
+            closing = [self.sessions.pop(key)[0] for key in idle]
+        for session in closing:
+            session.close()
+        return len(closing)
+
+    def close_all(self):
+        with self.lock:
+            closing = [session for session, _, _ in self.sessions.values()]
+            self.sessions.clear()
+        for session in closing:
+            session.close()
+
+    def __len__(self):
+        return len(self.sessions)
+
+
+sessions = DeviceSessions()
+
+
+def _request(method, device, path, timeout, token=None, payload=None, parse=True):
+    url = f"http://{address(device)}{path}"
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    try:
+        with sessions.use(device) as session:
+            response = session.request(method, url, headers=headers, json=payload, timeout=timeout)
+        response.raise_for_status()
+        return response.json() if parse else None
+    except requests.Timeout:
+        raise DeviceError(f"{address(device)} did not answer in time")
+    except requests.ConnectionError:
+        raise DeviceError(f"Could not connect to {address(device)}")
+    except requests.HTTPError as e:
+        raise DeviceError(f"{address(device)} refused {path}: HTTP {e.response.status_code} {e.response.reason}",
+                          e.response.status_code)
+    except (requests.exceptions.InvalidURL, requests.exceptions.InvalidSchema,
+            requests.exceptions.MissingSchema):
+        raise DeviceError(f"Invalid device address {address(device)}")
+    except requests.JSONDecodeError:
+        raise DeviceError(f"{address(device)} sent an invalid answer to {path}")
+    except requests.RequestException as e:
+        raise DeviceError(f"Request to {address(device)} failed: {e}")
+
+
+def _credentials(device):
+    return {"username": device.get("username", ""), "password": device.get("password", "")}
+
+
+def _token_lifetime(token, expires_in=None):
+    """Seconds token stays valid: expires_in when the device sent it, else the exp of a JWT"""
+    if expires_in is not None:
+        try:
+            return float(expires_in)
+        except (TypeError, ValueError):
+            pass
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"]) - time.time()
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return TOKEN_LIFETIME
+
+
+class TokenCache:
+    """
+    Tokens by device kind, ip:port and username, so every dialog and pool
+    thread skips the login while a token is valid. Logins are single-flight:
+    callers needing the same token wait for the one login in progress and
+    share its token. A token is dropped once it expires, when the password
+    typed changed, or by invalidate() after a device answered 401.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens = {}  # key -> (token, password, expires at)
+        self.logins = {}  # key -> lock held while logging in
+
+    def key(self, kind, device):
+        return (kind, address(device), device.get("username", ""))
+
+    def get(self, kind, device, login):
+        """The cached token, or the (token, lifetime) of login() which is then cached"""
+        key = self.key(kind, device)
+        password = device.get("password", "")
+        with self.lock:
+            login_lock = self.logins.setdefault(key, threading.Lock())
+        with login_lock:
+            cached = self.tokens.get(key)
+            if cached and cached[1] == password and time.monotonic() < cached[2]:
+                return cached[0]
+            token, lifetime = login()
+            self.tokens[key] = (token, password, time.monotonic() + lifetime - TOKEN_MARGIN)
+            return token
+
+    def invalidate(self, kind, device, token):
+        """Forget token unless another caller already replaced it"""
+        key = self.key(kind, device)
+        with self.lock:
+            cached = self.tokens.get(key)
+            if cached and cached[0] == token:
+                del self.tokens[key]
+
+    def clear(self):
+        with self.lock:
+            self.tokens.clear()
+
+    def __len__(self):
+        return len(self.tokens)
+
+
+tokens = TokenCache()
+
+
+# Controllers
+
+def controller_login(device, timeout):
+    """(token, lifetime in seconds)"""
+    result = _request("POST", device, "/auth/login", timeout, payload=_credentials(device))
+    try:
+        token = result["access_token"]
+    except (KeyError, TypeError):
+        raise DeviceError(f"{address(device)} sent no access token")
+    return token, _token_lifetime(token, result.get("expires_in"))
+
+
+def controller_get_config(device, token, timeout):
+    return _request("GET", device, "/get-config", timeout, token)
+
+
+def controller_set_config(device, token, config, timeout):
+    _request("POST", device, "/set-config", timeout, token, config, parse=False)
+
+
+# BasiQ, served by the Controller it is connected to
+
+def basiq_get_config(controller, token, timeout):
+    return _request("GET", controller, "/getconfig", timeout, token)
+
+
+def basiq_set_config(controller, token, config, timeout):
+    _request("POST", controller, "/setconfig", timeout, token, config, parse=False)
+
+
+# TPE camera servers, answering {"status": ..., "data": ..., "error": ...}
+
+def _tpe_data(device, result):
+    if not isinstance(result, dict) or not result.get("status"):
+        error = result.get("error") if isinstance(result, dict) else None
+        raise DeviceError(f"{address(device)}: {error or 'Unknown error'}")
+    return result.get("data")
+
+
+def tpe_login(device, timeout):
+    """(token, lifetime in seconds)"""
+    data = _tpe_data(device, _request("POST", device, "/login", timeout, payload=_credentials(device)))
+    try:
+        token = data["token"]
+    except (KeyError, TypeError):
+        raise DeviceError(f"{address(device)} sent no token")
+    return token, _token_lifetime(token, data.get("expiresIn"))
+
+
+def tpe_get_cameras(device, token, timeout):
+    data = _tpe_data(device, _request("GET", device, "/cameras", timeout, token))
+    try:
+        return data["cameras"]
+    except (KeyError, TypeError):
+        raise DeviceError(f"{address(device)} sent no camera list")
+
+
+def tpe_set_cameras(device, token, cameras, timeout):
+    _tpe_data(device, _request("POST", device, "/cameras", timeout, token, {"cameras": cameras}))
+
+
+LOGINS = {"controller": controller_login, "tpe": tpe_login}
+
+
+def _authorized(call, kind, device, send):
+    """send(token) with the cached token of device, logging in again once on 401"""
+    login = lambda: LOGINS[kind](device, call.timeout)
+    token = tokens.get(kind, device, login)
+    call.check()
+    try:
+        return send(token)
+    except DeviceError as e:
+        if e.status != 401:
+            raise
+        tokens.invalidate(kind, device, token)
+    token = tokens.get(kind, device, login)
+    call.check()
+    return send(token)
+
+
+# Tasks for DeviceClient.run(), call being the running request.
+# BasiQ is reached through its Controller and shares the Controller's token.
+
+def fetch_controller_config(call, device):
+    return _authorized(call, "controller", device,
+                       lambda token: controller_get_config(device, token, call.timeout))
+
+
+def push_controller_config(call, device, config):
+    _authorized(call, "controller", device,
+                lambda token: controller_set_config(device, token, config, call.timeout))
+
+
+def fetch_basiq_config(call, controller):
+    return _authorized(call, "controller", controller,
+                       lambda token: basiq_get_config(controller, token, call.timeout))
+
+
+def push_basiq_config(call, controller, config):
+    _authorized(call, "controller", controller,
+                lambda token: basiq_set_config(controller, token, config, call.timeout))
+
+
+def fetch_tpe_cameras(call, device):
+    return _authorized(call, "tpe", device,
+                       lambda token: tpe_get_cameras(device, token, call.timeout))
+
+
+def push_tpe_cameras(call, device, cameras):
+    _authorized(call, "tpe", device,
+                lambda token: tpe_set_cameras(device, token, cameras, call.timeout))
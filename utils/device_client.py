@@ -0,0 +1,156 @@
+# utils/device_client.py
+import threading
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+from utils import device_api
+from utils.device_api import DeviceError
+
+# Seconds to connect and to wait for each answer, per HTTP call
+DEFAULT_TIMEOUT = (3.05, 10)
+# Seconds a whole request may take, whatever its calls are doing
+DEFAULT_DEADLINE = 30
+MAX_THREADS = 16
+
+
+class Cancelled(Exception):
+    """Raised by DeviceCall.check() once the request was cancelled or timed out"""
+
+
+class DeviceCall:
+    """What a task running on the pool sees of its request"""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check(self):
+        """Stop between two calls of a task when nobody waits for the result"""
+        if self.cancel_event.is_set():
+            raise Cancelled()
+
+
+class DeviceRequest(QObject):
+    """
+    A task running on the DeviceClient pool.
+
+    finished(result) or failed(message) is emitted on the GUI thread, then
+    settled(); the DeviceError behind failed stays in error. cancel()
+    settles the request at once and nothing else is emitted; past its
+    deadline the request fails even if a device is still trickling an
+    answer. A call already on the wire cannot be aborted, it ends by its
+    own timeout and its result is dropped.
+    """
+
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    settled = pyqtSignal()
+    # result, DeviceError; emitted on the pool thread
+    done = pyqtSignal(object, object)
+
+    def __init__(self, timeout, deadline):
+        super().__init__()
+        self.call = DeviceCall(timeout)
+        self.deadline = deadline
+        self.pending = True
+        self.error = None
+        self.done.connect(self.settle)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.expire)
+        if deadline:
+            self.timer.start(int(deadline * 1000))
+
+    def cancel(self):
+        if not self.pending:
+            return
+        self.pending = False
+        self.call.cancel_event.set()
+        self.timer.stop()
+        self.settled.emit()
+
+    def expire(self):
+        self.call.cancel_event.set()
+        self.settle(None, DeviceError(f"No answer after {self.deadline:g} seconds"))
+
+    def settle(self, result, error):
+        if not self.pending:
+            return
+        self.pending = False
+        self.timer.stop()
+        if error is None:
+            self.finished.emit(result)
+        else:
+            self.error = error
+            self.failed.emit(str(error))
+        self.settled.emit()
+
+
+class DeviceJob(QRunnable):
+    """Run one task on a pool thread and hand its outcome to the request"""
+
+    def __init__(self, request, task, args):
+        super().__init__()
+        self.request = request
+        self.task = task
+        self.args = args
+
+    def run(self):
+        call = self.request.call
+        if call.cancelled:
+            return
+        try:
+            result, error = self.task(call, *self.args), None
+        except Cancelled:
+            return
+        except DeviceError as e:
+            result, error = None, e
+        except Exception as e:
+            result, error = None, DeviceError(f"Unexpected error: {e}")
+        try:
+            self.request.done.emit(result, error)
+        except RuntimeError:
+            # The request was destroyed meanwhile, on shutdown: nobody waits
+            pass
+
+
+class DeviceClient(QObject):
+    """
+    Runs device tasks (see utils.device_api) on a thread pool so no dialog
+    ever waits on the network on the GUI thread. Also closes the device
+    sessions left idle.
+    """
+
+    def __init__(self, max_threads=MAX_THREADS, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setInterval(int(device_api.sessions.idle_timeout * 1000 / 2))
+        self.idle_timer.timeout.connect(device_api.sessions.close_idle)
+        self.idle_timer.start()
+
+    def run(self, task, *args, timeout=DEFAULT_TIMEOUT, deadline=DEFAULT_DEADLINE):
+        """Start task(call, *args) on the pool, returning its DeviceRequest"""
+        request = DeviceRequest(timeout, deadline)
+        self.pool.start(DeviceJob(request, task, args))
+        return request
+
+    def wait(self, msecs=-1):
+        """Block until every started task returned, for shutdown and scripts"""
+        return self.pool.waitForDone(msecs)
+
+
+_client = None
+
+
+def client():
+    """The DeviceClient shared by the whole application"""
+    global _client
+    if _client is None:
+        _client = DeviceClient()
+    return _client
@@ -0,0 +1,236 @@
+# utils/fleet.py
+"""
+Device operations over a whole schema: one DeviceClient task per
+Controller, TPE and BasiQ node, run concurrently with a cap on how many
+devices are talked to at once.
+"""
+import random
+from collections import deque
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from utils import device_api, device_client
+from utils.device_api import DeviceError
+
+# Devices talked to at once, leaving DeviceClient threads to the dialogs
+CONCURRENCY = 12
+DEVICE_TYPES = ("Controller", "TPE", "BasiQ")
+PUSH_TYPES = ("Controller", "BasiQ")
+# Retries of a push that failed for a passing reason, after BACKOFF * 2**attempt
+# seconds (at most BACKOFF_MAX) plus jitter
+RETRIES = 3
+BACKOFF = 0.5
+BACKOFF_MAX = 8
+# What a push sends of the settings of a node
+CONTROLLER_KEYS = ("phase_bounds", "phase_camera_mapping")
+BASIQ_KEYS = ("algorithm_name", "computation_threshold", "f_adj",
+              "set_setting_threshold", "saturation_flow_rate", "startup_loss_time")
+
+
+def device_nodes(nodes, types=DEVICE_TYPES):
+    return [node for node in nodes if node.type in types]
+
+
+def backoff_delay(attempt):
+    """Seconds to wait before retry number attempt + 1"""
+    delay = min(BACKOFF * 2 ** attempt, BACKOFF_MAX)
+    # Jitter spreads the retries of devices that failed together
+    return delay * random.uniform(0.5, 1.0)
+
+
+def connection(settings):
+    """The connection settings of a device node, copied for the pool threads"""
+    if not settings or not settings.get("ip") or not settings.get("port"):
+        return None
+    return {key: settings.get(key, "") for key in ("ip", "port", "username", "password")}
+
+
+def basiq_controller(model, node):
+    """Connection settings of the Controller running a BasiQ node, None without one"""
+    for neighbor in model.neighbors(node):
+        if neighbor.type == "Controller" and neighbor.has_characteristics():
+            return connection(neighbor.characteristics)
+    return None
+
+
+def pull_task(model, node):
+    """(task, args) fetching the configuration of node, DeviceError when it cannot be reached"""
+    if node.type == "BasiQ":
+        controller = basiq_controller(model, node)
+        if controller is None:
+            raise DeviceError("No configured Controller connected")
+        return device_api.fetch_basiq_config, (controller,)
+    device = connection(node.characteristics if node.has_characteristics() else None)
+    if device is None:
+        raise DeviceError("No address set")
+    if node.type == "TPE":
+        return device_api.fetch_tpe_cameras, (device,)
+    return device_api.fetch_controller_config, (device,)
+
+
+def pulled_characteristics(node, result):
+    """The characteristics of node keeping what a pull fetched as its last_retrieved_config"""
+    characteristics = dict(node.characteristics) if node.has_characteristics() else {}
+    # A TPE answers with its camera list
+    characteristics["last_retrieved_config"] = {"cameras": result} if node.type == "TPE" else result
+    return characteristics
+
+
+def push_task(model, node, settings=None):
+    """
+    (task, args) sending settings, by default those stored on node, to a
+    Controller or the Controller running a BasiQ node; DeviceError when
+    there is nothing to send or nowhere to send it.
+    """
+    if settings is None:
+        settings = node.characteristics if node.has_characteristics() else {}
+    keys = BASIQ_KEYS if node.type == "BasiQ" else CONTROLLER_KEYS
+    config = {key: settings[key] for key in keys if key in settings}
+    if not config:
+        raise DeviceError("No settings to push")
+    if node.type == "BasiQ":
+        controller = basiq_controller(model, node)
+        if controller is None:
+            raise DeviceError("No configured Controller connected")
+        return device_api.push_basiq_config, (controller, config)
+    device = connection(node.characteristics if node.has_characteristics() else None)
+    if device is None:
+        raise DeviceError("No address set")
+    return device_api.push_controller_config, (device, config)
+
+
+def rollback_task(model, node):
+    """push_task restoring the last configuration pulled from node, None without one"""
+    pulled = node.characteristics.get("last_retrieved_config") if node.has_characteristics() else None
+    if not pulled:
+        return None
+    try:
+        return push_task(model, node, pulled)
+    except DeviceError:
+        return None
+
+
+def node_label(node):
+    return node.name or f"{node.type} {node.id}"
+
+
+class FleetRun(QObject):
+    """
+    One device task per node, at most concurrency of them in flight.
+
+    prepare(node) returns the (task, args) to run for a node or raises
+    DeviceError, which fails that node without a request. A task failing
+    for a passing reason (see device_api.retryable) is tried again up to
+    retries times with exponential backoff, keeping its slot meanwhile.
+    When a device rejects a task (device_api.rejected) and rollback(node)
+    gives a (task, args), that runs next and the node still fails, noting
+    how the rollback went.
+
+    device_done reports every node as it settles, on the GUI thread;
+    finished follows once all did, or right away on cancel().
+    """
+
+    device_done = pyqtSignal(object, object, object)  # node, result, error message or None
+    progress = pyqtSignal(int, int)  # nodes settled, total
+    finished = pyqtSignal()
+
+    def __init__(self, nodes, prepare, concurrency=CONCURRENCY, retries=0, rollback=None, client=None):
+        super().__init__()
+        self.nodes = list(nodes)
+        self.prepare = prepare
+        self.concurrency = concurrency
+        self.retries = retries
+        self.rollback = rollback
+        self.client = client or device_client.client()
+        self.queue = deque()
+        self.running = {}  # DeviceRequest -> (node, task, args, attempt, rejected error or None)
+        self.waiting = 0  # nodes backing off before a retry
+        self.results = {}  # node id -> result
+        self.errors = {}  # node id -> error message
+        self.retried = {}  # node id -> retries it took
+        self.rolled_back = set()  # node ids restored after a rejection
+        self.settled = 0
+        self.active = False
+
+    @property
+    def total(self):
+        return len(self.nodes)
+
+    def start(self):
+        self.queue.extend(self.nodes)
+        self.active = True
+        self.feed()
+
+    def cancel(self):
+        if not self.active:
+            return
+        self.queue.clear()
+        for request in self.running:
+            request.cancel()
+        self.running.clear()
+        self.waiting = 0
+        self.active = False
+        self.finished.emit()
+
+    def feed(self):
+        while self.queue and len(self.running) + self.waiting < self.concurrency:
+            node = self.queue.popleft()
+            try:
+                task, args = self.prepare(node)
+            except DeviceError as e:
+                self.settle(node, None, str(e))
+                continue
+            self.send(node, task, args)
+        if self.active and not self.queue and not self.running and not self.waiting:
+            self.active = False
+            self.finished.emit()
+
+    def send(self, node, task, args, attempt=0, rejected=None):
+        request = self.client.run(task, *args)
+        self.running[request] = (node, task, args, attempt, rejected)
+        request.finished.connect(lambda result: self.request_settled(request, result, None))
+        request.failed.connect(lambda message: self.request_settled(request, None, request.error))
+        return request
+
+    def retry(self, node, task, args, attempt, rejected):
+        if not self.active:
+            return
+        self.waiting -= 1
+        self.send(node, task, args, attempt, rejected)
+
+    def request_settled(self, request, result, error):
+        entry = self.running.pop(request, None)
+        if entry is None:
+            return
+        node, task, args, attempt, rejected = entry
+        if error is not None and attempt < self.retries and device_api.retryable(error):
+            self.waiting += 1
+            self.retried[node.id] = attempt + 1
+            QTimer.singleShot(int(backoff_delay(attempt) * 1000),
+                              lambda: self.retry(node, task, args, attempt + 1, rejected))
+            return
+        if rejected is not None:
+            if error is None:
+                self.rolled_back.add(node.id)
+                self.settle(node, None, f"{rejected}; rolled back to the last pulled configuration")
+            else:
+                self.settle(node, None, f"{rejected}; rollback failed: {error}")
+        elif error is not None and self.rollback and device_api.rejected(error):
+            undo = self.rollback(node)
+            if undo is None:
+                self.settle(node, None, f"{error}; no pulled configuration to roll back to")
+            else:
+                self.send(node, *undo, rejected=error)
+                return
+        else:
+            self.settle(node, result, None if error is None else str(error))
+        self.feed()
+
+    def settle(self, node, result, error):
+        if error is None:
+            self.results[node.id] = result
+        else:
+            self.errors[node.id] = error
+        self.settled += 1
+        self.device_done.emit(node, result, error)
+        self.progress.emit(self.settled, self.total)
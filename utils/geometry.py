@@ -0,0 +1,75 @@
+# utils/geometry.py
+"""
+Bulk geometry for node selections.
+
+Every operation works on an (N, 2) array of node positions and returns the
+new positions as a new array, so a whole selection is snapped, moved,
+aligned or distributed in one NumPy expression. SchemaModel.move_nodes()
+writes the result back and re-indexes the nodes and their connections.
+"""
+import numpy as np
+
+ALIGN_MODES = ("left", "right", "top", "bottom", "hcenter", "vcenter")
+
+
+def positions(nodes):
+    """(N, 2) int array of node positions"""
+    count = len(nodes)
+    points = np.empty((count, 2), dtype=np.int64)
+    points[:, 0] = np.fromiter((node.x for node in nodes), dtype=np.int64, count=count)
+    points[:, 1] = np.fromiter((node.y for node in nodes), dtype=np.int64, count=count)
+    return points
+
+
+def snap(points, grid_size):
+    """Round every position to the nearest grid point (half to even, like round())"""
+    return (np.rint(points / grid_size) * grid_size).astype(np.int64)
+
+
+def translate(points, dx, dy):
+    return points + np.array([dx, dy], dtype=np.int64)
+
+
+def align(points, mode):
+    """
+    Line positions up on the selection's bounding box.
+
+    left/right/top/bottom align to the outermost position on that side,
+    hcenter/vcenter to the middle of the selection.
+    """
+    if mode not in ALIGN_MODES:
+        raise ValueError(f"Unknown align mode: {mode}")
+    result = points.copy()
+    if not len(points):
+        return result
+    if mode == "left":
+        result[:, 0] = points[:, 0].min()
+    elif mode == "right":
+        result[:, 0] = points[:, 0].max()
+    elif mode == "top":
+        result[:, 1] = points[:, 1].min()
+    elif mode == "bottom":
+        result[:, 1] = points[:, 1].max()
+    elif mode == "hcenter":
+        result[:, 0] = round((points[:, 0].min() + points[:, 0].max()) / 2)
+    else:
+        result[:, 1] = round((points[:, 1].min() + points[:, 1].max()) / 2)
+    return result
+
+
+def distribute(points, axis):
+    """
+    Space positions evenly along axis ("horizontal" or "vertical"),
+    keeping the outermost ones and the order along that axis.
+    """
+    column = {"horizontal": 0, "vertical": 1}.get(axis)
+    if column is None:
+        raise ValueError(f"Unknown distribute axis: {axis}")
+    result = points.copy()
+    if len(points) < 3:
+        return result
+    order = np.argsort(points[:, column], kind="stable")
+    low = points[order[0], column]
+    high = points[order[-1], column]
+    result[order, column] = np.rint(np.linspace(low, high, len(points))).astype(np.int64)
+    return result
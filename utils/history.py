@@ -0,0 +1,489 @@
+# utils/history.py
+"""
+Command-based undo history for the schema.
+
+Commands store deltas keyed by node id (plain tuples, id pairs and position
+arrays) instead of live Node objects, so a removed node is not kept alive
+by the history and every entry has a known, small footprint. The History
+applies commands to a SchemaModel, merges consecutive moves of the same
+drag into one entry, groups the commands of one user operation into a
+single undo step and drops the oldest steps once a memory cap is reached.
+Periodic compressed snapshots let it jump to any step without replaying
+the whole stack.
+"""
+import pickle
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+from PyQt6.QtCore import QObject, QPoint, pyqtSignal
+
+from utils.schema_model import Node
+
+# Rough per-object costs used to estimate an entry's memory footprint
+_ENTRY_OVERHEAD = 200
+_RECORD_OVERHEAD = 150
+_CONNECTION_SIZE = 80
+
+
+def node_record(node):
+    """Everything needed to re-create a node: (id, type, name, x, y, characteristics)"""
+    characteristics = dict(node.characteristics) if node.has_characteristics() else None
+    return (node.id, node.type, node.name, node.x, node.y, characteristics)
+
+
+def restore_node(record):
+    node_id, node_type, name, x, y, characteristics = record
+    return Node(node_type, QPoint(x, y), name,
+                dict(characteristics) if characteristics else None, node_id)
+
+
+def _record_size(record):
+    size = _RECORD_OVERHEAD + len(record[2])
+    for key, value in (record[5] or {}).items():
+        size += 100 + len(str(key)) + len(str(value))
+    return size
+
+
+class Command:
+    """One reversible change to a SchemaModel, recorded after it was applied"""
+
+    label = ""
+
+    def undo(self, model):
+        raise NotImplementedError
+
+    def redo(self, model):
+        raise NotImplementedError
+
+    def merge(self, other):
+        """Absorb other, recorded right after this command. Returns True on success"""
+        return False
+
+    def is_noop(self):
+        return False
+
+    @property
+    def nbytes(self):
+        return _ENTRY_OVERHEAD
+
+
+class AddNodes(Command):
+    """Nodes added together with connections between them or to existing nodes"""
+
+    def __init__(self, records, connections=(), label="Add"):
+        self.records = tuple(records)
+        self.connections = tuple(connections)
+        self.label = label
+
+    @classmethod
+    def from_nodes(cls, nodes, connections=(), label="Add"):
+        return cls([node_record(node) for node in nodes], connections, label)
+
+    def insert(self, model):
+        for record in self.records:
+            model.add_node(restore_node(record))
+        for conn in self.connections:
+            model.add_connection(conn)
+
+    def remove(self, model):
+        nodes = [model.get_node(record[0]) for record in self.records]
+        model.remove_nodes([node for node in nodes if node is not None])
+
+    def undo(self, model):
+        self.remove(model)
+
+    def redo(self, model):
+        self.insert(model)
+
+    def is_noop(self):
+        return not self.records and not self.connections
+
+    @property
+    def nbytes(self):
+        return (_ENTRY_OVERHEAD + sum(_record_size(record) for record in self.records)
+                + _CONNECTION_SIZE * len(self.connections))
+
+
+class RemoveNodes(AddNodes):
+    """Nodes removed together with all of their connections"""
+
+    def __init__(self, records, connections=(), label="Delete"):
+        super().__init__(records, connections, label)
+
+    @classmethod
+    def from_nodes(cls, nodes, connections=(), label="Delete"):
+        return cls([node_record(node) for node in nodes], connections, label)
+
+    def undo(self, model):
+        self.insert(model)
+
+    def redo(self, model):
+        self.remove(model)
+
+
+class AddConnection(Command):
+    def __init__(self, connection, label="Connect"):
+        self.connection = tuple(connection)
+        self.label = label
+
+    def undo(self, model):
+        if model.find_connection(self.connection) is not None:
+            model.remove_connection(self.connection)
+
+    def redo(self, model):
+        model.add_connection(self.connection)
+
+    @property
+    def nbytes(self):
+        return _ENTRY_OVERHEAD + _CONNECTION_SIZE
+
+
+class RemoveConnection(AddConnection):
+    def __init__(self, connection, label="Delete Connection"):
+        super().__init__(connection, label)
+
+    def undo(self, model):
+        AddConnection.redo(self, model)
+
+    def redo(self, model):
+        AddConnection.undo(self, model)
+
+
+class MoveNodes(Command):
+    """
+    Nodes moved from old to new positions, both (N, 2) int arrays.
+
+    Moves recorded with the same merge_key (the steps of one drag) merge
+    into a single entry spanning the first old and the last new positions.
+    """
+
+    def __init__(self, ids, old_positions, new_positions, label="Move", merge_key=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.old_positions = np.asarray(old_positions, dtype=np.int64).reshape(-1, 2)
+        self.new_positions = np.asarray(new_positions, dtype=np.int64).reshape(-1, 2)
+        self.label = label
+        self.merge_key = merge_key
+
+    def apply(self, model, positions):
+        nodes = [model.get_node(node_id) for node_id in self.ids.tolist()]
+        present = [node is not None for node in nodes]
+        if not all(present):
+            positions = positions[np.array(present, dtype=bool)]
+            nodes = [node for node in nodes if node is not None]
+        model.move_nodes(nodes, positions)
+
+    def undo(self, model):
+        self.apply(model, self.old_positions)
+
+    def redo(self, model):
+        self.apply(model, self.new_positions)
+
+    def merge(self, other):
+        if (not isinstance(other, MoveNodes) or self.merge_key is None
+                or other.merge_key != self.merge_key
+                or not np.array_equal(other.ids, self.ids)):
+            return False
+        self.new_positions = other.new_positions
+        return True
+
+    def is_noop(self):
+        return np.array_equal(self.old_positions, self.new_positions)
+
+    @property
+    def nbytes(self):
+        return (_ENTRY_OVERHEAD + self.ids.nbytes
+                + self.old_positions.nbytes + self.new_positions.nbytes)
+
+
+class EditNode(Command):
+    """A node renamed or given other characteristics, old and new being (name, characteristics)"""
+
+    def __init__(self, node_id, old, new, label="Edit"):
+        self.node_id = node_id
+        self.old = old
+        self.new = new
+        self.label = label
+
+    @classmethod
+    def state(cls, node):
+        return (node.name, dict(node.characteristics) if node.has_characteristics() else None)
+
+    def apply(self, model, state):
+        node = model.get_node(self.node_id)
+        if node is None:
+            return
+        name, characteristics = state
+        node.characteristics = dict(characteristics) if characteristics else None
+        if node.name != name:
+            node.name = name
+            model.update_node(node)
+
+    def undo(self, model):
+        self.apply(model, self.old)
+
+    def redo(self, model):
+        self.apply(model, self.new)
+
+    def is_noop(self):
+        return self.old == self.new
+
+    @property
+    def nbytes(self):
+        return (_ENTRY_OVERHEAD
+                + _record_size((None, None, self.old[0], 0, 0, self.old[1]))
+                + _record_size((None, None, self.new[0], 0, 0, self.new[1])))
+
+
+class Compound(Command):
+    """Commands undone and redone as one step, in reverse and recorded order"""
+
+    def __init__(self, label="", commands=()):
+        self.label = label
+        self.commands = list(commands)
+
+    def add(self, command):
+        if self.commands and self.commands[-1].merge(command):
+            if self.commands[-1].is_noop():
+                self.commands.pop()
+            return
+        if not command.is_noop():
+            self.commands.append(command)
+
+    def undo(self, model):
+        for command in reversed(self.commands):
+            command.undo(model)
+
+    def redo(self, model):
+        for command in self.commands:
+            command.redo(model)
+
+    def is_noop(self):
+        return not self.commands
+
+    @property
+    def nbytes(self):
+        return _ENTRY_OVERHEAD + sum(command.nbytes for command in self.commands)
+
+
+class History(QObject):
+    """
+    Undo and redo stacks of commands applied to model.
+
+    The oldest undo steps are evicted once the history holds more than
+    max_steps entries or its estimated size passes max_bytes, so memory
+    stays flat however long the editing session runs.
+
+    Every checkpoint_interval steps a compressed snapshot of the model is
+    kept. jump_to() restores the snapshot nearest the target step and
+    replays only the steps in between when that is estimated to be cheaper,
+    from the timings of earlier restores and steps, than replaying them all.
+    Steps are numbered from the start of the session: position is the
+    number of steps applied, first the oldest step still held.
+    """
+
+    # Emitted whenever steps are recorded, undone, redone or dropped
+    changed = pyqtSignal()
+
+    def __init__(self, model, max_bytes=16 * 1024 * 1024, max_steps=1000,
+                 checkpoint_interval=50, max_checkpoints=20):
+        super().__init__()
+        self.model = model
+        self.max_bytes = max_bytes
+        self.max_steps = max_steps
+        self.checkpoint_interval = checkpoint_interval
+        self.max_checkpoints = max_checkpoints
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.nbytes = 0
+        self.first = 0          # steps evicted from the bottom of the undo stack
+        self.checkpoints = {}   # position -> zlib-compressed model snapshot
+        # Running averages deciding between a restore and replaying steps
+        self.step_seconds = 0.001
+        self.restore_seconds = None
+        self._transactions = []
+
+    def __len__(self):
+        return len(self.undo_stack)
+
+    @property
+    def position(self):
+        return self.first + len(self.undo_stack)
+
+    @property
+    def last(self):
+        return self.position + len(self.redo_stack)
+
+    def labels(self):
+        """Labels of every step held, oldest first, undone steps included"""
+        return ([command.label for command in self.undo_stack]
+                + [command.label for command in reversed(self.redo_stack)])
+
+    def can_undo(self):
+        return bool(self.undo_stack) and not self._transactions
+
+    def can_redo(self):
+        return bool(self.redo_stack) and not self._transactions
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self._transactions.clear()
+        self.checkpoints.clear()
+        self.nbytes = 0
+        self.first = 0
+        self.changed.emit()
+
+    def set_limits(self, max_bytes=None, max_steps=None):
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        if max_steps is not None:
+            self.max_steps = max_steps
+        self._evict()
+        self.changed.emit()
+
+    def record(self, command):
+        """Record a command whose change has already been applied to the model"""
+        if self._transactions:
+            self._transactions[-1].add(command)
+            return
+        for redo_command in self.redo_stack:
+            self.nbytes -= redo_command.nbytes
+        self.redo_stack.clear()
+        position = self.position
+        for checkpoint in [p for p in self.checkpoints if p > position]:
+            # Snapshots of the discarded redo steps
+            del self.checkpoints[checkpoint]
+
+        top = self.undo_stack[-1] if self.undo_stack else None
+        if top is not None:
+            size = top.nbytes
+            if top.merge(command):
+                # The state at position changed, its snapshot is stale
+                self.checkpoints.pop(position, None)
+                self.nbytes -= size
+                if top.is_noop():
+                    # A drag that ended where it started leaves no step behind
+                    self.undo_stack.pop()
+                else:
+                    self.nbytes += top.nbytes
+                self.changed.emit()
+                return
+        if command.is_noop():
+            return
+        self.undo_stack.append(command)
+        self.nbytes += command.nbytes
+        self._evict()
+        if self.position % self.checkpoint_interval == 0:
+            self.checkpoint()
+        self.changed.emit()
+
+    def checkpoint(self):
+        """Snapshot the model at the current position"""
+        started = time.perf_counter()
+        data = pickle.dumps(self.model.snapshot(), pickle.HIGHEST_PROTOCOL)
+        self.checkpoints[self.position] = zlib.compress(data, 1)
+        if self.restore_seconds is None:
+            # Until one is timed: restoring rebuilds every object and the
+            # spatial indexes, about five times the cost of a snapshot
+            self.restore_seconds = (time.perf_counter() - started) * 5
+        while len(self.checkpoints) > self.max_checkpoints:
+            del self.checkpoints[min(self.checkpoints)]
+
+    def begin(self, label=""):
+        """Open a transaction: commands recorded until end() form one undo step"""
+        self._transactions.append(Compound(label))
+
+    def end(self):
+        compound = self._transactions.pop()
+        if not compound.is_noop():
+            self.record(compound)
+
+    @contextmanager
+    def transaction(self, label=""):
+        self.begin(label)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def undo(self):
+        """Undo the last step, returning its command or None"""
+        if not self.can_undo():
+            return None
+        started = time.perf_counter()
+        command = self._undo()
+        self._time_steps(1, time.perf_counter() - started)
+        self.changed.emit()
+        return command
+
+    def redo(self):
+        if not self.can_redo():
+            return None
+        started = time.perf_counter()
+        command = self._redo()
+        self._time_steps(1, time.perf_counter() - started)
+        self.changed.emit()
+        return command
+
+    def jump_to(self, position):
+        """
+        Undo or redo up to position, restoring from the nearest checkpoint
+        when that is cheaper than replaying every step. Returns the number
+        of steps replayed.
+        """
+        position = max(self.first, min(position, self.last))
+        if self._transactions or position == self.position:
+            return 0
+        replay = abs(position - self.position)
+        nearest = min(self.checkpoints, key=lambda p: abs(p - position), default=None)
+        if (nearest is not None and self.restore_seconds
+                + abs(nearest - position) * self.step_seconds < replay * self.step_seconds):
+            started = time.perf_counter()
+            self._move_to(nearest)
+            self.model.restore(pickle.loads(zlib.decompress(self.checkpoints[nearest])))
+            self.restore_seconds = (self.restore_seconds + time.perf_counter() - started) / 2
+            replay = abs(position - nearest)
+        started = time.perf_counter()
+        while self.position < position:
+            self._redo()
+        while self.position > position:
+            self._undo()
+        if replay:
+            self._time_steps(replay, time.perf_counter() - started)
+        self.changed.emit()
+        return replay
+
+    def _undo(self):
+        command = self.undo_stack.pop()
+        command.undo(self.model)
+        self.redo_stack.append(command)
+        return command
+
+    def _redo(self):
+        command = self.redo_stack.pop()
+        command.redo(self.model)
+        self.undo_stack.append(command)
+        return command
+
+    def _time_steps(self, count, seconds):
+        self.step_seconds = 0.9 * self.step_seconds + 0.1 * seconds / count
+
+    def _move_to(self, position):
+        """Shift steps between the stacks without applying them"""
+        while self.position > position:
+            self.redo_stack.append(self.undo_stack.pop())
+        while self.position < position:
+            self.undo_stack.append(self.redo_stack.pop())
+
+    def _evict(self):
+        # The newest step stays even when it alone passes the limits, an edit
+        # just made can always be undone
+        while len(self.undo_stack) > 1 and (len(self.undo_stack) > self.max_steps
+                                            or self.nbytes > self.max_bytes):
+            self.nbytes -= self.undo_stack.popleft().nbytes
+            self.first += 1
+        for checkpoint in [p for p in self.checkpoints if p < self.first]:
+            del self.checkpoints[checkpoint]
@@ -0,0 +1,103 @@
+# utils/icon_cache.py
+from collections import OrderedDict
+
+from PyQt6.QtCore import Qt, QPointF
+from PyQt6.QtGui import QIcon, QImage, QPainter, QPixmap, QColor
+
+# Node background per canvas theme, baked into the cached node pixmaps
+NODE_BACKGROUNDS = {
+    "light": "#ffffff",
+    "dark": "#2a2a2a",
+}
+# Bytes of node faces kept, least recently used are dropped first. There is
+# one face per node type and zoom level, growing with the square of the zoom
+MAX_FACE_BYTES = 32 * 1024 * 1024
+
+_images = {}   # node type -> decoded QImage
+_icons = {}    # node type -> shared QIcon
+_faces = OrderedDict()  # (node type, size, theme, dpr) -> QImage
+_face_bytes = 0
+_pixmaps = {}  # (node type, size, theme, dpr) -> QPixmap, dropped with their face
+
+
+def icon_path(node_type):
+    return f"assets/icons/{node_type.lower()}.png"
+
+
+def icon_image(node_type):
+    """Decoded icon image for a node type, read from disk only once"""
+    image = _images.get(node_type)
+    if image is None:
+        image = QImage(icon_path(node_type))
+        _images[node_type] = image
+    return image
+
+
+def get_icon(node_type):
+    """QIcon for a node type, shared by every widget that asks for it"""
+    icon = _icons.get(node_type)
+    if icon is None:
+        icon = QIcon(QPixmap.fromImage(icon_image(node_type)))
+        _icons[node_type] = icon
+    return icon
+
+
+def node_image(node_type, size, theme, dpr):
+    """
+    Pre-scaled node face: the theme's node background with the type icon
+    centred on it, 5px inset, at the given device pixel ratio.
+
+    Unlike a QPixmap the image may be drawn from any thread, but it has to
+    be created on the GUI thread like every other cache entry here.
+    """
+    global _face_bytes
+    key = (node_type, size, theme, dpr)
+    face = _faces.get(key)
+    if face is not None:
+        _faces.move_to_end(key)
+        return face
+
+    face = QImage(int(size * dpr), int(size * dpr), QImage.Format.Format_ARGB32_Premultiplied)
+    face.setDevicePixelRatio(dpr)
+    face.fill(QColor(NODE_BACKGROUNDS.get(theme, NODE_BACKGROUNDS["dark"])))
+
+    image = icon_image(node_type)
+    if not image.isNull():
+        inner = int((size - 10) * dpr)
+        scaled = image.scaled(inner, inner,
+                              Qt.AspectRatioMode.KeepAspectRatio,
+                              Qt.TransformationMode.SmoothTransformation)
+        scaled.setDevicePixelRatio(dpr)
+        # Centre the icon the way QIcon.paint does
+        x = (face.width() - scaled.width()) // 2 / dpr
+        y = (face.height() - scaled.height()) // 2 / dpr
+        painter = QPainter(face)
+        painter.drawImage(QPointF(x, y), scaled)
+        painter.end()
+
+    _faces[key] = face
+    _face_bytes += face.sizeInBytes()
+    # The face just made stays, however large
+    while _face_bytes > MAX_FACE_BYTES and len(_faces) > 1:
+        old_key, old = _faces.popitem(last=False)
+        _face_bytes -= old.sizeInBytes()
+        _pixmaps.pop(old_key, None)
+    return face
+
+
+def node_pixmap(node_type, size, theme, dpr):
+    """node_image() as a QPixmap, for painting on widgets"""
+    key = (node_type, size, theme, dpr)
+    pixmap = _pixmaps.get(key)
+    if pixmap is None:
+        pixmap = _pixmaps[key] = QPixmap.fromImage(node_image(node_type, size, theme, dpr))
+    return pixmap
+
+
+def clear():
+    global _face_bytes
+    _images.clear()
+    _icons.clear()
+    _faces.clear()
+    _face_bytes = 0
+    _pixmaps.clear()
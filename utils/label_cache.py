@@ -0,0 +1,94 @@
+# utils/label_cache.py
+from collections import OrderedDict
+
+from PyQt6.QtCore import Qt, QRectF
+from PyQt6.QtGui import QFontMetricsF, QImage, QPainter
+
+# Bytes of label images kept, least recently used are dropped first. An
+# image grows with the square of the zoom, from a few KB to a few hundred
+MAX_LABEL_BYTES = 32 * 1024 * 1024
+
+_metrics = {}  # font key -> QFontMetricsF
+_widths = {}  # (text, font key) -> advance in pixels
+_labels = OrderedDict()  # (text, font key, rgba, scale) -> QImage
+_label_bytes = 0
+
+
+def _font_metrics(font):
+    key = font.key()
+    metrics = _metrics.get(key)
+    if metrics is None:
+        metrics = _metrics[key] = QFontMetricsF(font)
+    return metrics
+
+
+def text_width(text, font):
+    """Advance of text in font, shaped only once"""
+    key = (text, font.key())
+    width = _widths.get(key)
+    if width is None:
+        width = _widths[key] = _font_metrics(font).horizontalAdvance(text)
+    return width
+
+
+def text_widths(texts, font):
+    """text_width() of every text, for many labels at once"""
+    font_key = font.key()
+    widths = []
+    for text in texts:
+        key = (text, font_key)
+        width = _widths.get(key)
+        if width is None:
+            width = _widths[key] = _font_metrics(font).horizontalAdvance(text)
+        widths.append(width)
+    return widths
+
+
+def label_image(text, font, color, height, scale):
+    """
+    text rendered once in font and color, vertically centred in a box of the
+    given height and exactly as wide as the text (plus a pixel for
+    antialiasing on each side), at the given device pixel ratio.
+
+    Blitting it replaces shaping the text on every paint. Images must be
+    created on the GUI thread but, unlike pixmaps, can be drawn from any.
+    """
+    global _label_bytes
+    key = (text, font.key(), color.rgba(), scale)
+    image = _labels.get(key)
+    if image is not None:
+        _labels.move_to_end(key)
+        return image
+
+    width = text_width(text, font) + 2
+    image = QImage(max(1, int(width * scale + 0.999)), max(1, int(height * scale + 0.999)),
+                   QImage.Format.Format_ARGB32_Premultiplied)
+    image.setDevicePixelRatio(scale)
+    image.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(image)
+    painter.setFont(font)
+    painter.setPen(color)
+    painter.drawText(QRectF(0, 0, width, height), Qt.AlignmentFlag.AlignCenter, text)
+    painter.end()
+
+    _labels[key] = image
+    _label_bytes += image.sizeInBytes()
+    # The image just made stays, however large
+    while _label_bytes > MAX_LABEL_BYTES and len(_labels) > 1:
+        _label_bytes -= _labels.popitem(last=False)[1].sizeInBytes()
+    return image
+
+
+def forget(text):
+    """Drop the images of a label, after the node carrying it was renamed"""
+    global _label_bytes
+    for key in [key for key in _labels if key[0] == text]:
+        _label_bytes -= _labels.pop(key).sizeInBytes()
+
+
+def clear():
+    global _label_bytes
+    _labels.clear()
+    _label_bytes = 0
+    _widths.clear()
+    _metrics.clear()
@@ -0,0 +1,131 @@
+# utils/profiler.py
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class Profiler:
+    """
+    Timings and counters of an interactive view.
+
+    A frame is one paint: phases time parts of it and counts record how many
+    items it drew or skipped, both reset when the next frame begins. Samples
+    keep a rolling window of measurements taken outside painting, such as
+    hit-tests, and gauges are callables read whenever a snapshot is taken.
+    Everything reads back as plain dicts, see snapshot(), so debug overlays
+    and benchmarks share the same numbers.
+
+    Only the GUI thread may record.
+    """
+
+    def __init__(self, window=120):
+        self.window = window
+        self.frame_starts = deque(maxlen=window)  # perf_counter() of recent frames
+        self.frame_ms = deque(maxlen=window)
+        self.last_phases = {}  # phase -> ms in the last finished frame
+        self.last_counts = {}  # counter -> value in the last finished frame
+        self.samples = {}  # name -> deque of ms
+        self.gauges = {}  # name -> callable
+        self.phases = {}
+        self.counts = {}
+        self.frame_started = None
+
+    # Frames
+
+    def begin_frame(self):
+        self.frame_started = time.perf_counter()
+        self.frame_starts.append(self.frame_started)
+        self.phases = {}
+        self.counts = {}
+
+    def end_frame(self):
+        """Finish the frame, returning its duration in ms"""
+        if self.frame_started is None:
+            return 0.0
+        ms = (time.perf_counter() - self.frame_started) * 1000
+        self.frame_ms.append(ms)
+        self.last_phases = {name: seconds * 1000 for name, seconds in self.phases.items()}
+        self.last_phases["total"] = ms
+        self.last_counts = dict(self.counts)
+        self.frame_started = None
+        return ms
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block as part of the current frame"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def add_time(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name, value=1):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def fps(self, span=1.0):
+        """Frames painted during the last span seconds, per second"""
+        if not self.frame_starts:
+            return 0.0
+        since = time.perf_counter() - span
+        return sum(1 for started in self.frame_starts if started >= since) / span
+
+    # Samples and gauges
+
+    @contextmanager
+    def measure(self, name):
+        """Time a block as one sample of name"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_sample(name, time.perf_counter() - started)
+
+    def add_sample(self, name, seconds):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+        samples.append(seconds * 1000)
+
+    def sample_stats(self, name):
+        """{"count", "last_ms", "mean_ms", "max_ms"} over the window, None without samples"""
+        samples = self.samples.get(name)
+        if not samples:
+            return None
+        return {
+            "count": len(samples),
+            "last_ms": samples[-1],
+            "mean_ms": sum(samples) / len(samples),
+            "max_ms": max(samples),
+        }
+
+    def add_gauge(self, name, read):
+        self.gauges[name] = read
+
+    # Reading back
+
+    def snapshot(self):
+        frame_ms = list(self.frame_ms)
+        return {
+            "fps": self.fps(),
+            "frames": len(frame_ms),
+            "frame_mean_ms": sum(frame_ms) / len(frame_ms) if frame_ms else 0.0,
+            "frame_max_ms": max(frame_ms) if frame_ms else 0.0,
+            "phases_ms": dict(self.last_phases),
+            "counts": dict(self.last_counts),
+            "samples": {name: self.sample_stats(name) for name in self.samples},
+            "gauges": {name: read() for name, read in self.gauges.items()},
+        }
+
+    def reset(self):
+        """Forget frames and samples, gauges stay registered"""
+        self.frame_starts.clear()
+        self.frame_ms.clear()
+        self.last_phases = {}
+        self.last_counts = {}
+        self.samples = {}
+        self.phases = {}
+        self.counts = {}
+        self.frame_started = None
@@ -0,0 +1,466 @@
+# utils/schema_model.py
+import sys
+import numpy as np
+from PyQt6.QtCore import QPoint
+from utils import label_cache
+from utils.spatial_index import GridIndex
+
+
+class Node:
+    """
+    A device on the schema.
+
+    Nodes are slotted objects rather than dicts: large schemas hold tens of
+    thousands of them. The position is kept as two ints, pos builds a QPoint
+    on demand, and the characteristics dict is only allocated once something
+    is stored in it. Type strings are interned so every node of a type
+    shares one.
+
+    Positions are not kept in a NumPy table: nearly every consumer reads or
+    edits one node at a time, and rows would have to be renumbered on every
+    delete. Batch operations build their arrays from the nodes instead, see
+    SchemaModel.node_rects() and utils.geometry.
+    """
+
+    __slots__ = ("id", "type", "name", "x", "y", "_characteristics")
+
+    def __init__(self, node_type, pos, name=None, characteristics=None, node_id=None):
+        self.id = node_id
+        self.type = sys.intern(node_type)
+        self.name = name if name else self.type
+        self.x = int(pos.x())
+        self.y = int(pos.y())
+        self._characteristics = characteristics or None
+
+    def __repr__(self):
+        return f"Node({self.id}, {self.type!r}, {self.name!r}, ({self.x}, {self.y}))"
+
+    @property
+    def pos(self):
+        return QPoint(self.x, self.y)
+
+    @pos.setter
+    def pos(self, pos):
+        self.x = int(pos.x())
+        self.y = int(pos.y())
+
+    @property
+    def characteristics(self):
+        if self._characteristics is None:
+            self._characteristics = {}
+        return self._characteristics
+
+    @characteristics.setter
+    def characteristics(self, characteristics):
+        self._characteristics = characteristics or None
+
+    def has_characteristics(self):
+        return bool(self._characteristics)
+
+
+class SchemaModel:
+    """
+    Nodes and connections of a schema.
+
+    Every node carries a stable integer id and connections are stored as
+    (start_id, end_id) tuples, so moving or deleting a node only touches the
+    connections listed for it in the adjacency map. Nodes are kept in a dict
+    by id and connections in one by id() of the tuple, parallel connections
+    being equal tuples, so removals never scan the schema; nodes and
+    connections are views of them in insertion order. The model also keeps
+    the spatial indexes used for hit-testing in sync with every change.
+    """
+
+    # Node geometry shared by hit-testing and painting
+    NODE_HALF_SIZE = 25
+    DOT_OFFSET = 40
+    DOT_RADIUS = 6
+    LABEL_GAP = 5
+    LABEL_HEIGHT = 20
+    PICK_TOLERANCE = 5
+
+    def __init__(self, cell_size=100):
+        self.nodes_by_id = {}
+        self.connections_by_key = {}  # id(connection) -> connection
+        self.adjacency = {}  # node id -> list of connections touching it
+        self.node_index = GridIndex(cell_size)
+        self.connection_index = GridIndex(cell_size)
+        self._next_id = 1
+        # Font the labels are drawn in, set by the canvas. Without one, as in
+        # scripts running with no GUI, label widths are estimated
+        self.label_font = None
+
+    @property
+    def nodes(self):
+        return self.nodes_by_id.values()
+
+    @property
+    def connections(self):
+        return self.connections_by_key.values()
+
+    def clear(self):
+        self.nodes_by_id.clear()
+        self.connections_by_key.clear()
+        self.adjacency.clear()
+        self.node_index.clear()
+        self.connection_index.clear()
+        self._next_id = 1
+
+    # Geometry
+
+    def label_width(self, node):
+        """Width of the name label drawn under a node"""
+        return max(self.NODE_HALF_SIZE * 2 + 60, self.text_width(node.name))
+
+    def text_width(self, text):
+        """Width of a label image showing text, a pixel of antialiasing on each side"""
+        if self.label_font is None:
+            return len(text) * 8
+        return label_cache.text_width(text, self.label_font) + 2
+
+    def node_rect(self, node):
+        """
+        Area covered by a node as (left, top, right, bottom).
+
+        Includes the connection dot and the name label so the same rectangle
+        serves hit-testing candidates and repaint culling.
+        """
+        x = node.x
+        y = node.y
+        half = self.NODE_HALF_SIZE
+        label_half = self.label_width(node) / 2
+        return (x - max(half, label_half),
+                y - half,
+                x + max(self.DOT_OFFSET + self.DOT_RADIUS, label_half),
+                y + half + self.LABEL_GAP + self.LABEL_HEIGHT)
+
+    def node_rects(self, nodes):
+        """node_rect() of every node as an (N, 4) array"""
+        count = len(nodes)
+        x = np.fromiter((node.x for node in nodes), dtype=np.float64, count=count)
+        y = np.fromiter((node.y for node in nodes), dtype=np.float64, count=count)
+        names = [node.name for node in nodes]
+        if self.label_font is None:
+            name_width = np.fromiter(map(len, names), dtype=np.float64, count=count) * 8
+        else:
+            name_width = np.array(label_cache.text_widths(names, self.label_font), dtype=np.float64) + 2
+        half = self.NODE_HALF_SIZE
+        label_half = np.maximum(half * 2 + 60, name_width) / 2
+        return np.column_stack((x - np.maximum(half, label_half),
+                                y - half,
+                                x + np.maximum(self.DOT_OFFSET + self.DOT_RADIUS, label_half),
+                                y + half + self.LABEL_GAP + self.LABEL_HEIGHT))
+
+    def connection_points(self, connection):
+        """(start, end) positions of a connection"""
+        start_id, end_id = connection
+        return self.nodes_by_id[start_id].pos, self.nodes_by_id[end_id].pos
+
+    def connection_line(self, connection):
+        """(x1, y1, x2, y2) of a connection, without building QPoints"""
+        start = self.nodes_by_id[connection[0]]
+        end = self.nodes_by_id[connection[1]]
+        return start.x, start.y, end.x, end.y
+
+    def connection_rect(self, connection):
+        """Pick area of a connection: its bounding box grown by the pick tolerance"""
+        x1, y1, x2, y2 = self.connection_line(connection)
+        pad = self.PICK_TOLERANCE
+        return (min(x1, x2) - pad, min(y1, y2) - pad,
+                max(x1, x2) + pad, max(y1, y2) + pad)
+
+    def connection_cells(self, connection):
+        x1, y1, x2, y2 = self.connection_line(connection)
+        return self.connection_index.segment_cells(x1, y1, x2, y2, self.PICK_TOLERANCE)
+
+    def connection_rects(self, connections):
+        """connection_rect() and connection_cells() of many connections at once"""
+        pad = self.PICK_TOLERANCE
+        lines = np.array([self.connection_line(conn) for conn in connections],
+                         dtype=np.float64).reshape(-1, 4)
+        rects = np.column_stack((np.minimum(lines[:, 0], lines[:, 2]) - pad,
+                                 np.minimum(lines[:, 1], lines[:, 3]) - pad,
+                                 np.maximum(lines[:, 0], lines[:, 2]) + pad,
+                                 np.maximum(lines[:, 1], lines[:, 3]) + pad))
+        return rects, self.connection_index.segment_cells_many(lines, pad)
+
+    # Index maintenance
+
+    def _index_node(self, node):
+        key = node.id
+        if key in self.node_index:
+            self.node_index.move(key, self.node_rect(node))
+        else:
+            self.node_index.insert(key, self.node_rect(node), node)
+
+    def _index_connection(self, connection):
+        key = id(connection)
+        rect = self.connection_rect(connection)
+        cells = self.connection_cells(connection)
+        if key in self.connection_index:
+            self.connection_index.move(key, rect, cells)
+        else:
+            self.connection_index.insert(key, rect, connection, cells)
+
+    def rebuild_index(self):
+        self.node_index.clear()
+        for node, rect in zip(self.nodes, self.node_rects(self.nodes).tolist()):
+            self.node_index.insert(node.id, tuple(rect), node)
+        self.connection_index.clear()
+        rects, cells = self.connection_rects(self.connections)
+        for conn, rect, conn_cells in zip(self.connections, rects.tolist(), cells):
+            self.connection_index.insert(id(conn), tuple(rect), conn, conn_cells)
+
+    # Editing
+
+    def add_node(self, node):
+        """Append a node, assigning it an id if it does not have one yet"""
+        if node.id is None or node.id in self.nodes_by_id:
+            node.id = self._next_id
+        self._next_id = max(self._next_id, node.id + 1)
+        self.nodes_by_id[node.id] = node
+        self.adjacency.setdefault(node.id, [])
+        self._index_node(node)
+        return node
+
+    def remove_node(self, node):
+        """Remove a node and its connections, returning the removed connections"""
+        removed = list(self.adjacency.get(node.id, []))
+        for conn in removed:
+            self.remove_connection(conn)
+        del self.nodes_by_id[node.id]
+        self.adjacency.pop(node.id, None)
+        self.node_index.remove(node.id)
+        return removed
+
+    def remove_nodes(self, nodes):
+        """
+        Remove many nodes and their connections in one pass.
+
+        Returns the removed connections, ready to be re-added after the
+        nodes on undo. Only the connections of the nodes are visited.
+        """
+        ids = {node.id for node in nodes}
+        touched = {}
+        for node_id in ids:
+            for conn in self.adjacency.get(node_id, ()):
+                touched[id(conn)] = conn
+        removed = list(touched.values())
+        for conn in removed:
+            del self.connections_by_key[id(conn)]
+            for node_id in set(conn) - ids:
+                edges = self.adjacency[node_id]
+                for i, edge in enumerate(edges):
+                    if edge is conn:
+                        del edges[i]
+                        break
+            self.connection_index.remove(id(conn))
+        for node_id in ids:
+            del self.nodes_by_id[node_id]
+            self.adjacency.pop(node_id, None)
+            self.node_index.remove(node_id)
+        return removed
+
+    def update_node(self, node):
+        """Re-index a node after its name (and so its label size) changed"""
+        self._index_node(node)
+
+    def move_node(self, node, pos):
+        """Move a node, re-indexing only the node and its own connections"""
+        node.pos = pos
+        self._index_node(node)
+        for conn in self.adjacency.get(node.id, ()):
+            self._index_connection(conn)
+
+    def move_nodes(self, nodes, points):
+        """
+        Move many nodes at once, points being their new (x, y) in order.
+
+        Only nodes that actually moved are re-indexed and every connection
+        touching them is re-indexed once, even when both of its ends moved.
+        Returns the nodes that moved.
+        """
+        if hasattr(points, "tolist"):
+            points = points.tolist()
+        adjacency = self.adjacency
+        moved = []
+        connections = {}
+        for node, (x, y) in zip(nodes, points):
+            if node.x == x and node.y == y:
+                continue
+            node.x = x
+            node.y = y
+            moved.append(node)
+            for conn in adjacency.get(node.id, ()):
+                connections[id(conn)] = conn
+        if not moved:
+            return moved
+
+        # Index updates are computed for the whole batch at once
+        self.node_index.move_many([node.id for node in moved], self.node_rects(moved))
+        if connections:
+            rects, cells = self.connection_rects(list(connections.values()))
+            self.connection_index.move_many(list(connections), rects, cells)
+        return moved
+
+    def add_connection(self, connection):
+        start_id, end_id = connection
+        if id(connection) in self.connections_by_key:
+            # The same tuple twice would share one key, store a copy
+            connection = (start_id, end_id)
+        self.connections_by_key[id(connection)] = connection
+        self.adjacency[start_id].append(connection)
+        if end_id != start_id:
+            self.adjacency[end_id].append(connection)
+        self._index_connection(connection)
+        return connection
+
+    def find_connection(self, connection):
+        """The stored connection that is connection or, failing that, equal to it"""
+        stored = self.connections_by_key.get(id(connection))
+        if stored is connection:
+            return stored
+        for conn in self.adjacency.get(connection[0], ()):
+            if conn == connection:
+                return conn
+        return None
+
+    def remove_connection(self, connection):
+        """Remove connection, or a connection equal to it, returning the tuple actually stored"""
+        removed = self.find_connection(connection)
+        if removed is None:
+            raise ValueError(f"{connection!r} is not in the schema")
+        del self.connections_by_key[id(removed)]
+        for node_id in set(removed):
+            edges = self.adjacency.get(node_id, [])
+            for i, conn in enumerate(edges):
+                if conn is removed:
+                    del edges[i]
+                    break
+        self.connection_index.remove(id(removed))
+        return removed
+
+    # Queries
+
+    def get_node(self, node_id):
+        return self.nodes_by_id.get(node_id)
+
+    def incident_connections(self, node):
+        return list(self.adjacency.get(node.id, ()))
+
+    def neighbors(self, node):
+        """Nodes connected to node, in either direction"""
+        result = []
+        for start_id, end_id in self.adjacency.get(node.id, ()):
+            other_id = end_id if start_id == node.id else start_id
+            result.append(self.nodes_by_id[other_id])
+        return result
+
+    def nodes_in_rect(self, rect):
+        """Nodes overlapping rect (left, top, right, bottom), in list order"""
+        return self.node_index.query_rect(rect)
+
+    def connections_in_rect(self, rect):
+        """Connections whose pick area overlaps rect, in list order"""
+        return self.connection_index.query_rect(rect)
+
+    def nodes_at(self, pos):
+        """Nodes whose area (body, dot or label) covers pos, in list order"""
+        return self.node_index.query_point(pos.x(), pos.y())
+
+    def connections_at(self, pos):
+        """Connections passing near pos, in list order"""
+        return self.connection_index.query_point(pos.x(), pos.y())
+
+    # Serialization
+
+    def to_dict(self):
+        data = {
+            'nodes': [],
+            'connections': [],
+            'version': '1.1'
+        }
+
+        for node in self.nodes:
+            node_data = {
+                'id': node.id,
+                'type': node.type,
+                'pos': {'x': node.x, 'y': node.y},
+                'name': node.name,
+                'characteristics': node.characteristics if node.has_characteristics() else {}
+            }
+            data['nodes'].append(node_data)
+
+        for conn in self.connections:
+            x1, y1, x2, y2 = self.connection_line(conn)
+            # Positions are kept so files stay readable by 1.0 builds
+            conn_data = {
+                'source': conn[0],
+                'target': conn[1],
+                'start': {'x': x1, 'y': y1},
+                'end': {'x': x2, 'y': y2}
+            }
+            data['connections'].append(conn_data)
+
+        return data
+
+    def load_dict(self, data):
+        self.clear()
+
+        file_ids = {}
+        for node_data in data['nodes']:
+            node = Node(node_data['type'],
+                        QPoint(node_data['pos']['x'], node_data['pos']['y']),
+                        node_data.get('name'),
+                        node_data.get('characteristics'),
+                        node_data.get('id'))
+            file_id = node.id
+            self.add_node(node)
+            if file_id is not None:
+                file_ids[file_id] = node.id
+
+        for conn_data in data['connections']:
+            if 'source' in conn_data and 'target' in conn_data:
+                start_id = file_ids.get(conn_data['source'])
+                end_id = file_ids.get(conn_data['target'])
+            else:
+                # 1.0 files only record end points, match them to nodes
+                start_id = self._node_id_at(conn_data['start'])
+                end_id = self._node_id_at(conn_data['end'])
+            if start_id is not None and end_id is not None:
+                self.add_connection((start_id, end_id))
+
+    def snapshot(self):
+        """
+        Plain-data copy of the schema: node tuples, the connection list and
+        the id counter. Cheaper to take and restore than to_dict() and
+        load_dict(), and restore() keeps every id exactly.
+        """
+        nodes = [(node.id, node.type, node.name, node.x, node.y,
+                  dict(node._characteristics) if node._characteristics else None)
+                 for node in self.nodes]
+        return nodes, list(self.connections), self._next_id
+
+    def restore(self, snapshot):
+        nodes, connections, next_id = snapshot
+        self.clear()
+        for node_id, node_type, name, x, y, characteristics in nodes:
+            node = Node(node_type, QPoint(x, y), name, characteristics, node_id)
+            self.nodes_by_id[node_id] = node
+            self.adjacency[node_id] = []
+        for start_id, end_id in connections:
+            conn = (start_id, end_id)
+            self.connections_by_key[id(conn)] = conn
+            self.adjacency[start_id].append(conn)
+            if end_id != start_id:
+                self.adjacency[end_id].append(conn)
+        self._next_id = next_id
+        # Indexed in bulk rather than one add_node() at a time
+        self.rebuild_index()
+
+    def _node_id_at(self, point):
+        pos = QPoint(point['x'], point['y'])
+        for node in self.nodes_at(pos):
+            if node.x == pos.x() and node.y == pos.y():
+                return node.id
+        return None
@@ -0,0 +1,262 @@
+# utils/spatial_index.py
+import numpy as np
+
+
+class GridIndex:
+    """
+    Uniform grid hash mapping keys to axis-aligned rectangles.
+
+    Every entry is registered in each cell its shape overlaps, so a point
+    or rectangle query only has to look at the handful of entries stored in
+    the cells it touches instead of walking every item on the canvas.
+    Results come back in insertion order, which matches the order the canvas
+    keeps its nodes and connections in.
+    """
+
+    def __init__(self, cell_size=100):
+        self.cell_size = cell_size
+        # Buckets are lists: most cells hold one or two keys, and a list of
+        # one costs a fraction of a set of one on large schemas
+        self.cells = {}    # (cx, cy) -> list of keys
+        self.entries = {}  # key -> [rect, item, seq, cells]
+        self._seq = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+        self._seq = 0
+
+    def _cell_range(self, rect):
+        left, top, right, bottom = rect
+        size = self.cell_size
+        return (int(left // size), int(top // size),
+                int(right // size), int(bottom // size))
+
+    def rect_cells(self, rect):
+        x1, y1, x2, y2 = self._cell_range(rect)
+        return [(cx, cy) for cx in range(x1, x2 + 1) for cy in range(y1, y2 + 1)]
+
+    def segment_cells(self, x1, y1, x2, y2, pad=0):
+        """
+        Cells within pad of the segment (x1, y1)-(x2, y2).
+
+        Long diagonal lines only occupy the cells along their path rather
+        than their whole bounding box.
+        """
+        if x1 > x2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        size = self.cell_size
+        dx = x2 - x1
+        cells = []
+        for cx in range(int((x1 - pad) // size), int((x2 + pad) // size) + 1):
+            # Portion of the segment within pad of this column
+            lo = min(max(cx * size - pad, x1), x2)
+            hi = max(min((cx + 1) * size + pad, x2), x1)
+            if dx:
+                ya = y1 + (y2 - y1) * (lo - x1) / dx
+                yb = y1 + (y2 - y1) * (hi - x1) / dx
+            else:
+                ya, yb = y1, y2
+            top = min(ya, yb) - pad
+            bottom = max(ya, yb) + pad
+            for cy in range(int(top // size), int(bottom // size) + 1):
+                cells.append((cx, cy))
+        return cells
+
+    def segment_cells_many(self, segments, pad=0):
+        """
+        segment_cells() for an (N, 4) array of x1, y1, x2, y2 rows, computed
+        in one pass. Returns one list of cells per segment.
+        """
+        segments = np.array(segments, dtype=np.float64).reshape(-1, 4)
+        count = len(segments)
+        if not count:
+            return []
+        swap = segments[:, 0] > segments[:, 2]
+        segments[swap] = segments[swap][:, [2, 3, 0, 1]]
+        x1, y1, x2, y2 = segments.T
+        size = self.cell_size
+
+        # One row per (segment, column), as the loop in segment_cells()
+        first = np.floor_divide(x1 - pad, size).astype(np.int64)
+        columns = np.floor_divide(x2 + pad, size).astype(np.int64) - first + 1
+        owner = np.repeat(np.arange(count), columns)
+        cx = first[owner] + _ranks(columns)
+        x1, y1, x2, y2 = x1[owner], y1[owner], x2[owner], y2[owner]
+        lo = np.minimum(np.maximum(cx * size - pad, x1), x2)
+        hi = np.maximum(np.minimum((cx + 1) * size + pad, x2), x1)
+        dx = x2 - x1
+        sloped = dx != 0
+        safe_dx = np.where(sloped, dx, 1)
+        ya = np.where(sloped, y1 + (y2 - y1) * (lo - x1) / safe_dx, y1)
+        yb = np.where(sloped, y1 + (y2 - y1) * (hi - x1) / safe_dx, y2)
+        top = np.floor_divide(np.minimum(ya, yb) - pad, size).astype(np.int64)
+        rows = np.floor_divide(np.maximum(ya, yb) + pad, size).astype(np.int64) - top + 1
+
+        # Expand every column into its cells
+        column = np.repeat(np.arange(len(cx)), rows)
+        cells = list(zip(cx[column].tolist(), (top[column] + _ranks(rows)).tolist()))
+        result = []
+        start = 0
+        for n in np.bincount(owner[column], minlength=count).tolist():
+            result.append(cells[start:start + n])
+            start += n
+        return result
+
+    def _add_to_cells(self, key, cells):
+        buckets = self.cells
+        for cell in cells:
+            bucket = buckets.get(cell)
+            if bucket is None:
+                buckets[cell] = [key]
+            else:
+                bucket.append(key)
+
+    def _remove_from_cells(self, key, cells):
+        buckets = self.cells
+        for cell in cells:
+            bucket = buckets.get(cell)
+            if bucket is not None and key in bucket:
+                bucket.remove(key)
+                if not bucket:
+                    del buckets[cell]
+
+    def _update_cells(self, key, old_cells, new_cells):
+        """Move key between buckets, leaving the cells it stays in untouched"""
+        old_cells = set(old_cells)
+        new_cells = set(new_cells)
+        self._remove_from_cells(key, old_cells - new_cells)
+        self._add_to_cells(key, new_cells - old_cells)
+
+    def insert(self, key, rect, item=None, cells=None):
+        """
+        Add (or replace) an entry; rect is (left, top, right, bottom).
+
+        cells overrides the grid cells the entry is registered in, e.g. the
+        result of segment_cells() for a line.
+        """
+        if key in self.entries:
+            self.remove(key)
+        if cells is None:
+            cells = self.rect_cells(rect)
+        self._seq += 1
+        self.entries[key] = [rect, key if item is None else item, self._seq, cells]
+        self._add_to_cells(key, cells)
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self._remove_from_cells(key, entry[3])
+
+    def move(self, key, rect, cells=None):
+        """Update the shape of an entry, keeping its insertion order"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        if cells is None:
+            cells = self.rect_cells(rect)
+        if cells != entry[3]:
+            self._update_cells(key, entry[3], cells)
+            entry[3] = cells
+        entry[0] = rect
+
+    def move_many(self, keys, rects, cells=None):
+        """
+        move() for many entries; rects is an (N, 4) array or list of rects.
+
+        Without cells, entries whose rectangle still covers the same grid
+        cells only get their rectangle updated.
+        """
+        entries = self.entries
+        if hasattr(rects, "tolist"):
+            rects = rects.tolist()
+        if cells is None:
+            size = self.cell_size
+            old = np.array([entries[key][0] for key in keys], dtype=np.float64).reshape(-1, 4)
+            new = np.array(rects, dtype=np.float64).reshape(-1, 4)
+            changed = (np.floor_divide(old, size) != np.floor_divide(new, size)).any(axis=1).tolist()
+            for key, rect, moved in zip(keys, rects, changed):
+                if moved:
+                    self.move(key, tuple(rect))
+                else:
+                    entries[key][0] = tuple(rect)
+            return
+        for key, rect, new_cells in zip(keys, rects, cells):
+            entry = entries[key]
+            if new_cells != entry[3]:
+                self._update_cells(key, entry[3], new_cells)
+                entry[3] = new_cells
+            entry[0] = tuple(rect)
+
+    def replace(self, old_key, key, rect, item=None, cells=None):
+        """Swap old_key for a new entry that keeps its place in the ordering"""
+        entry = self.entries.get(old_key)
+        if entry is None:
+            self.insert(key, rect, item, cells)
+            return
+        seq = entry[2]
+        self.remove(old_key)
+        self.insert(key, rect, item, cells)
+        self.entries[key][2] = seq
+
+    def rect(self, key):
+        entry = self.entries.get(key)
+        return entry[0] if entry else None
+
+    def _sorted_items(self, keys):
+        entries = self.entries
+        if len(keys) > 1:
+            keys = sorted(keys, key=lambda k: entries[k][2])
+        return [entries[k][1] for k in keys]
+
+    def query_point(self, x, y):
+        """Return the items whose rectangle contains (x, y)"""
+        size = self.cell_size
+        bucket = self.cells.get((int(x // size), int(y // size)))
+        if not bucket:
+            return []
+        entries = self.entries
+        hits = []
+        for key in bucket:
+            left, top, right, bottom = entries[key][0]
+            if left <= x <= right and top <= y <= bottom:
+                hits.append(key)
+        return self._sorted_items(hits)
+
+    def query_rect(self, rect):
+        """Return the items whose rectangle intersects rect"""
+        left, top, right, bottom = rect
+        x1, y1, x2, y2 = self._cell_range(rect)
+        cells = self.cells
+        seen = set()
+        if (x2 - x1 + 1) * (y2 - y1 + 1) > len(cells):
+            # Query covers more cells than are populated, walk those instead
+            for (cx, cy), bucket in cells.items():
+                if x1 <= cx <= x2 and y1 <= cy <= y2:
+                    seen.update(bucket)
+        else:
+            for cx in range(x1, x2 + 1):
+                for cy in range(y1, y2 + 1):
+                    bucket = cells.get((cx, cy))
+                    if bucket:
+                        seen.update(bucket)
+        entries = self.entries
+        hits = []
+        for key in seen:
+            l, t, r, b = entries[key][0]
+            if l <= right and r >= left and t <= bottom and b >= top:
+                hits.append(key)
+        return self._sorted_items(hits)
+
+
+def _ranks(counts):
+    """0, 1, ..., n - 1 for every n in counts, concatenated"""
+    total = int(counts.sum())
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.arange(total) - starts